@@ -0,0 +1,241 @@
+"""
+Flask CLI commands, registered on the app by ``create_app``.
+"""
+
+import signal
+import threading
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .database import init_database, wait_for_database
+from .models.flight_model import db
+from .models.rollup import rebuild_rollup
+from .seed import populate_tables
+from .services.flight_archive import FlightArchiver, archive_flights
+from .services.flight_board import EventRelay
+from .services.flight_ingest import (
+    DEFAULT_CHUNK_SIZE,
+    READERS,
+    FlightLoadError,
+    load_flights,
+)
+from .services.stackexchange_client import get_client
+from .services.stackexchange_ingest import (
+    StackExchangeIngestor,
+    ingest_search,
+    parse_searches,
+)
+
+
+@click.command("db-init")
+@click.option(
+    "--wait",
+    type=float,
+    default=0,
+    show_default=True,
+    help="Seconds to keep retrying while the database server is unreachable.",
+)
+@click.option("--seed", is_flag=True, help="Also load the sample data.")
+@with_appcontext
+def db_init_command(wait, seed):
+    """Create the database if needed and apply the pending schema migrations."""
+    wait_for_database(db.engine, timeout=wait)
+    applied = init_database(db.engine)
+    if applied:
+        click.echo(f"Applied migrations {', '.join(map(str, applied))}.")
+    else:
+        click.echo("Schema is up to date.")
+    if seed:
+        _seed()
+
+
+@click.command("seed")
+@with_appcontext
+def seed_command():
+    """Load the sample data into the flight tables that are empty."""
+    _seed()
+
+
+def _seed():
+    populated = populate_tables()
+    if populated:
+        click.echo(f"Populated {', '.join(populated)}.")
+    else:
+        click.echo("Tables already populated.")
+
+
+@click.command("rebuild-stats")
+@with_appcontext
+def rebuild_stats_command():
+    """Recompute the vuelos_diarios rollup table from vuelos and its archive."""
+    with db.engine.begin() as connection:
+        count = rebuild_rollup(connection)
+    click.echo(f"Rebuilt vuelos_diarios with {count} rows.")
+
+
+@click.command("load-flights")
+@click.argument("source", type=click.File("r", encoding="utf-8"))
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(sorted(READERS)),
+    help="Input format; by default taken from the file extension.",
+)
+@click.option("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, show_default=True)
+@click.option("--skip-invalid", is_flag=True, help="Skip and report invalid records.")
+@with_appcontext
+def load_flights_command(source, fmt, chunk_size, skip_invalid):
+    """Load flights in bulk from a CSV or NDJSON file, or - for stdin."""
+    if fmt is None:
+        extension = source.name.rpartition(".")[2].lower()
+        fmt = "ndjson" if extension in ("ndjson", "jsonl") else "csv"
+    try:
+        result = load_flights(
+            READERS[fmt](source), chunk_size=chunk_size, skip_invalid=skip_invalid
+        )
+    except FlightLoadError as error:
+        raise click.ClickException(
+            f"Line {error.line}: {error} ({error.inserted} flights inserted before it)"
+        )
+    for error in result["errors"]:
+        click.echo(f"Line {error['line']}: {error['error']}", err=True)
+    click.echo(f"Inserted {result['inserted']} flights, rejected {result['rejected']}.")
+
+
+@click.command("archive-flights")
+@click.option(
+    "--hot-months",
+    type=click.IntRange(min=1),
+    help="Months kept in vuelos, the current one included (default: VUELOS_HOT_MONTHS).",
+)
+@click.option(
+    "--months-ahead",
+    type=click.IntRange(min=0),
+    help="Months of partitions prepared ahead (default: VUELOS_PARTITIONS_AHEAD).",
+)
+@with_appcontext
+def archive_flights_command(hot_months, months_ahead):
+    """Move the flights of the months before the hot window to vuelos_archivo."""
+    result = archive_flights(
+        db.engine,
+        hot_months or current_app.config["VUELOS_HOT_MONTHS"],
+        (
+            current_app.config["VUELOS_PARTITIONS_AHEAD"]
+            if months_ahead is None
+            else months_ahead
+        ),
+    )
+    if result is None:
+        raise click.ClickException("Another archival is running.")
+    for month in result["created"]:
+        click.echo(f"Created the partition of {month:%Y-%m}.")
+    for month, count in result["archived"]:
+        click.echo(f"Archived {count} flights of {month:%Y-%m}.")
+    if not result["archived"]:
+        click.echo("Nothing to archive.")
+
+
+@click.command("flight-relay")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", type=int, default=5002, show_default=True)
+def flight_relay_command(host, port):
+    """Run the event relay shared by the workers of FLIGHT_BOARD_BROKER=tcp://HOST:PORT."""
+    relay = EventRelay((host, port))
+    click.echo(f"Relaying flight events on {host}:{port}.")
+    try:
+        relay.serve_forever()
+    finally:
+        relay.server_close()
+
+
+@click.command("ingest-stackexchange")
+@click.option("--intitle", default="perl", show_default=True)
+@click.option("--site", default="stackoverflow", show_default=True)
+@click.option("--max-pages", type=int, default=None, help="Stop after this many pages.")
+@with_appcontext
+def ingest_stackexchange_command(intitle, site, max_pages):
+    """Snapshot the full result set of a Stack Exchange search into the database."""
+    count = ingest_search(get_client(), intitle, site, max_pages=max_pages)
+    click.echo(f"Ingested {count} questions for {intitle}@{site}.")
+
+
+def background_jobs(app):
+    """
+    Build the background jobs enabled by the configuration: the Stack Exchange ingestion
+    when ``STACKEXCHANGE_INGEST_INTERVAL`` is set and the flight archival when
+    ``VUELOS_ARCHIVE_INTERVAL`` is set.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        list: The jobs, not started yet.
+    """
+    jobs = []
+    if app.config["STACKEXCHANGE_INGEST_INTERVAL"] > 0:
+        jobs.append(
+            StackExchangeIngestor(
+                app,
+                parse_searches(app.config["STACKEXCHANGE_INGEST_SEARCHES"]),
+                app.config["STACKEXCHANGE_INGEST_INTERVAL"],
+            )
+        )
+    if app.config["VUELOS_ARCHIVE_INTERVAL"] > 0:
+        jobs.append(
+            FlightArchiver(
+                app,
+                app.config["VUELOS_ARCHIVE_INTERVAL"],
+                app.config["VUELOS_HOT_MONTHS"],
+                app.config["VUELOS_PARTITIONS_AHEAD"],
+            )
+        )
+    return jobs
+
+
+@click.command("background-jobs")
+@with_appcontext
+def background_jobs_command():
+    """
+    Run the Stack Exchange ingestion and the flight archival until stopped.
+
+    The jobs run in this process only, next to the gunicorn workers rather than in them, so
+    they run once per deployment and no thread exists when the workers fork.
+    """
+    jobs = background_jobs(current_app._get_current_object())
+    if not jobs:
+        raise click.ClickException(
+            "No background job is enabled: set STACKEXCHANGE_INGEST_INTERVAL or "
+            "VUELOS_ARCHIVE_INTERVAL."
+        )
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    for job in jobs:
+        job.start()
+    click.echo(f"Running {', '.join(type(job).__name__ for job in jobs)}.")
+    try:
+        while not stopped.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for job in jobs:
+            job.stop()
+
+
+def register_commands(app):
+    """
+    Register the application's CLI commands.
+
+    Args:
+        app (Flask): The application.
+    """
+    app.cli.add_command(db_init_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(rebuild_stats_command)
+    app.cli.add_command(load_flights_command)
+    app.cli.add_command(archive_flights_command)
+    app.cli.add_command(flight_relay_command)
+    app.cli.add_command(ingest_stackexchange_command)
+    app.cli.add_command(background_jobs_command)
@@ -0,0 +1,173 @@
+"""
+Response compression negotiated from ``Accept-Encoding``.
+
+Textual responses (JSON, CSV, plain text) are compressed with brotli when the client accepts
+it and the optional ``brotli`` package is installed, otherwise with gzip. Buffered responses
+are compressed when they reach ``COMPRESS_MIN_SIZE`` bytes. Streamed responses (the
+/data/vuelos array) are compressed chunk by chunk, each chunk flushed so that the client
+receives the rows as they are produced.
+
+Responses that already have a Content-Encoding, carry ``Cache-Control: no-transform`` or have
+another content type (e.g. the compressed or binary exports) are left alone.
+"""
+
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+DEFAULT_MIN_SIZE = 1024
+
+COMPRESSIBLE_MIMETYPES = frozenset(
+    {
+        "application/json",
+        "application/x-ndjson",
+        "text/csv",
+        "text/html",
+        "text/plain",
+    }
+)
+
+
+def _encodings():
+    """Return the supported encodings in order of preference."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encodings):
+    """
+    Pick the preferred supported encoding accepted by the client.
+
+    Args:
+        accept_encodings: The request's ``accept_encodings`` (a werkzeug MIMEAccept-like
+            object mapping encodings to their quality).
+
+    Returns:
+        str or None: ``br``, ``gzip`` or None when no supported encoding is acceptable.
+    """
+    best = None
+    best_quality = 0
+    for encoding in _encodings():
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _Compressor:
+    """
+    Incremental compressor with the same interface for gzip and brotli.
+    """
+
+    def __init__(self, encoding, level):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=level["br"])
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(level["gzip"], zlib.DEFLATED, 31)
+
+    def compress(self, data, flush=False):
+        """Compress a chunk; with ``flush``, emit everything buffered so far."""
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + self._brotli.flush() if flush else out
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        """Return the end of the compressed stream."""
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class Compression:
+    """
+    Flask extension compressing responses.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Register the compression on the application.
+
+        Args:
+            app (Flask): The application. ``COMPRESS_MIN_SIZE`` is the smallest buffered
+                body compressed, ``COMPRESS_GZIP_LEVEL`` (default 6) and
+                ``COMPRESS_BROTLI_QUALITY`` (default 4) trade speed for size.
+        """
+        app.config.setdefault("COMPRESS_MIN_SIZE", DEFAULT_MIN_SIZE)
+        app.config.setdefault("COMPRESS_GZIP_LEVEL", 6)
+        app.config.setdefault("COMPRESS_BROTLI_QUALITY", 4)
+        app.after_request(self._after_request)
+
+    def _after_request(self, response):
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or "Content-Encoding" in response.headers
+            or "no-transform" in response.headers.get("Cache-Control", "")
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+
+        streamed = response.is_streamed
+        if (
+            not streamed
+            and (response.calculate_content_length() or 0)
+            < current_app.config["COMPRESS_MIN_SIZE"]
+        ):
+            return response
+        encoding = negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        compressor = _Compressor(
+            encoding,
+            {
+                "gzip": current_app.config["COMPRESS_GZIP_LEVEL"],
+                "br": current_app.config["COMPRESS_BROTLI_QUALITY"],
+            },
+        )
+        if streamed:
+            response.response = _compress_stream(response.response, compressor)
+            response.headers.pop("Content-Length", None)
+        else:
+            response.set_data(
+                compressor.compress(response.get_data()) + compressor.finish()
+            )
+        response.headers["Content-Encoding"] = encoding
+        # The compressed body differs from the identity one: its ETag can only be weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def _compress_stream(chunks, compressor):
+    """
+    Compress a streamed body, flushing after every chunk.
+    """
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunk:
+                yield compressor.compress(chunk, flush=True)
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+compression = Compression()
@@ -0,0 +1,293 @@
+"""
+Database provisioning and the lazy connection check.
+
+``create_app`` never connects to the database: importing the application (once per gunicorn
+master, test module or CLI call) costs no round trips and cannot block on an unreachable
+server. The schema is created and upgraded explicitly with ``flask db-init`` (which can wait
+for the server to come up) and sample data is loaded with ``flask seed``.
+
+At runtime, ``init_app`` registers a check that runs on the first request of each process: it
+verifies that the database is reachable and its schema is current, then gets out of the way.
+While the check fails, requests get a 503 and the check is retried at most once every
+``DATABASE_CHECK_INTERVAL`` seconds, so many workers do not stampede a database that is down.
+
+``engine_options`` turns the ``DATABASE_POOL_*`` settings into the engine options of
+server databases: a bounded pool of pre-pinged, periodically recycled connections, so idle
+connections dropped by the server ("MySQL server has gone away") are replaced transparently.
+The pool is an ``InstrumentedQueuePool``, whose statistics ``pool_stats`` reports.
+"""
+
+import logging
+import threading
+import time
+
+from flask import current_app, jsonify, request
+from sqlalchemy import func, inspect, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+from sqlalchemy_utils import create_database, database_exists
+
+from .migrations import MIGRATIONS, schema_version, upgrade
+from .models.flight_model import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECK_INTERVAL = 5
+
+# Pool defaults sized for a gthread worker with 4 threads: every thread holds at most one
+# connection, with room for the ingestion thread and bursts. Recycling below the usual server
+# and proxy idle timeouts avoids handing out connections the server already closed.
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 5
+DEFAULT_POOL_TIMEOUT = 10
+DEFAULT_POOL_RECYCLE = 1800
+
+
+def wait_for_database(engine, timeout=0, interval=1.0, max_interval=10.0):
+    """
+    Wait until the database server accepts connections.
+
+    Args:
+        engine: The SQLAlchemy engine of the database.
+        timeout (float): Longest time to keep retrying, in seconds. With 0 a single attempt
+            is made.
+        interval (float): Delay before the first retry, doubled after every attempt.
+        max_interval (float): Upper bound of the delay between attempts.
+
+    Raises:
+        OperationalError: If the server is still unreachable when the timeout expires.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            # Connects to the server rather than to the database, which may not exist yet
+            database_exists(engine.url)
+            return
+        except OperationalError:
+            if time.monotonic() + interval > deadline:
+                raise
+            logger.warning("Database unreachable, retrying in %.1f s", interval)
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
+
+
+def init_database(engine):
+    """
+    Create the database if it does not exist and apply the pending migrations.
+
+    Args:
+        engine: The SQLAlchemy engine of the database.
+
+    Returns:
+        list: The migration versions that were applied.
+    """
+    if not database_exists(engine.url):
+        create_database(engine.url)
+        logger.info("Database created.")
+    return upgrade(engine)
+
+
+def schema_status(connection):
+    """
+    Return the applied and the latest schema versions, without writing to the database.
+
+    Returns:
+        tuple: (applied version, 0 for an uninitialized database; latest known version).
+    """
+    latest = MIGRATIONS[-1][0]
+    if not inspect(connection).has_table(schema_version.name):
+        return 0, latest
+    applied = connection.scalar(select(func.max(schema_version.c.version))) or 0
+    return applied, latest
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that counts checkouts, new connections and timeouts, and measures how long
+    checkouts take (waiting for a free connection, plus opening or pre-pinging it).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._connects = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeout:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+    def _create_connection(self):
+        with self._stats_lock:
+            self._connects += 1
+        return super()._create_connection()
+
+    def stats(self):
+        """
+        Return the counters of the pool.
+
+        Returns:
+            dict: ``checkouts``, ``connects``, ``timeouts``, ``wait_seconds_total`` and
+            ``wait_seconds_max`` since the pool was created.
+        """
+        with self._stats_lock:
+            return {
+                "checkouts": self._checkouts,
+                "connects": self._connects,
+                "timeouts": self._timeouts,
+                "wait_seconds_total": round(self._wait_total, 6),
+                "wait_seconds_max": round(self._wait_max, 6),
+            }
+
+
+def engine_options(config):
+    """
+    Build the SQLAlchemy engine options from the ``DATABASE_POOL_*`` settings.
+
+    SQLite databases keep Flask-SQLAlchemy's defaults: they have no server connections to
+    pool, and in-memory databases need their single static connection.
+
+    Args:
+        config (Mapping): The application configuration.
+
+    Returns:
+        dict: Options for ``SQLALCHEMY_ENGINE_OPTIONS``.
+    """
+    uri = config.get("SQLALCHEMY_DATABASE_URI")
+    if not uri or make_url(uri).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": config.get("DATABASE_POOL_SIZE", DEFAULT_POOL_SIZE),
+        "max_overflow": config.get("DATABASE_MAX_OVERFLOW", DEFAULT_MAX_OVERFLOW),
+        "pool_timeout": config.get("DATABASE_POOL_TIMEOUT", DEFAULT_POOL_TIMEOUT),
+        "pool_recycle": config.get("DATABASE_POOL_RECYCLE", DEFAULT_POOL_RECYCLE),
+        "pool_pre_ping": config.get("DATABASE_POOL_PRE_PING", True),
+    }
+
+
+def pool_stats(pool):
+    """
+    Return the state of a connection pool.
+
+    Returns:
+        dict: The pool class and, for queue pools, its ``size``, ``checked_out``,
+        ``checked_in`` and ``overflow`` connections, plus the counters of instrumented pools.
+    """
+    stats = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+            timeout=pool.timeout(),
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(pool.stats())
+    return stats
+
+
+def handle_pool_timeout(error):
+    """
+    Answer 503 when no connection could be checked out of the pool in time.
+    """
+    logger.warning("Connection pool exhausted: %s", error)
+    response = jsonify({"error": "Database busy"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+class DatabaseCheck:
+    """
+    Flask extension that checks the database once per process, on the first request.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Register the check on the application.
+
+        Args:
+            app (Flask): The application. ``DATABASE_CHECK_INTERVAL`` sets the delay between
+                two checks while the database is unavailable.
+        """
+        app.config.setdefault("DATABASE_CHECK_INTERVAL", DEFAULT_CHECK_INTERVAL)
+        app.extensions["database_check"] = {
+            "lock": threading.Lock(),
+            "ok": False,
+            "error": None,
+            "checked_at": None,
+            "exempt": set(),
+        }
+        app.before_request(self._before_request)
+        app.register_error_handler(PoolTimeout, handle_pool_timeout)
+
+    def exempt(self, app, blueprint):
+        """
+        Serve the routes of ``blueprint`` even while the database is unavailable.
+        """
+        app.extensions["database_check"]["exempt"].add(blueprint.name)
+
+    def _before_request(self):
+        state = current_app.extensions["database_check"]
+        if state["ok"] or request.blueprint in state["exempt"]:
+            return None
+
+        interval = current_app.config["DATABASE_CHECK_INTERVAL"]
+        with state["lock"]:
+            recent = (
+                state["checked_at"] is not None
+                and time.monotonic() - state["checked_at"] < interval
+            )
+            if not state["ok"] and not recent:
+                state["error"] = self._check()
+                state["ok"] = state["error"] is None
+                state["checked_at"] = time.monotonic()
+            if state["ok"]:
+                return None
+            error = state["error"]
+
+        response = jsonify({"error": error})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(interval)
+        return response
+
+    @staticmethod
+    def _check():
+        """
+        Return None when the database is usable, or the reason why it is not.
+        """
+        try:
+            with db.engine.connect() as connection:
+                applied, latest = schema_status(connection)
+        except OperationalError as error:
+            logger.warning("Database check failed: %s", error.orig)
+            return "Database unavailable"
+        if applied < latest:
+            logger.error("Database schema is at version %d of %d", applied, latest)
+            return "Database schema is out of date, run `flask db-init`"
+        return None
+
+
+database_check = DatabaseCheck()
@@ -0,0 +1,462 @@
+"""
+Request-level performance instrumentation.
+
+For every request the middleware measures the total latency, the number of SQL statements
+and the time spent in them (SQLAlchemy engine events, all engines), and the number and time
+of outbound Stack Exchange calls (an observer of the shared client). The figures are:
+
+* sent back in a ``Server-Timing`` header (``db``, ``upstream`` and ``app`` durations), so
+  they show up in the browser's network panel. For streamed responses the header reflects
+  the work done before the body started;
+* aggregated into Prometheus histograms and counters served as text at ``/metrics``. The
+  same scrape reads the connection pools, the read replicas and the Stack Exchange rate
+  limiter into gauges and counters. The metrics are per worker process: with several
+  gunicorn workers each scrape sees the worker that answered it;
+* checked against ``INSTRUMENTATION_QUERY_THRESHOLD``: requests issuing more statements are
+  logged as likely N+1 queries, counted, and flagged with an ``X-Query-Count`` header.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .database import pool_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY_THRESHOLD = 20
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """
+    A Prometheus counter with labels.
+    """
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, *labels, value):
+        """Copy a total kept by another component, when the metrics are collected."""
+        with self._lock:
+            self._values[labels] = value
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def expose(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """
+    A Prometheus gauge with labels.
+    """
+
+    type = "gauge"
+
+
+class Histogram:
+    """
+    A Prometheus histogram with labels and fixed buckets.
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def expose(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for labels, (buckets, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, hits in zip(self.buckets, buckets):
+                    cumulative += hits
+                    lines.append(
+                        f"{self.name}_bucket"
+                        f"{_labels(self.labelnames, labels, [('le', bound)])} {cumulative}"
+                    )
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_labels(self.labelnames, labels, [('le', '+Inf')])} {count}"
+                )
+                lines.append(
+                    f"{self.name}_sum{_labels(self.labelnames, labels)} {total:.6f}"
+                )
+                lines.append(
+                    f"{self.name}_count{_labels(self.labelnames, labels)} {count}"
+                )
+        return lines
+
+
+class Metrics:
+    """
+    The metrics of one application.
+    """
+
+    def __init__(self):
+        self.request_duration = Histogram(
+            "http_request_duration_seconds",
+            "Latency of the HTTP requests, until the response body was sent.",
+            ("method", "route", "status"),
+        )
+        self.request_queries = Histogram(
+            "http_request_db_queries",
+            "SQL statements executed per HTTP request.",
+            ("route",),
+            QUERY_COUNT_BUCKETS,
+        )
+        self.request_db_duration = Histogram(
+            "http_request_db_duration_seconds",
+            "Time spent in SQL statements per HTTP request.",
+            ("route",),
+        )
+        self.excessive_queries = Counter(
+            "http_requests_excessive_queries_total",
+            "Requests that executed more SQL statements than the N+1 threshold.",
+            ("route",),
+        )
+        self.upstream_duration = Histogram(
+            "upstream_request_duration_seconds",
+            "Latency of the outbound HTTP calls.",
+            ("host", "status"),
+        )
+
+        self.pool_size = Gauge(
+            "db_pool_size", "Configured size of the connection pool.", ("engine",)
+        )
+        self.pool_connections = Gauge(
+            "db_pool_connections",
+            "Connections of the pool, checked out, checked in or in overflow.",
+            ("engine", "state"),
+        )
+        self.pool_checkouts = Counter(
+            "db_pool_checkouts_total",
+            "Connections checked out of the pool.",
+            ("engine",),
+        )
+        self.pool_connects = Counter(
+            "db_pool_connects_total",
+            "Database connections opened by the pool.",
+            ("engine",),
+        )
+        self.pool_timeouts = Counter(
+            "db_pool_timeouts_total",
+            "Checkouts that gave up waiting for a connection.",
+            ("engine",),
+        )
+        self.pool_wait = Counter(
+            "db_pool_wait_seconds_total",
+            "Time spent waiting for a connection of the pool.",
+            ("engine",),
+        )
+        self.pool_wait_max = Gauge(
+            "db_pool_wait_seconds_max",
+            "Longest wait for a connection of the pool.",
+            ("engine",),
+        )
+        self.replica_sessions = Counter(
+            "db_replica_sessions_total",
+            "Sessions whose reads a replica served.",
+            ("replica",),
+        )
+        self.replica_failures = Counter(
+            "db_replica_failures_total",
+            "Failed connections to a replica.",
+            ("replica",),
+        )
+        self.replica_down = Gauge(
+            "db_replica_down_seconds",
+            "Seconds a failed replica is still skipped for.",
+            ("replica",),
+        )
+        self.limiter_backoff = Gauge(
+            "upstream_backoff_seconds",
+            "Seconds left of the backoff requested by the Stack Exchange API.",
+        )
+        self.limiter_quota = Gauge(
+            "upstream_quota",
+            "Daily quota of the Stack Exchange API, remaining and maximum.",
+            ("kind",),
+        )
+        self.limiter_inflight = Gauge(
+            "upstream_inflight_requests",
+            "Stack Exchange API calls in flight.",
+        )
+        self.limiter_max_concurrent = Gauge(
+            "upstream_max_concurrent_requests",
+            "Maximum number of Stack Exchange API calls in flight at once.",
+        )
+        self.limiter_events = Counter(
+            "upstream_limiter_events_total",
+            "Upstream calls, backoffs received, stale answers and rejections.",
+            ("event",),
+        )
+        # Functions reading the state of other components into the metrics, on every scrape
+        self.collectors = []
+
+    def expose(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        for collect in self.collectors:
+            collect(self)
+        lines = []
+        for metric in (
+            self.request_duration,
+            self.request_queries,
+            self.request_db_duration,
+            self.excessive_queries,
+            self.upstream_duration,
+            self.pool_size,
+            self.pool_connections,
+            self.pool_checkouts,
+            self.pool_connects,
+            self.pool_timeouts,
+            self.pool_wait,
+            self.pool_wait_max,
+            self.replica_sessions,
+            self.replica_failures,
+            self.replica_down,
+            self.limiter_backoff,
+            self.limiter_quota,
+            self.limiter_inflight,
+            self.limiter_max_concurrent,
+            self.limiter_events,
+        ):
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+def collect_pools(metrics):
+    """Read the connection pools of the application's engines into ``metrics``."""
+    for key, engine in current_app.extensions["sqlalchemy"].engines.items():
+        name = key or "default"
+        stats = pool_stats(engine.pool)
+        if "size" in stats:
+            metrics.pool_size.set(name, value=stats["size"])
+            for state in ("checked_out", "checked_in", "overflow"):
+                metrics.pool_connections.set(name, state, value=stats[state])
+        if "checkouts" in stats:
+            metrics.pool_checkouts.set(name, value=stats["checkouts"])
+            metrics.pool_connects.set(name, value=stats["connects"])
+            metrics.pool_timeouts.set(name, value=stats["timeouts"])
+            metrics.pool_wait.set(name, value=stats["wait_seconds_total"])
+            metrics.pool_wait_max.set(name, value=stats["wait_seconds_max"])
+
+
+def collect_replicas(metrics):
+    """Read the read replicas of the application into ``metrics``."""
+    state = current_app.extensions.get("replicas")
+    if state is None:
+        return
+    for key, replica in state["replicas"].state().items():
+        metrics.replica_sessions.set(key, value=replica["sessions"])
+        metrics.replica_failures.set(key, value=replica["failures"])
+        metrics.replica_down.set(key, value=replica["down_for"])
+
+
+def collect_limiter(metrics):
+    """Read the rate limiter of the Stack Exchange client into ``metrics``."""
+    client = current_app.extensions.get("stackexchange_client")
+    if client is None:
+        return
+    state = client.limiter.state()
+    metrics.limiter_backoff.set(value=state["backoff_remaining"])
+    # The quota is unknown until the first response reported it
+    for kind in ("remaining", "max"):
+        if state[f"quota_{kind}"] is not None:
+            metrics.limiter_quota.set(kind, value=state[f"quota_{kind}"])
+    metrics.limiter_inflight.set(value=state["inflight"])
+    metrics.limiter_max_concurrent.set(value=state["max_concurrent"])
+    for event, count in state["counters"].items():
+        metrics.limiter_events.set(event, value=count)
+
+
+def _request_stats():
+    """Return the figures of the current request, or None outside of a request."""
+    if not has_request_context():
+        return None
+    return g.get("_instrumentation")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_instrumentation_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("_instrumentation_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats = _request_stats()
+    if stats is not None:
+        stats["queries"] += 1
+        stats["db"] += elapsed
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    if context.connection is None:
+        return
+    started = context.connection.info.get("_instrumentation_started")
+    if started:
+        started.pop()
+
+
+class Instrumentation:
+    """
+    Flask extension measuring every request.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Register the middleware on the application.
+
+        Args:
+            app (Flask): The application. ``INSTRUMENTATION_QUERY_THRESHOLD`` is the number of
+                SQL statements above which a request is flagged as a likely N+1.
+        """
+        app.config.setdefault(
+            "INSTRUMENTATION_QUERY_THRESHOLD", DEFAULT_QUERY_THRESHOLD
+        )
+        metrics = Metrics()
+        metrics.collectors.extend([collect_pools, collect_replicas, collect_limiter])
+        app.extensions["instrumentation"] = metrics
+        # First, so that requests answered by another hook (e.g. the database check) are timed
+        app.before_request_funcs.setdefault(None, []).insert(0, self._before_request)
+        app.after_request(self._after_request)
+
+        client = app.extensions.get("stackexchange_client")
+        if client is not None:
+            client.observers.append(
+                lambda url, status, elapsed: self._observe_upstream(
+                    metrics, url, status, elapsed
+                )
+            )
+
+    @staticmethod
+    def _before_request():
+        g._instrumentation = {
+            "started": time.perf_counter(),
+            "queries": 0,
+            "db": 0.0,
+            "upstream_calls": 0,
+            "upstream": 0.0,
+        }
+
+    @staticmethod
+    def _observe_upstream(metrics, url, status, elapsed):
+        metrics.upstream_duration.observe(elapsed, urlparse(url).netloc, str(status))
+        stats = _request_stats()
+        if stats is not None:
+            stats["upstream_calls"] += 1
+            stats["upstream"] += elapsed
+
+    def _after_request(self, response):
+        stats = _request_stats()
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats["started"]
+        response.headers["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={stats["db"] * 1000:.1f};desc="{stats["queries"]} queries"',
+                f'upstream;dur={stats["upstream"] * 1000:.1f};'
+                f'desc="{stats["upstream_calls"]} calls"',
+                f"app;dur={elapsed * 1000:.1f}",
+            ]
+        )
+        if stats["queries"] > current_app.config["INSTRUMENTATION_QUERY_THRESHOLD"]:
+            response.headers["X-Query-Count"] = str(stats["queries"])
+
+        # Record once the body has been sent, to include the streamed part
+        metrics = current_app.extensions["instrumentation"]
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        method = request.method
+        status = str(response.status_code)
+        threshold = current_app.config["INSTRUMENTATION_QUERY_THRESHOLD"]
+        response.call_on_close(
+            lambda: self._record(metrics, stats, method, route, status, threshold)
+        )
+        return response
+
+    @staticmethod
+    def _record(metrics, stats, method, route, status, threshold):
+        elapsed = time.perf_counter() - stats["started"]
+        metrics.request_duration.observe(elapsed, method, route, status)
+        metrics.request_queries.observe(stats["queries"], route)
+        metrics.request_db_duration.observe(stats["db"], route)
+        if stats["queries"] > threshold:
+            metrics.excessive_queries.inc(route)
+            logger.warning(
+                "%s %s executed %d SQL statements (threshold %d), likely an N+1 query",
+                method,
+                route,
+                stats["queries"],
+                threshold,
+            )
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,170 @@
+"""
+Versioned schema migrations.
+
+Each migration is a function that receives a SQLAlchemy connection and is registered with
+the ``migration`` decorator under an increasing version number. ``upgrade`` applies the
+migrations newer than the version recorded in the ``schema_version`` table, one transaction
+per migration, so existing databases are brought up to date in place.
+
+Migrations must be safe to run against a database whose tables were created by an older
+version of the application with ``db.create_all()``, so they check what already exists
+before creating it.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    inspect,
+    select,
+)
+
+from .models.flight_model import (
+    db,
+    Aerolineas,
+    Aeropuertos,
+    Movimientos,
+    Vuelos,
+    VuelosDiarios,
+)
+from .models.changes import create_change_log
+from .models.partitions import create_archive
+from .models.rollup import rebuild_rollup
+from .models.stackexchange_model import StackQuestion, StackSearchSnapshot
+
+# Bookkeeping table, kept out of db.metadata so create_all() never touches it
+_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """
+    Register a migration function under ``version``.
+
+    Args:
+        version (int): The schema version the migration upgrades to.
+        description (str): A short summary stored in the schema_version table.
+    """
+
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return func
+
+    return decorator
+
+
+def current_version(connection):
+    """
+    Return the latest applied schema version, or 0 for an unversioned database.
+    """
+    schema_version.create(connection, checkfirst=True)
+    return connection.scalar(select(func.max(schema_version.c.version))) or 0
+
+
+def upgrade(engine, target=None):
+    """
+    Apply every pending migration up to ``target`` (default: the latest).
+
+    Args:
+        engine: The SQLAlchemy engine of the database to upgrade.
+        target (int, optional): The version to stop at.
+
+    Returns:
+        list: The versions that were applied.
+    """
+    with engine.begin() as connection:
+        version = current_version(connection)
+
+    applied = []
+    for number, description, func in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        with engine.begin() as connection:
+            func(connection)
+            connection.execute(
+                schema_version.insert().values(
+                    version=number,
+                    description=description,
+                    applied_at=datetime.utcnow(),
+                )
+            )
+        applied.append(number)
+    return applied
+
+
+def _create_missing_indexes(connection, table, names=None):
+    """
+    Create the indexes declared on ``table`` that do not exist in the database yet.
+
+    Args:
+        names (Iterable[str], optional): Only consider the indexes with these names, e.g.
+            those whose columns exist at this version.
+    """
+    existing = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+    for index in table.indexes:
+        if names is not None and index.name not in names:
+            continue
+        if index.name not in existing:
+            index.create(connection)
+
+
+@migration(1, "Create the flight tables")
+def _create_flight_tables(connection):
+    db.metadata.create_all(
+        connection,
+        tables=[
+            Aerolineas.__table__,
+            Aeropuertos.__table__,
+            Movimientos.__table__,
+            Vuelos.__table__,
+        ],
+    )
+
+
+@migration(2, "Add composite indexes on vuelos")
+def _add_vuelos_indexes(connection):
+    _create_missing_indexes(
+        connection,
+        Vuelos.__table__,
+        ["ix_vuelos_dia_aeropuerto_movimiento", "ix_vuelos_aerolinea_dia"],
+    )
+
+
+@migration(3, "Create and backfill the vuelos_diarios rollup table")
+def _create_vuelos_diarios(connection):
+    VuelosDiarios.__table__.create(connection, checkfirst=True)
+    # The archive only comes with migration 5
+    rebuild_rollup(connection, include_archive=False)
+
+
+@migration(4, "Create the Stack Exchange snapshot tables")
+def _create_stackexchange_tables(connection):
+    db.metadata.create_all(
+        connection, tables=[StackQuestion.__table__, StackSearchSnapshot.__table__]
+    )
+
+
+@migration(5, "Partition vuelos by month and create the vuelos_archivo archive")
+def _partition_vuelos(connection):
+    create_archive(connection)
+
+
+@migration(6, "Add the change sequence of vuelos and the deleted flights table")
+def _add_change_sequence(connection):
+    create_change_log(connection)
+    _create_missing_indexes(connection, Vuelos.__table__, ["ix_vuelos_seq"])
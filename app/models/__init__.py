@@ -0,0 +1,3 @@
+# Register the session listeners that keep the rollup tables, the change sequence and the
+# dimension cache up to date
+from . import changes, dimension_cache, rollup  # noqa: F401
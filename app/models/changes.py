@@ -0,0 +1,218 @@
+"""
+Change sequence of the Vuelos table, behind the /data/vuelos/changes feed.
+
+Every insert and update of a flight stamps it with the next number of the ``vuelos``
+sequence, kept in a single SecuenciaCambios row: ``seq`` holds the number of the last change
+and ``seq_created`` the one of the insert. Deletes leave a VuelosEliminados row with their
+number. The last number handed out is the watermark of the table, so a client that has seen
+every change up to a number asks for the flights and deletes with a larger one.
+
+Numbers are reserved by incrementing the sequence row inside the writing transaction. The
+row stays locked until the transaction ends, so writers reserve and commit in sequence order
+and a reader can never see a number before a smaller one that is still uncommitted.
+
+ORM writes are stamped by a session ``before_flush`` listener. Code that inserts flights with
+Core statements (bulk loads) must stamp its rows with ``stamp_flights``. Moving months to
+the archive is not reported as deletes, but it advances the sequence so that cached bulk
+reads are invalidated. Writes to the dimension tables, whose names the bulk reads show, move
+the time of the watermark without handing out a number.
+"""
+
+from datetime import datetime, timezone
+
+from sqlalchemy import event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from .flight_model import (
+    Aerolineas,
+    Aeropuertos,
+    Movimientos,
+    SecuenciaCambios,
+    Vuelos,
+    VuelosEliminados,
+)
+
+SEQUENCE = "vuelos"
+
+
+def reserve(connection, count=1):
+    """
+    Reserve the next ``count`` change sequence numbers.
+
+    Args:
+        connection: The connection of the transaction that writes the changes.
+        count (int): The number of changes.
+
+    Returns:
+        int: The first reserved number; the others follow it.
+    """
+    table = SecuenciaCambios.__table__
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    result = connection.execute(
+        update(table)
+        .where(table.c.nombre == SEQUENCE)
+        .values(valor=table.c.valor + count, actualizado=now)
+    )
+    if result.rowcount == 0:
+        connection.execute(
+            insert(table).values(nombre=SEQUENCE, valor=count, actualizado=now)
+        )
+    last = connection.scalar(select(table.c.valor).where(table.c.nombre == SEQUENCE))
+    return last - count + 1
+
+
+def touch(connection):
+    """
+    Move the time of the watermark to now without handing out a number, for writes that
+    change the bulk reads but no flight.
+
+    Args:
+        connection: The connection of the writing transaction.
+    """
+    reserve(connection, 0)
+
+
+def watermark(connection):
+    """
+    Return the last change sequence number and when it was handed out.
+
+    Args:
+        connection: A connection or session.
+
+    Returns:
+        tuple: (number, 0 before the first change; UTC datetime truncated to the second,
+        or None).
+    """
+    table = SecuenciaCambios.__table__
+    row = connection.execute(
+        select(table.c.valor, table.c.actualizado).where(table.c.nombre == SEQUENCE)
+    ).first()
+    if row is None:
+        return 0, None
+    updated = row.actualizado
+    if updated is not None:
+        updated = updated.replace(microsecond=0, tzinfo=timezone.utc)
+    return row.valor, updated
+
+
+def stamp_flights(connection, rows):
+    """
+    Return copies of flight insert parameters stamped with new change sequence numbers.
+
+    Args:
+        connection: The connection of the transaction that inserts the flights.
+        rows (list): The parameters of the flights, one mapping per flight.
+    """
+    first = reserve(connection, len(rows))
+    return [
+        dict(row, seq=number, seq_created=number)
+        for number, row in enumerate(rows, start=first)
+    ]
+
+
+def record_deletes(connection, ids):
+    """
+    Record the deletes of flights for the change feed.
+
+    Args:
+        connection: The connection of the transaction that deletes the flights.
+        ids (list): The IDs of the deleted flights.
+
+    Returns:
+        int: The change sequence number of the first delete; the others follow it.
+    """
+    if not ids:
+        return None
+    first = reserve(connection, len(ids))
+    connection.execute(
+        insert(VuelosEliminados.__table__),
+        [
+            {"id_vuelo": id_vuelo, "seq": number}
+            for number, id_vuelo in enumerate(ids, start=first)
+        ],
+    )
+    return first
+
+
+def create_change_log(connection):
+    """
+    Add the change sequence to an existing vuelos table. Used by the schema migration.
+
+    Existing flights are numbered by ID, as if they had been inserted in that order.
+    """
+    table = Vuelos.__table__
+    existing = {column["name"] for column in inspect(connection).get_columns("vuelos")}
+    for name in ("seq", "seq_created"):
+        if name not in existing:
+            column_type = table.c[name].type.compile(connection.dialect)
+            connection.exec_driver_sql(
+                f"ALTER TABLE vuelos ADD COLUMN {name} {column_type} NOT NULL DEFAULT 0"
+            )
+    connection.execute(
+        update(table)
+        .where(table.c.seq == 0)
+        .values(seq=table.c.id_vuelo, seq_created=table.c.id_vuelo)
+    )
+    VuelosEliminados.__table__.create(connection, checkfirst=True)
+    SecuenciaCambios.__table__.create(connection, checkfirst=True)
+    sequence = SecuenciaCambios.__table__
+    if (
+        connection.scalar(select(sequence.c.valor).where(sequence.c.nombre == SEQUENCE))
+        is None
+    ):
+        connection.execute(
+            insert(sequence).values(
+                nombre=SEQUENCE,
+                valor=connection.scalar(
+                    select(func.coalesce(func.max(table.c.seq), 0))
+                ),
+            )
+        )
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_flights_before_flush(session, flush_context, instances):
+    """
+    Stamp the Vuelos objects about to be written with change sequence numbers and record
+    the deleted ones, whose ``seq`` is set to the number of their delete.
+    """
+    new = [flight for flight in session.new if isinstance(flight, Vuelos)]
+    changed = [
+        flight
+        for flight in session.dirty
+        if isinstance(flight, Vuelos) and session.is_modified(flight)
+    ]
+    deleted = [
+        flight
+        for flight in session.deleted
+        if isinstance(flight, Vuelos) and flight.id_vuelo is not None
+    ]
+    if not new and not changed and not deleted:
+        return
+    connection = session.connection()
+    if new or changed:
+        number = reserve(connection, len(new) + len(changed))
+        for flight in new:
+            flight.seq = flight.seq_created = number
+            number += 1
+        for flight in changed:
+            flight.seq = number
+            number += 1
+    if deleted:
+        number = record_deletes(connection, [flight.id_vuelo for flight in deleted])
+        for flight in deleted:
+            flight.seq = number
+            number += 1
+
+
+@event.listens_for(Session, "before_flush")
+def _touch_before_dimension_writes(session, flush_context, instances):
+    """
+    Move the watermark's time when airlines, airports or movement types are written.
+    """
+    if any(
+        isinstance(instance, (Aerolineas, Aeropuertos, Movimientos))
+        and (instance not in session.dirty or session.is_modified(instance))
+        for instance in (*session.new, *session.dirty, *session.deleted)
+    ):
+        touch(session.connection())
@@ -0,0 +1,187 @@
+"""
+In-process cache of the small dimension tables (Aerolineas, Aeropuertos, Movimientos).
+
+The tables are loaded into memory as id -> name maps together with the pre-serialized JSON
+body and ETag of their list endpoints. A snapshot is reloaded when it is older than
+``DIMENSION_CACHE_TTL`` seconds (so changes made by other workers are picked up) or when the
+cache version is bumped, which happens automatically after a commit that wrote any of the
+three models in this process.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .flight_model import db, Aerolineas, Aeropuertos, Movimientos
+
+# Dimension name -> (model, key column, name column, output key of the name in the list endpoint)
+DIMENSIONS = {
+    "aerolineas": (
+        Aerolineas,
+        Aerolineas.id_aerolinea,
+        Aerolineas.nombre_aerolinea,
+        "nombre",
+    ),
+    "aeropuertos": (
+        Aeropuertos,
+        Aeropuertos.id_aeropuerto,
+        Aeropuertos.nombre_aeropuerto,
+        "nombre",
+    ),
+    "movimientos": (
+        Movimientos,
+        Movimientos.id_movimiento,
+        Movimientos.descripcion,
+        "descripcion",
+    ),
+}
+
+DEFAULT_TTL = 300
+
+
+class DimensionSnapshot:
+    """
+    An immutable copy of the dimension tables.
+
+    Attributes:
+        version (int): The cache version the snapshot was loaded for.
+        names (dict): Dimension name -> {id: name}, ordered by id.
+        payloads (dict): Dimension name -> JSON bytes of the full list endpoint response.
+        etags (dict): Dimension name -> ETag of the payload.
+    """
+
+    def __init__(self, version, names):
+        self.version = version
+        self.names = names
+        self.payloads = {}
+        self.etags = {}
+        for dimension, items in names.items():
+            name_key = DIMENSIONS[dimension][3]
+            payload = json.dumps(
+                [{"id": key, name_key: name} for key, name in items.items()],
+                separators=(",", ":"),
+            ).encode()
+            self.payloads[dimension] = payload
+            self.etags[dimension] = hashlib.sha1(payload).hexdigest()
+
+
+class DimensionCache:
+    """
+    Flask extension holding one dimension snapshot per application.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Register the cache on the application.
+
+        Args:
+            app (Flask): The application. ``DIMENSION_CACHE_TTL`` sets the snapshot lifetime.
+        """
+        app.config.setdefault("DIMENSION_CACHE_TTL", DEFAULT_TTL)
+        app.extensions["dimension_cache"] = {
+            "lock": threading.Lock(),
+            "version": 0,
+            "snapshot": None,
+            "loaded_at": 0.0,
+        }
+
+    def _state(self):
+        return current_app.extensions["dimension_cache"]
+
+    def invalidate(self):
+        """
+        Bump the cache version so that the next read reloads the tables.
+        """
+        state = self._state()
+        with state["lock"]:
+            state["version"] += 1
+
+    def snapshot(self):
+        """
+        Return the current snapshot, reloading it from the database when stale.
+
+        Returns:
+            DimensionSnapshot: The dimension tables.
+        """
+        state = self._state()
+        snapshot = state["snapshot"]
+        ttl = current_app.config["DIMENSION_CACHE_TTL"]
+        if (
+            snapshot is not None
+            and snapshot.version == state["version"]
+            and time.monotonic() - state["loaded_at"] < ttl
+        ):
+            return snapshot
+
+        with state["lock"]:
+            snapshot = state["snapshot"]
+            if (
+                snapshot is None
+                or snapshot.version != state["version"]
+                or time.monotonic() - state["loaded_at"] >= ttl
+            ):
+                snapshot = DimensionSnapshot(state["version"], self._load())
+                state["snapshot"] = snapshot
+                state["loaded_at"] = time.monotonic()
+            return snapshot
+
+    def names(self, dimension):
+        """
+        Return the id -> name map of a dimension.
+
+        Args:
+            dimension (str): One of ``aerolineas``, ``aeropuertos`` or ``movimientos``.
+        """
+        return self.snapshot().names[dimension]
+
+    @staticmethod
+    def _load():
+        names = {}
+        for dimension, (_, key, name, _) in DIMENSIONS.items():
+            # Always from the primary: a snapshot loaded from a lagging replica would be
+            # served, stale, for DIMENSION_CACHE_TTL seconds
+            rows = db.session.execute(
+                select(key, name).order_by(key), bind_arguments={"bind": db.engine}
+            )
+            names[dimension] = {row[0]: row[1] for row in rows}
+        return names
+
+
+dimension_cache = DimensionCache()
+
+_DIMENSION_MODELS = tuple(model for model, _, _, _ in DIMENSIONS.values())
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_dimension_writes(session, flush_context):
+    """
+    Remember that the transaction wrote a dimension table.
+    """
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, _DIMENSION_MODELS):
+            session.info["dimensions_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    """
+    Invalidate the cache once a transaction that wrote a dimension table is committed.
+    """
+    if session.info.pop("dimensions_changed", False) and has_app_context():
+        if "dimension_cache" in current_app.extensions:
+            dimension_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_dimension_writes(session):
+    session.info.pop("dimensions_changed", None)
@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from .routing_session import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 class Aerolineas(db.Model):
@@ -57,8 +59,29 @@ class Vuelos(db.Model):
     Model for the Vuelos table.
     Represents flights with an auto-incrementing ID, links to airlines (Aerolineas),
     airports (Aeropuertos), movements (Movimientos), and a date.
+
+    ``seq`` is the change sequence number of the last insert or update of the flight and
+    ``seq_created`` the one of its insert; both are set by app.models.changes.
+
+    Indexes:
+        ix_vuelos_dia_aeropuerto_movimiento: Flights of an airport and movement type by date.
+        ix_vuelos_aerolinea_dia: Flights of an airline by date.
+        ix_vuelos_seq: Flights changed after a change sequence number.
     """
 
+    __table_args__ = (
+        db.Index(
+            "ix_vuelos_dia_aeropuerto_movimiento",
+            "dia",
+            "id_aeropuerto",
+            "id_movimiento",
+        ),
+        db.Index("ix_vuelos_aerolinea_dia", "id_aerolinea", "dia"),
+        db.Index("ix_vuelos_seq", "seq"),
+        # Archived flights keep their IDs: SQLite must never hand them out again
+        {"sqlite_autoincrement": True},
+    )
+
     id_vuelo = db.Column(db.Integer, primary_key=True, autoincrement=True)
     id_aerolinea = db.Column(
         db.Integer, db.ForeignKey("aerolineas.id_aerolinea"), nullable=False
@@ -70,6 +93,54 @@ class Vuelos(db.Model):
         db.Integer, db.ForeignKey("movimientos.id_movimiento"), nullable=False
     )
     dia = db.Column(db.Date, nullable=False)
+    seq = db.Column(db.BigInteger, nullable=False, server_default="0")
+    seq_created = db.Column(db.BigInteger, nullable=False, server_default="0")
 
     def __repr__(self):
         return f"<Vuelos {self.id_vuelo}>"
+
+
+class VuelosEliminados(db.Model):
+    """
+    Model for the VuelosEliminados table.
+    Records the deleted flights with the change sequence number of their delete, so that the
+    change feed can report deletes.
+    """
+
+    id_vuelo = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    seq = db.Column(db.BigInteger, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<VuelosEliminados {self.id_vuelo}>"
+
+
+class SecuenciaCambios(db.Model):
+    """
+    Model for the SecuenciaCambios table.
+    Holds the last change sequence number handed out for a table and when it was handed out.
+    """
+
+    nombre = db.Column(db.String(64), primary_key=True)
+    valor = db.Column(db.BigInteger, nullable=False, default=0)
+    actualizado = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<SecuenciaCambios {self.nombre} {self.valor}>"
+
+
+class VuelosDiarios(db.Model):
+    """
+    Model for the VuelosDiarios rollup table.
+    Holds the number of flights per day, airport, airline and movement type. It is kept up to
+    date incrementally as Vuelos rows are written (see app.models.rollup) so that statistics
+    never have to aggregate the full Vuelos table.
+    """
+
+    dia = db.Column(db.Date, primary_key=True)
+    id_aeropuerto = db.Column(db.Integer, primary_key=True)
+    id_aerolinea = db.Column(db.Integer, primary_key=True)
+    id_movimiento = db.Column(db.Integer, primary_key=True)
+    total_vuelos = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<VuelosDiarios {self.dia} {self.total_vuelos}>"
@@ -0,0 +1,295 @@
+"""
+Monthly layout of the vuelos table and the archive of old months.
+
+Flights are written to ``vuelos`` and almost every query reads recent days. To keep those
+queries fast as history grows, months older than the hot window are moved to the
+``vuelos_archivo`` archive, which the /data/vuelos routes only read with
+``include_archive=true``:
+
+* MySQL: ``vuelos`` is RANGE COLUMNS partitioned on ``dia``, one ``pYYYYMM`` partition per
+  month plus ``pfuture`` for the dates past the last one. ``ensure_partitions`` splits
+  ``pfuture`` ahead of time. Archiving copies a partition into ``vuelos_archivo`` (InnoDB,
+  compressed rows) and drops it, which takes the same time whatever the partition's size.
+  Partitioned tables cannot have foreign keys and must have ``dia`` in their primary key, so
+  the migration replaces the foreign keys of vuelos with an (id_vuelo, dia) primary key.
+* SQLite: there is no partitioning, and nothing here is equivalent to it. The hot months
+  share the single vuelos table, and archiving a month copies it out and DELETEs its rows
+  through the ``dia`` index, which takes time proportional to the month's size. Only the
+  archive is split: each archived month gets its own ``vuelos_archivo_pYYYYMM`` table and
+  ``vuelos_archivo`` is a view over their UNION ALL, so an archived month can be dropped as
+  a table. vuelos uses AUTOINCREMENT so that the IDs of archived flights are never reused.
+* Other databases: ``vuelos_archivo`` is a plain table and months are moved with
+  INSERT ... SELECT and DELETE.
+
+The vuelos_diarios rollup is left untouched: statistics keep covering archived months, and
+``rebuild_rollup`` counts the archive too.
+"""
+
+from datetime import date
+
+from sqlalchemy import (
+    Column,
+    Date,
+    Integer,
+    MetaData,
+    Table,
+    delete,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+    union_all,
+)
+
+from .flight_model import Vuelos
+
+COLUMNS = ("id_vuelo", "id_aerolinea", "id_aeropuerto", "id_movimiento", "dia")
+
+ARCHIVE = "vuelos_archivo"
+FUTURE_PARTITION = "pfuture"
+
+# Months of empty partitions kept ready past the current month
+DEFAULT_PARTITIONS_AHEAD = 3
+
+# Archive tables are kept out of db.metadata: on SQLite the archive is a view
+_metadata = MetaData()
+
+
+def _archive_table(name, metadata, **kwargs):
+    return Table(
+        name,
+        metadata,
+        Column("id_vuelo", Integer, primary_key=True, autoincrement=False),
+        Column("id_aerolinea", Integer, nullable=False),
+        Column("id_aeropuerto", Integer, nullable=False),
+        Column("id_movimiento", Integer, nullable=False),
+        Column("dia", Date, nullable=False, index=True),
+        **kwargs,
+    )
+
+
+vuelos_archivo = _archive_table(ARCHIVE, _metadata, mysql_row_format="COMPRESSED")
+
+
+def month_start(day):
+    """Return the first day of the month of ``day``."""
+    return day.replace(day=1)
+
+
+def add_months(month, count):
+    """Return the first day of the month ``count`` months after ``month``."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    """Return the name of the partition (or SQLite table suffix) of a month."""
+    return f"p{month:%Y%m}"
+
+
+def _partition_month(name):
+    return date(int(name[1:5]), int(name[5:7]), 1)
+
+
+def _months(first, last):
+    """Return the months from ``first`` to ``last``, both included."""
+    months = []
+    while first <= last:
+        months.append(first)
+        first = add_months(first, 1)
+    return months
+
+
+def vuelos_source(include_archive=False):
+    """
+    Return the selectable the flight queries read from.
+
+    Args:
+        include_archive (bool): Also read the archived months.
+
+    Returns:
+        The vuelos table, or a UNION ALL of vuelos and the archive with the same columns.
+    """
+    table = Vuelos.__table__
+    if not include_archive:
+        return table
+    return union_all(
+        select(*(table.c[name] for name in COLUMNS)),
+        select(*(vuelos_archivo.c[name] for name in COLUMNS)),
+    ).subquery("vuelos_todos")
+
+
+def create_archive(connection, months_ahead=DEFAULT_PARTITIONS_AHEAD):
+    """
+    Lay out vuelos by month and create the empty archive. Used by the schema migration.
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        _use_autoincrement(connection)
+        _create_archive_view(connection)
+        return
+    vuelos_archivo.create(connection, checkfirst=True)
+    if dialect == "mysql" and not _mysql_partitions(connection):
+        _partition_mysql(connection, months_ahead)
+
+
+def ensure_partitions(connection, months_ahead=DEFAULT_PARTITIONS_AHEAD, today=None):
+    """
+    Create the monthly partitions of vuelos up to ``months_ahead`` months after the current
+    one. Only MySQL has partitions; elsewhere this does nothing.
+
+    Returns:
+        list: The months whose partitions were created.
+    """
+    if connection.dialect.name != "mysql":
+        return []
+    existing = _mysql_partitions(connection)
+    if not existing:
+        return []
+    last = add_months(month_start(today or date.today()), months_ahead)
+    months = _months(add_months(_partition_month(existing[-1]), 1), last)
+    if months:
+        connection.exec_driver_sql(
+            f"ALTER TABLE vuelos REORGANIZE PARTITION {FUTURE_PARTITION} INTO "
+            f"({_partition_definitions(months)})"
+        )
+    return months
+
+
+def archive_months(connection, before):
+    """
+    Move the flights of the months before ``before`` from vuelos to the archive.
+
+    Args:
+        connection: A connection to the primary database.
+        before (date): The first month that stays in vuelos.
+
+    Returns:
+        list: (month, number of flights) of every archived month, oldest first.
+    """
+    dialect = connection.dialect.name
+    if dialect == "mysql":
+        return _archive_partitions(connection, before)
+
+    table = Vuelos.__table__
+    first = connection.scalar(select(func.min(table.c.dia)).where(table.c.dia < before))
+    if first is None:
+        return []
+    archived = []
+    for month in _months(month_start(first), add_months(before, -1)):
+        window = (table.c.dia >= month, table.c.dia < add_months(month, 1))
+        if not connection.scalar(select(func.count()).where(*window)):
+            continue
+        if dialect == "sqlite":
+            target = _archive_table(f"{ARCHIVE}_{partition_name(month)}", MetaData())
+            target.create(connection, checkfirst=True)
+        else:
+            target = vuelos_archivo
+        moved = connection.execute(
+            insert(target).from_select(
+                COLUMNS, select(*(table.c[name] for name in COLUMNS)).where(*window)
+            )
+        ).rowcount
+        connection.execute(delete(table).where(*window))
+        archived.append((month, moved))
+    if dialect == "sqlite" and archived:
+        _create_archive_view(connection)
+    return archived
+
+
+def _archive_partitions(connection, before):
+    archived = []
+    columns = ", ".join(COLUMNS)
+    for name in _mysql_partitions(connection):
+        month = _partition_month(name)
+        if month >= before:
+            break
+        # IGNORE makes a rerun after a failure between the copy and the drop harmless
+        moved = connection.exec_driver_sql(
+            f"INSERT IGNORE INTO {ARCHIVE} ({columns}) "
+            f"SELECT {columns} FROM vuelos PARTITION ({name})"
+        ).rowcount
+        connection.exec_driver_sql(f"ALTER TABLE vuelos DROP PARTITION {name}")
+        archived.append((month, moved))
+    return archived
+
+
+def _mysql_partitions(connection):
+    """Return the names of the monthly partitions of vuelos, oldest first."""
+    names = connection.scalars(
+        text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'vuelos' "
+            "AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION"
+        )
+    )
+    return [name for name in names if name != FUTURE_PARTITION]
+
+
+def _partition_definitions(months):
+    return ", ".join(
+        [
+            f"PARTITION {partition_name(month)} "
+            f"VALUES LESS THAN ('{add_months(month, 1).isoformat()}')"
+            for month in months
+        ]
+        + [f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)"]
+    )
+
+
+def _partition_mysql(connection, months_ahead):
+    for foreign_key in inspect(connection).get_foreign_keys("vuelos"):
+        connection.exec_driver_sql(
+            f"ALTER TABLE vuelos DROP FOREIGN KEY {foreign_key['name']}"
+        )
+    connection.exec_driver_sql(
+        "ALTER TABLE vuelos DROP PRIMARY KEY, ADD PRIMARY KEY (id_vuelo, dia)"
+    )
+    first = connection.scalar(select(func.min(Vuelos.__table__.c.dia)))
+    current = month_start(date.today())
+    months = _months(
+        month_start(min(first or current, current)), add_months(current, months_ahead)
+    )
+    connection.exec_driver_sql(
+        "ALTER TABLE vuelos PARTITION BY RANGE COLUMNS(dia) "
+        f"({_partition_definitions(months)})"
+    )
+
+
+def _use_autoincrement(connection):
+    """
+    Rebuild a SQLite vuelos table created without AUTOINCREMENT, which reuses the largest
+    IDs once their rows have been archived.
+    """
+    sql = connection.scalar(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'vuelos'")
+    )
+    if "AUTOINCREMENT" in sql.upper():
+        return
+    for index in inspect(connection).get_indexes("vuelos"):
+        connection.exec_driver_sql(f"DROP INDEX {index['name']}")
+    connection.exec_driver_sql("ALTER TABLE vuelos RENAME TO _vuelos_old")
+    Vuelos.__table__.create(connection)
+    columns = ", ".join(COLUMNS)
+    connection.exec_driver_sql(
+        f"INSERT INTO vuelos ({columns}) SELECT {columns} FROM _vuelos_old"
+    )
+    connection.exec_driver_sql("DROP TABLE _vuelos_old")
+
+
+def _create_archive_view(connection):
+    """(Re)create the SQLite archive view over the per-month archive tables."""
+    columns = ", ".join(COLUMNS)
+    tables = sorted(
+        name
+        for name in inspect(connection).get_table_names()
+        if name.startswith(f"{ARCHIVE}_p")
+    )
+    selects = [f"SELECT {columns} FROM {name}" for name in tables] or [
+        f"SELECT {columns} FROM vuelos WHERE 0"
+    ]
+    connection.exec_driver_sql(f"DROP VIEW IF EXISTS {ARCHIVE}")
+    connection.exec_driver_sql(
+        f"CREATE VIEW {ARCHIVE} AS " + " UNION ALL ".join(selects)
+    )
@@ -0,0 +1,186 @@
+"""
+Incremental maintenance of the VuelosDiarios rollup table.
+
+ORM writes to Vuelos are picked up by a session ``after_flush`` listener, which turns the
+inserted, updated and deleted flights into per-key deltas and applies them in the same
+transaction. Code that writes Vuelos with Core statements (bulk loads) must call
+``apply_rollup_deltas`` itself. ``rebuild_rollup`` recomputes the whole table for backfills,
+from the hot and the archived flights alike.
+"""
+
+from collections import Counter
+
+from sqlalchemy import delete, event, func, inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+from .flight_model import Vuelos, VuelosDiarios
+from .partitions import vuelos_source
+
+ROLLUP_KEY = ("dia", "id_aeropuerto", "id_aerolinea", "id_movimiento")
+
+
+def rollup_key(values):
+    """
+    Return the rollup key of a flight given as a mapping of column values.
+    """
+    return tuple(values[column] for column in ROLLUP_KEY)
+
+
+def count_flights(rows):
+    """
+    Count flights per rollup key.
+
+    Args:
+        rows (Iterable[Mapping]): Flight column values, e.g. the parameters of a bulk insert.
+
+    Returns:
+        Counter: The number of flights per rollup key.
+    """
+    return Counter(rollup_key(row) for row in rows)
+
+
+def _upsert_statement(dialect_name):
+    """
+    Return an INSERT that adds to ``total_vuelos`` when the key exists, or None when the
+    dialect has no upsert support.
+    """
+    table = VuelosDiarios.__table__
+    if dialect_name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        statement = mysql_insert(table)
+        return statement.on_duplicate_key_update(
+            total_vuelos=table.c.total_vuelos + statement.inserted.total_vuelos
+        )
+    if dialect_name in ("sqlite", "postgresql"):
+        if dialect_name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        statement = dialect_insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=list(ROLLUP_KEY),
+            set_={
+                "total_vuelos": table.c.total_vuelos + statement.excluded.total_vuelos
+            },
+        )
+    return None
+
+
+def apply_rollup_deltas(connection, deltas):
+    """
+    Add per-key flight count deltas to the rollup table.
+
+    Args:
+        connection: The connection of the transaction that wrote the flights.
+        deltas (Mapping): Rollup key tuples mapped to the change in number of flights.
+    """
+    table = VuelosDiarios.__table__
+    rows = [
+        dict(zip(ROLLUP_KEY, key), total_vuelos=delta)
+        for key, delta in deltas.items()
+        if delta
+    ]
+    if not rows:
+        return
+
+    upsert = _upsert_statement(connection.dialect.name)
+    if upsert is not None:
+        connection.execute(upsert, rows)
+    else:
+        for row in rows:
+            match = [table.c[column] == row[column] for column in ROLLUP_KEY]
+            result = connection.execute(
+                update(table)
+                .where(*match)
+                .values(total_vuelos=table.c.total_vuelos + row["total_vuelos"])
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(table).values(**row))
+
+    if any(row["total_vuelos"] < 0 for row in rows):
+        connection.execute(delete(table).where(table.c.total_vuelos <= 0))
+
+
+def rebuild_rollup(connection, include_archive=True):
+    """
+    Recompute the rollup table from the flights, e.g. after a backfill or a manual data fix.
+
+    Args:
+        connection: A connection to the primary database.
+        include_archive (bool): Also count the archived months, as the rollup always does.
+            Only the migrations that run before the archive exists leave it out.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    table = VuelosDiarios.__table__
+    connection.execute(delete(table))
+    source = vuelos_source(include_archive)
+    key = [source.c[column] for column in ROLLUP_KEY]
+    aggregate = select(*key, func.count().label("total_vuelos")).group_by(*key)
+    connection.execute(
+        insert(table).from_select(list(ROLLUP_KEY) + ["total_vuelos"], aggregate)
+    )
+    return connection.scalar(select(func.count()).select_from(table))
+
+
+def _current_key(flight):
+    """
+    Return the rollup key of a flight object with its pending changes applied.
+    """
+    return tuple(getattr(flight, column) for column in ROLLUP_KEY)
+
+
+def _previous_key(flight):
+    """
+    Return the rollup key a modified flight had before the pending changes.
+    """
+    state = inspect(flight)
+    values = {}
+    for column in ROLLUP_KEY:
+        history = state.attrs[column].history
+        values[column] = (
+            history.deleted[0] if history.deleted else getattr(flight, column)
+        )
+    return rollup_key(values)
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    """
+    No-op ``set`` listener. Registering it with ``active_history=True`` makes SQLAlchemy load
+    the previous value of an expired rollup key column before it is overwritten, so that
+    ``_previous_key`` can find the rollup row to decrement.
+    """
+    return value
+
+
+for _column in ROLLUP_KEY:
+    event.listen(
+        getattr(Vuelos, _column),
+        "set",
+        _load_previous_value,
+        active_history=True,
+        retval=True,
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _update_rollup_after_flush(session, flush_context):
+    """
+    Apply the rollup deltas of the Vuelos objects written by a flush.
+    """
+    deltas = Counter()
+    for flight in session.new:
+        if isinstance(flight, Vuelos):
+            deltas[_current_key(flight)] += 1
+    for flight in session.deleted:
+        if isinstance(flight, Vuelos):
+            deltas[_previous_key(flight)] -= 1
+    for flight in session.dirty:
+        if isinstance(flight, Vuelos) and session.is_modified(flight):
+            deltas[_previous_key(flight)] -= 1
+            deltas[_current_key(flight)] += 1
+    if any(deltas.values()):
+        apply_rollup_deltas(session.connection(), deltas)
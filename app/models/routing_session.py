@@ -0,0 +1,132 @@
+"""
+A session that sends reads to read replicas and everything else to the primary.
+
+Routing is opt-in per session: the ``Replicas`` extension enables it for the read-only
+requests of selected blueprints by storing a ``ReplicaSet`` in ``session.info["replicas"]``.
+A session with routing enabled sends SELECT statements on the default bind to a replica,
+chosen round-robin among the healthy ones and then kept for the rest of the session so that
+a request sees a single, consistent replica. A replica that cannot be reached is skipped for
+a while and the read goes to the next one, or to the primary when none is left.
+
+Reads go back to the primary (read-your-writes) for the rest of the session once it has
+written anything, or after ``use_primary`` was called.
+"""
+
+import itertools
+import threading
+import time
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import OperationalError
+
+
+class ReplicaSet:
+    """
+    The replica binds of an application, with round-robin selection and failure tracking.
+
+    Args:
+        keys (list): The bind keys of the replicas.
+        retry_after (float): Seconds a replica that failed to connect is skipped.
+    """
+
+    def __init__(self, keys, retry_after):
+        self.keys = list(keys)
+        self.retry_after = retry_after
+        self._down_until = {}
+        self._reads = dict.fromkeys(self.keys, 0)
+        self._failures = dict.fromkeys(self.keys, 0)
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def candidates(self):
+        """
+        Return the healthy replicas in the order they should be tried, rotating the first.
+        """
+        if not self.keys:
+            return []
+        start = next(self._next) % len(self.keys)
+        now = time.monotonic()
+        with self._lock:
+            return [
+                key
+                for key in self.keys[start:] + self.keys[:start]
+                if self._down_until.get(key, 0) <= now
+            ]
+
+    def mark_down(self, key):
+        """Skip a replica for ``retry_after`` seconds."""
+        with self._lock:
+            self._down_until[key] = time.monotonic() + self.retry_after
+            self._failures[key] += 1
+
+    def mark_used(self, key):
+        """Count a session served by a replica."""
+        with self._lock:
+            self._down_until.pop(key, None)
+            self._reads[key] += 1
+
+    def state(self):
+        """
+        Return a snapshot of the replicas for the metrics.
+
+        Returns:
+            dict: Per replica bind key, the sessions it served, its connection failures and
+            the seconds it is still skipped for.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: {
+                    "sessions": self._reads[key],
+                    "failures": self._failures[key],
+                    "down_for": round(max(0.0, self._down_until.get(key, 0) - now), 3),
+                }
+                for key in self.keys
+            }
+
+
+def use_primary(session):
+    """
+    Send the remaining reads of ``session`` to the primary, e.g. to read back a write.
+    """
+    session.info["primary"] = True
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session routing reads to the replicas in ``info["replicas"]``.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        replicas = self.info.get("replicas")
+        if replicas is None or bind is not None:
+            return primary
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info["primary"] = True
+            return primary
+        if (
+            self.info.get("primary")
+            or not getattr(clause, "is_select", False)
+            or primary is not self._db.engines.get(None)
+        ):
+            return primary
+        return self._replica(replicas, primary)
+
+    def _replica(self, replicas, primary):
+        key = self.info.get("replica")
+        if key is not None:
+            return self._db.engines[key]
+        for key in replicas.candidates():
+            engine = self._db.engines[key]
+            try:
+                # Connect now, inside the session's transaction, so that an unreachable
+                # replica fails over before the statement runs
+                self.connection(bind_arguments={"bind": engine})
+            except OperationalError:
+                replicas.mark_down(key)
+                continue
+            replicas.mark_used(key)
+            self.info["replica"] = key
+            return engine
+        return primary
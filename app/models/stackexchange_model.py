@@ -0,0 +1,57 @@
+from .flight_model import db
+
+
+class StackQuestion(db.Model):
+    """
+    Model for the StackQuestion table.
+    Snapshot of a question returned by a Stack Exchange ``/search`` for a given ``intitle``
+    and site. The columns the analytics routes filter and sort on are stored next to the raw
+    item so that the routes answer from indexed queries and still return the API's shape.
+
+    Attributes:
+        intitle (db.String): The search term the question was found with.
+        site (db.String): The Stack Exchange site, e.g. ``stackoverflow``.
+        question_id (db.Integer): The question's ID on the site.
+        owner_reputation (db.Integer): The owner's reputation, 0 when missing.
+        item (db.Text): The question as returned by the API, as JSON.
+    """
+
+    __table_args__ = (
+        db.Index("ix_stack_question_reputation", "intitle", "site", "owner_reputation"),
+        db.Index("ix_stack_question_views", "intitle", "site", "view_count"),
+        db.Index("ix_stack_question_created", "intitle", "site", "creation_date"),
+        db.Index("ix_stack_question_answered", "intitle", "site", "is_answered"),
+    )
+
+    intitle = db.Column(db.String(255), primary_key=True)
+    site = db.Column(db.String(64), primary_key=True)
+    question_id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(512), nullable=False)
+    is_answered = db.Column(db.Boolean, nullable=False)
+    view_count = db.Column(db.Integer, nullable=False)
+    answer_count = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+    creation_date = db.Column(db.BigInteger, nullable=False)
+    last_activity_date = db.Column(db.BigInteger, nullable=False)
+    owner_reputation = db.Column(db.Integer, nullable=False)
+    item = db.Column(db.Text, nullable=False)
+
+    def __repr__(self):
+        return f"<StackQuestion {self.site} {self.question_id}>"
+
+
+class StackSearchSnapshot(db.Model):
+    """
+    Model for the StackSearchSnapshot table.
+    Records the last complete ingestion of a search. The analytics routes only answer from
+    StackQuestion when a snapshot exists for their search.
+    """
+
+    intitle = db.Column(db.String(255), primary_key=True)
+    site = db.Column(db.String(64), primary_key=True)
+    total = db.Column(db.Integer, nullable=False)
+    pages = db.Column(db.Integer, nullable=False)
+    completed_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<StackSearchSnapshot {self.intitle}@{self.site}>"
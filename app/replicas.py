@@ -0,0 +1,111 @@
+"""
+Read replicas.
+
+``DATABASE_REPLICA_URIS`` lists the read replicas of the primary database. ``init_app``
+declares each of them as a Flask-SQLAlchemy bind (``replica1``, ``replica2``, ...) with the
+same pool options as the primary, so it must run before ``db.init_app``. Replicas are kept
+up to date by the database's own replication: ``flask db-init`` and the loaders only ever
+write to the primary.
+
+GET and HEAD requests of the blueprints passed to ``route_reads`` read from the replicas
+through the ``RoutingSession``, as do the requests of other methods a blueprint declares as
+reads (the POST of /batch); every other request, and everything outside of requests, uses
+the primary. A client that must see its own recent writes, despite the replication lag,
+sends ``X-Read-Primary: true``.
+"""
+
+from flask import current_app, request
+
+from .database import engine_options
+from .models.routing_session import ReplicaSet
+
+REPLICA_BIND_PREFIX = "replica"
+
+# Seconds a replica that failed to connect is skipped before being tried again
+DEFAULT_REPLICA_RETRY = 30
+
+READ_PRIMARY_HEADER = "X-Read-Primary"
+
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+
+def replica_binds(config):
+    """
+    Build the Flask-SQLAlchemy binds of the replicas in ``DATABASE_REPLICA_URIS``.
+
+    Args:
+        config (Mapping): The application configuration.
+
+    Returns:
+        dict: Bind key to engine options, including the ``url``.
+    """
+    return {
+        f"{REPLICA_BIND_PREFIX}{index}": dict(
+            engine_options(dict(config, SQLALCHEMY_DATABASE_URI=uri)), url=uri
+        )
+        for index, uri in enumerate(config.get("DATABASE_REPLICA_URIS") or (), 1)
+    }
+
+
+class Replicas:
+    """
+    Flask extension routing the reads of selected blueprints to read replicas.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Declare the replica binds and register the routing on the application.
+
+        Args:
+            app (Flask): The application. ``DATABASE_REPLICA_URIS`` lists the replicas and
+                ``DATABASE_REPLICA_RETRY`` is the number of seconds a failed replica is
+                skipped.
+        """
+        binds = replica_binds(app.config)
+        app.config["SQLALCHEMY_BINDS"] = dict(
+            app.config.get("SQLALCHEMY_BINDS") or {}, **binds
+        )
+        app.extensions["replicas"] = {
+            "replicas": ReplicaSet(
+                binds,
+                app.config.get("DATABASE_REPLICA_RETRY", DEFAULT_REPLICA_RETRY),
+            ),
+            "routed": {},
+        }
+        if binds:
+            app.before_request(self._before_request)
+            app.teardown_request(self._teardown_request)
+
+    def route_reads(self, app, blueprint, methods=READ_METHODS):
+        """
+        Serve the read requests of ``blueprint`` from the replicas.
+
+        Args:
+            app (Flask): The application.
+            blueprint (Blueprint): The blueprint.
+            methods (Iterable): The HTTP methods of its requests that only read.
+        """
+        app.extensions["replicas"]["routed"][blueprint.name] = frozenset(methods)
+
+    @staticmethod
+    def _before_request():
+        state = current_app.extensions["replicas"]
+        read_methods = state["routed"].get(request.blueprint, ())
+        read_primary = request.headers.get(READ_PRIMARY_HEADER, "").lower()
+        if request.method in read_methods and read_primary not in ("1", "true", "yes"):
+            current_app.extensions["sqlalchemy"].session.info["replicas"] = state[
+                "replicas"
+            ]
+
+    @staticmethod
+    def _teardown_request(exc):
+        info = current_app.extensions["sqlalchemy"].session.info
+        for key in ("replicas", "replica", "primary"):
+            info.pop(key, None)
+
+
+replicas = Replicas()
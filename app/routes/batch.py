@@ -0,0 +1,284 @@
+"""
+Batch reads: the lookups, flights, stats and Stack Exchange reads of a page in one request.
+
+Each sub-request names a resource, its filters and fields, which are passed to the route of
+the resource as its query parameters. The routes run one after the other on the batch's
+database session, with the usual error handlers, so every sub-request answers exactly what
+the separate GET would. Identical sub-requests are run once.
+
+The Stack Exchange searches behind the sub-requests are fetched up front: each distinct
+(intitle, site) search is called once, however many routes need it, and the calls run
+concurrently with the database sub-requests, in a request context of their own. A page thus
+waits for its slowest call instead of the sum of its calls.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from flask import Blueprint, current_app, jsonify, request
+from flask.globals import request_ctx
+from werkzeug.exceptions import InternalServerError
+from werkzeug.test import EnvironBuilder
+
+from ..models.flight_model import db
+from .flight_data import MAX_PAGE_SIZE
+from .stackexchange import (
+    fetch_searches,
+    live_searches,
+    prefetched_searches,
+    search_pair,
+)
+
+logger = logging.getLogger(__name__)
+
+batch_bp = Blueprint("batch", __name__)
+
+# Resources of the sub-requests and the endpoints serving them. Streams and exports are
+# left out: their bodies do not fit in a JSON response.
+RESOURCES = {
+    "aerolineas": "data_routes.get_aerolineas",
+    "aeropuertos": "data_routes.get_aeropuertos",
+    "movimientos": "data_routes.get_movimientos",
+    "vuelos": "data_routes.get_vuelos",
+    "vuelos/changes": "data_routes.get_vuelos_changes",
+    "stats/aeropuertos": "stats_routes.get_aeropuertos_stats",
+    "stats/aerolineas": "stats_routes.get_aerolineas_stats",
+    "stats/aerolineas/por-dia": "stats_routes.get_aerolineas_por_dia_stats",
+    "stats/dias": "stats_routes.get_dias_stats",
+    "stackexchange": "stack_exchange.stack_exchange_route",
+    "stackexchange/answered-unanswered": "stack_exchange.answered_unanswered_route",
+    "stackexchange/highest-reputation": "stack_exchange.highest_reputation_route",
+    "stackexchange/fewest-views": "stack_exchange.fewest_views_route",
+    "stackexchange/oldest-recent": "stack_exchange.oldest_recent_route",
+    "stackexchange/summary": "stack_exchange.summary_route",
+}
+
+# Largest number of sub-requests of one batch
+MAX_BATCH_REQUESTS = 20
+
+
+class InvalidBatch(ValueError):
+    """
+    Raised when the body of a batch request is malformed.
+    """
+
+
+@batch_bp.errorhandler(InvalidBatch)
+def handle_invalid_batch(error):
+    """
+    Report a malformed batch to the client.
+
+    Returns:
+        A JSON object with the error message and a 400 status code.
+    """
+    return jsonify({"error": str(error)}), 400
+
+
+def _query_value(name, value):
+    """
+    Convert a filter value of the JSON body to its query string form: lists are joined
+    with commas, as in ``id_aerolinea=1,3``.
+    """
+    if isinstance(value, list):
+        value = ",".join(str(item) for item in value)
+    elif isinstance(value, bool):
+        value = "true" if value else "false"
+    elif not isinstance(value, (str, int, float)):
+        raise InvalidBatch(f"Filter '{name}' must be a string, a number or a list")
+    return str(value)
+
+
+def parse_batch(payload):
+    """
+    Validate the body of a batch request.
+
+    Args:
+        payload: The decoded JSON body, ``{"requests": [{"id", "resource", "filters",
+            "fields"}, ...]}``. Only ``resource`` is required; ``id`` defaults to the
+            position of the sub-request and ``fields`` is a list or a comma-separated string.
+
+    Returns:
+        list: (id, endpoint, query parameters) of each sub-request, in order.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get("requests"), list):
+        raise InvalidBatch("The body must be a JSON object with a 'requests' list")
+    items = payload["requests"]
+    if not 1 <= len(items) <= MAX_BATCH_REQUESTS:
+        raise InvalidBatch(
+            f"A batch must have between 1 and {MAX_BATCH_REQUESTS} requests"
+        )
+
+    subrequests = []
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise InvalidBatch("Every request must be a JSON object")
+        key = str(item.get("id", position))
+        resource = item.get("resource")
+        if resource not in RESOURCES:
+            raise InvalidBatch(
+                f"Unknown resource {resource!r} in request {key!r}; expected one of "
+                + ", ".join(RESOURCES)
+            )
+        filters = item.get("filters") or {}
+        if not isinstance(filters, dict):
+            raise InvalidBatch(f"The filters of request {key!r} must be an object")
+        args = {name: _query_value(name, value) for name, value in filters.items()}
+        if item.get("fields") is not None:
+            args["fields"] = _query_value("fields", item["fields"])
+        if resource == "vuelos":
+            # The flights come in pages: the route would stream them all without a limit
+            args.setdefault("limit", str(MAX_PAGE_SIZE))
+        subrequests.append((key, RESOURCES[resource], args))
+
+    keys = [key for key, _, _ in subrequests]
+    if len(set(keys)) != len(keys):
+        raise InvalidBatch("The ids of the requests must be unique")
+    return subrequests
+
+
+@contextmanager
+def _subrequest(endpoint, args):
+    """
+    Make ``request`` a GET of ``endpoint`` with the query parameters ``args`` for the block.
+
+    The current request context is reused rather than a new one pushed: popping a request
+    context runs the teardown handlers, which would drop the replica routing of the batch's
+    database session.
+    """
+    ctx = request_ctx._get_current_object()
+    rule = next(current_app.url_map.iter_rules(endpoint))
+    environ = EnvironBuilder(
+        path=rule.rule,
+        base_url=request.url_root,
+        query_string=args,
+        environ_overrides={"REMOTE_ADDR": request.remote_addr},
+    ).get_environ()
+    saved = ctx.request, ctx.url_adapter
+    ctx.request = current_app.request_class(environ)
+    ctx.url_adapter = current_app.create_url_adapter(ctx.request)
+    ctx.match_request()
+    try:
+        yield
+    finally:
+        ctx.request, ctx.url_adapter = saved
+
+
+def _error_response(endpoint, error):
+    """
+    Return the response of the error handler of ``error``, or a 500 when it has none.
+
+    Unexpected errors are logged and the batch's transaction is rolled back, so that the
+    following sub-requests still run.
+    """
+    try:
+        return current_app.make_response(current_app.handle_user_exception(error))
+    except Exception:
+        logger.exception("Sub-request %s of a batch failed", endpoint)
+        db.session.rollback()
+        return current_app.make_response(
+            (jsonify({"error": InternalServerError.description}), 500)
+        )
+
+
+def _dispatch(endpoint, args):
+    """
+    Run the route of a sub-request and return its result as a batch entry.
+
+    Returns:
+        dict: The ``status`` and JSON ``body`` of the response and, for paginated
+        resources with more rows, the ``next`` cursor to pass as ``after``.
+    """
+    with _subrequest(endpoint, args):
+        try:
+            response = current_app.make_response(current_app.dispatch_request())
+        except Exception as error:
+            response = _error_response(endpoint, error)
+    result = {"status": response.status_code, "body": response.get_json(silent=True)}
+    next_cursor = response.headers.get("X-Next-Cursor")
+    if next_cursor is not None:
+        result["next"] = next_cursor
+    return result
+
+
+def _fetch_searches_apart(app, environ, pairs):
+    """
+    Run ``fetch_searches`` in a request context of its own. The batch's request context
+    stays with the thread that dispatches the sub-requests, which swaps its request.
+    """
+    with app.request_context(environ):
+        return fetch_searches(pairs)
+
+
+@batch_bp.route("/batch", methods=["POST"])
+def batch_route():
+    """
+    Run several read requests in one round trip.
+
+    The body is a JSON object with a ``requests`` list, e.g.::
+
+        {"requests": [
+            {"id": "airlines", "resource": "aerolineas"},
+            {"resource": "vuelos", "filters": {"id_aeropuerto": [1, 2]},
+             "fields": ["id_vuelo", "dia"]},
+            {"resource": "stackexchange/summary", "filters": {"intitle": "json"}}
+        ]}
+
+    ``resource`` is one of the keys of ``RESOURCES``: the /data, /data/stats and
+    /stackexchange routes of the same name, except streams and exports. ``filters`` and
+    ``fields`` are the query parameters of that route. /data/vuelos is paginated with
+    ``limit`` (1000 by default) and ``after``.
+
+    Like the /data reads, batches are served from the read replicas when configured.
+
+    Returns:
+        A JSON object with the ``responses`` in the order of the requests, each with the
+        ``id`` of its request, the ``status`` and ``body`` the route would have answered and,
+        when more flights remain, the ``next`` cursor. A failed sub-request does not fail
+        the batch; a malformed batch is answered with 400.
+    """
+    subrequests = parse_batch(request.get_json(silent=True))
+    # Identical sub-requests are run once
+    keys = [
+        (endpoint, tuple(sorted(args.items()))) for _, endpoint, args in subrequests
+    ]
+    distinct = list(dict.fromkeys(keys))
+    upstream = [key for key in distinct if key[0].startswith("stack_exchange.")]
+    pairs = live_searches(
+        list(dict.fromkeys(search_pair(dict(args)) for _, args in upstream))
+    )
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # The searches run in their own context while this thread runs the database
+        # sub-requests
+        searches = None
+        if pairs:
+            environ = EnvironBuilder(
+                path=request.path,
+                base_url=request.url_root,
+                environ_overrides={"REMOTE_ADDR": request.remote_addr},
+            ).get_environ()
+            searches = executor.submit(
+                _fetch_searches_apart,
+                current_app._get_current_object(),
+                environ,
+                pairs,
+            )
+        for key in distinct:
+            if key not in upstream:
+                results[key] = _dispatch(key[0], dict(key[1]))
+        responses = searches.result() if searches is not None else {}
+
+    with prefetched_searches(responses):
+        for key in upstream:
+            results[key] = _dispatch(key[0], dict(key[1]))
+
+    return jsonify(
+        {
+            "responses": [
+                dict(results[key], id=subrequest[0])
+                for subrequest, key in zip(subrequests, keys)
+            ]
+        }
+    )
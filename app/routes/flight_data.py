@@ -1,7 +1,311 @@
-from flask import Blueprint, jsonify
-from ..models.flight_model import Aerolineas, Aeropuertos, Movimientos, Vuelos
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    request,
+    stream_with_context,
+    url_for,
+)
+from sqlalchemy import select
+from werkzeug.http import is_resource_modified
+
+from ..models.changes import watermark
+from ..models.dimension_cache import DIMENSIONS, dimension_cache
+from ..models.flight_model import db, Vuelos, VuelosEliminados
+from ..models.partitions import vuelos_source
+from ..services.flight_board import BoardFull, flight_board, stream_events
+from ..services.flight_export import (
+    EXPORT_BATCH_SIZE,
+    UnsupportedExport,
+    check_export,
+    export_metadata,
+    export_rows,
+)
+from ..services.flight_ingest import (
+    DEFAULT_CHUNK_SIZE,
+    READERS,
+    FlightLoadError,
+    load_flights,
+    text_stream,
+)
+from .params import (
+    InvalidQueryParameter,
+    handle_invalid_query_parameter,
+    parse_bool,
+    parse_date,
+    parse_fields,
+    parse_int,
+    parse_int_list,
+)
 
 data_bp = Blueprint("data_routes", __name__)
+data_bp.register_error_handler(InvalidQueryParameter, handle_invalid_query_parameter)
+
+# Number of rows fetched from the server-side cursor per round trip when streaming
+STREAM_BATCH_SIZE = 1000
+
+# Largest page a client may request with ``limit``
+MAX_PAGE_SIZE = 1000
+
+# Largest ``chunk_size`` accepted by the bulk load
+MAX_CHUNK_SIZE = 50000
+
+# Content types of the bulk load formats
+BULK_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+# Output fields of /data/vuelos mapped to their column and, for names, the dimension that
+# translates the column's ID. Names are resolved from the in-memory dimension cache, not joins.
+VUELOS_FIELDS = {
+    "id_vuelo": (Vuelos.id_vuelo, None),
+    "nombre_aerolinea": (Vuelos.id_aerolinea, "aerolineas"),
+    "nombre_aeropuerto": (Vuelos.id_aeropuerto, "aeropuertos"),
+    "tipo_movimiento": (Vuelos.id_movimiento, "movimientos"),
+    "dia": (Vuelos.dia, None),
+}
+
+
+def vuelos_filters(args, model=Vuelos):
+    """
+    Build the WHERE clauses for the flight filters supported by the /data/vuelos endpoints.
+
+    Supported parameters are ``dia_from`` and ``dia_to`` (inclusive YYYY-MM-DD bounds) and
+    ``id_aerolinea``, ``id_aeropuerto`` and ``id_movimiento`` (single IDs or comma-separated lists).
+
+    Args:
+        args (Mapping): The query parameters.
+        model: The model to filter, Vuelos or the columns of another selectable with the
+            same columns.
+
+    Returns:
+        list: SQLAlchemy boolean expressions to apply to a query over ``model``.
+    """
+    clauses = []
+    dia_from = parse_date(args, "dia_from")
+    dia_to = parse_date(args, "dia_to")
+    if dia_from is not None:
+        clauses.append(model.dia >= dia_from)
+    if dia_to is not None:
+        clauses.append(model.dia <= dia_to)
+    for name in ("id_aerolinea", "id_aeropuerto", "id_movimiento"):
+        ids = parse_int_list(args, name)
+        if ids:
+            column = getattr(model, name)
+            clauses.append(column == ids[0] if len(ids) == 1 else column.in_(ids))
+    return clauses
+
+
+def vuelos_query(args):
+    """
+    Build the column-only query behind /data/vuelos for the given query parameters.
+
+    Only the Vuelos table is read, together with the archived months when
+    ``include_archive`` is set; name fields select the ID column and are translated by
+    the serializer returned from ``vuelos_serializer``.
+
+    Args:
+        args (Mapping): The query parameters (filters, ``fields`` and ``include_archive``).
+
+    Returns:
+        tuple: The unordered select statement and the list of output fields. The flight ID
+        is selected as ``cursor``, available as ``query.selected_columns.cursor``.
+    """
+    fields = parse_fields(args, VUELOS_FIELDS)
+    source = vuelos_source(parse_bool(args, "include_archive"))
+    query = select(
+        source.c.id_vuelo.label("cursor"),
+        *(source.c[VUELOS_FIELDS[field][0].name].label(field) for field in fields),
+    )
+    return query.where(*vuelos_filters(args, source.c)), fields
+
+
+def vuelos_serializer(fields):
+    """
+    Return a function converting a /data/vuelos result row into a JSON-ready dictionary.
+
+    Args:
+        fields (list): The output fields selected by ``vuelos_query``.
+    """
+    snapshot = dimension_cache.snapshot()
+    names = {
+        field: snapshot.names[VUELOS_FIELDS[field][1]]
+        for field in fields
+        if VUELOS_FIELDS[field][1] is not None
+    }
+
+    # Dates are left to the JSON provider, which writes them as YYYY-MM-DD
+    def serialize(row):
+        item = {}
+        for field in fields:
+            value = getattr(row, field)
+            if field in names:
+                value = names[field].get(value)
+            item[field] = value
+        return item
+
+    return serialize
+
+
+def _set_next_cursor(response, next_cursor):
+    """
+    Advertise the cursor of the next page in the ``X-Next-Cursor`` and ``Link`` headers.
+    """
+    next_args = request.args.to_dict()
+    next_args["after"] = next_cursor
+    response.headers["X-Next-Cursor"] = str(next_cursor)
+    response.headers["Link"] = f'<{url_for(request.endpoint, **next_args)}>; rel="next"'
+
+
+def _paginated_response(query, key, serialize, args):
+    """
+    Apply keyset pagination to a query and build the response.
+
+    The query must select ``key`` labelled as ``cursor``. Rows are returned in ``key`` order,
+    starting after the ``after`` parameter. With ``limit`` a single page is returned and, when
+    more rows exist, the cursor of the next page is sent in the ``X-Next-Cursor`` and ``Link``
+    headers. Without ``limit`` every remaining row is streamed from a server-side cursor.
+
+    Args:
+        query: The select statement.
+        key: The unique, indexed column used as the cursor.
+        serialize (Callable): Converts a result row into a JSON-ready dictionary.
+        args (Mapping): The query parameters.
+
+    Returns:
+        Response: A JSON list of the selected rows.
+    """
+    limit = parse_int(args, "limit", minimum=1, maximum=MAX_PAGE_SIZE)
+    after = parse_int(args, "after")
+    if after is not None:
+        query = query.where(key > after)
+    query = query.order_by(key)
+
+    if limit is None:
+        result = db.session.execute(
+            query.execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        return Response(
+            stream_with_context(_stream_rows(result, serialize)),
+            mimetype="application/json",
+        )
+
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    response = jsonify([serialize(row) for row in rows[:limit]])
+    if len(rows) > limit:
+        _set_next_cursor(response, rows[limit - 1].cursor)
+    return response
+
+
+def _stream_rows(result, serialize):
+    """
+    Serialize a server-side cursor of rows as a JSON array, one batch at a time.
+
+    Args:
+        result: A SQLAlchemy result opened with ``yield_per``.
+        serialize (Callable): Converts a result row into a JSON-ready dictionary.
+
+    Yields:
+        str: Chunks of the JSON array.
+    """
+    dumps = current_app.json.dumps
+    separator = ""
+    try:
+        yield "["
+        for rows in result.partitions():
+            chunk = ",".join(
+                dumps(serialize(row), separators=(",", ":")) for row in rows
+            )
+            yield separator + chunk
+            separator = ","
+        yield "]"
+    finally:
+        result.close()
+
+
+def _vuelos_validators():
+    """
+    Return the ETag and Last-Modified of the bulk flight reads, derived from the change
+    sequence watermark and the dimension cache without reading the flights.
+
+    Both change with every write to vuelos and to the dimension tables. Last-Modified has a
+    one second resolution: it is left out until the second of the last change is over, so
+    that no later change can carry the same time.
+
+    Returns:
+        tuple: (ETag, Last-Modified or None).
+    """
+    number, updated = watermark(db.session)
+    etags = dimension_cache.snapshot().etags
+    key = ":".join([str(number)] + [etags[dimension] for dimension in sorted(etags)])
+    if updated is not None and updated + timedelta(seconds=1) > datetime.now(
+        timezone.utc
+    ):
+        updated = None
+    return hashlib.sha1(key.encode()).hexdigest(), updated
+
+
+def _not_modified(etag, last_modified):
+    """
+    Return a 304 response when the request's conditional headers match, else None.
+    """
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    response = current_app.response_class(status=304)
+    _set_validators(response, etag, last_modified)
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    # Weak, as the compressed responses must be, so that a 304 repeats the ETag of the 200
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+
+
+def _dimension_response(dimension):
+    """
+    Build the response of a lookup table route from the in-memory dimension cache.
+
+    Without query parameters the pre-serialized body is returned as is. ``limit``, ``after``
+    and ``fields`` are applied in memory. Responses carry an ETag and are answered with
+    304 Not Modified when it matches ``If-None-Match``.
+
+    Args:
+        dimension (str): One of ``aerolineas``, ``aeropuertos`` or ``movimientos``.
+
+    Returns:
+        Response: A JSON list of the table rows.
+    """
+    snapshot = dimension_cache.snapshot()
+    if not request.args:
+        response = current_app.response_class(
+            snapshot.payloads[dimension], mimetype="application/json"
+        )
+        response.set_etag(snapshot.etags[dimension])
+        return response.make_conditional(request)
+
+    name_key = DIMENSIONS[dimension][3]
+    fields = parse_fields(request.args, ["id", name_key])
+    limit = parse_int(request.args, "limit", minimum=1, maximum=MAX_PAGE_SIZE)
+    after = parse_int(request.args, "after")
+    items = [
+        {"id": key, name_key: name}
+        for key, name in snapshot.names[dimension].items()
+        if after is None or key > after
+    ]
+    page = items if limit is None else items[:limit]
+    response = jsonify([{field: item[field] for field in fields} for item in page])
+    if len(items) > len(page):
+        _set_next_cursor(response, page[-1]["id"])
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 @data_bp.route("/aerolineas", methods=["GET"])
@@ -9,16 +313,13 @@ def get_aerolineas():
     """
     Retrieve a list of all aerolineas (airlines) from the database, including their IDs and names.
 
+    Served from the in-memory dimension cache with ETag support. Supports the ``limit``,
+    ``after`` and ``fields`` query parameters.
+
     Returns:
         A JSON list of all airlines, each represented by a dictionary containing the airline's ID and name.
     """
-    all_aerolineas = Aerolineas.query.all()
-    return jsonify(
-        [
-            {"id": aerolinea.id_aerolinea, "nombre": aerolinea.nombre_aerolinea}
-            for aerolinea in all_aerolineas
-        ]
-    )
+    return _dimension_response("aerolineas")
 
 
 @data_bp.route("/aeropuertos", methods=["GET"])
@@ -26,16 +327,13 @@ def get_aeropuertos():
     """
     Retrieve a list of all aeropuertos (airports) from the database, including their IDs and names.
 
+    Served from the in-memory dimension cache with ETag support. Supports the ``limit``,
+    ``after`` and ``fields`` query parameters.
+
     Returns:
         A JSON list of all airports, each represented by a dictionary containing the airport's ID and name.
     """
-    all_aeropuertos = Aeropuertos.query.all()
-    return jsonify(
-        [
-            {"id": aeropuerto.id_aeropuerto, "nombre": aeropuerto.nombre_aeropuerto}
-            for aeropuerto in all_aeropuertos
-        ]
-    )
+    return _dimension_response("aeropuertos")
 
 
 @data_bp.route("/movimientos", methods=["GET"])
@@ -43,16 +341,13 @@ def get_movimientos():
     """
     Retrieve a list of all movimientos (flight movements, e.g., arrivals, departures) from the database, including their IDs and descriptions.
 
+    Served from the in-memory dimension cache with ETag support. Supports the ``limit``,
+    ``after`` and ``fields`` query parameters.
+
     Returns:
         A JSON list of all flight movements, each represented by a dictionary containing the movement's ID and description.
     """
-    all_movimientos = Movimientos.query.all()
-    return jsonify(
-        [
-            {"id": movimiento.id_movimiento, "descripcion": movimiento.descripcion}
-            for movimiento in all_movimientos
-        ]
-    )
+    return _dimension_response("movimientos")
 
 
 @data_bp.route("/vuelos", methods=["GET"])
@@ -60,31 +355,239 @@ def get_vuelos():
     """
     Retrieve a list of all vuelos (flights) from the database, including detailed information.
 
+    The flights are fetched with a single query over the Vuelos table that selects only the
+    output columns; airline, airport and movement names come from the dimension cache.
+    Query parameters:
+        limit, after: Keyset pagination on ``id_vuelo``. Without ``limit`` all rows are streamed.
+        dia_from, dia_to: Inclusive date range (YYYY-MM-DD).
+        id_aerolinea, id_aeropuerto, id_movimiento: An ID or comma-separated list of IDs.
+        fields: Comma-separated subset of the output fields.
+        include_archive: Also return the flights of the archived months (see
+            app.models.partitions).
+
+    Responses carry a weak ETag and Last-Modified derived from the change sequence
+    watermark; a matching ``If-None-Match`` or ``If-Modified-Since`` is answered with 304
+    Not Modified without querying the flights.
+
     Returns:
         A JSON list of flights, each with detailed information including the flight ID, the airline name,
         the airport name, the type of movement, and the date of the flight.
     """
-    all_vuelos = Vuelos.query.all()
-    vuelos_data = [
+    query, fields = vuelos_query(request.args)
+    etag, last_modified = _vuelos_validators()
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    response = _paginated_response(
+        query, query.selected_columns.cursor, vuelos_serializer(fields), request.args
+    )
+    _set_validators(response, etag, last_modified)
+    return response
+
+
+@data_bp.route("/vuelos/changes", methods=["GET"])
+def get_vuelos_changes():
+    """
+    Retrieve the flights inserted, updated or deleted since a change token.
+
+    Every write to vuelos is numbered by the change sequence (see app.models.changes); a
+    token is the last number a client has seen. A flight changed several times is reported
+    once, with its current values. Moving old months to the archive is not reported.
+    Query parameters:
+        since: The token returned by the previous call; 0 (the default) returns every flight.
+        limit: Maximum number of changes (default and maximum 1000).
+        fields: Comma-separated subset of the output fields of /data/vuelos.
+
+    Returns:
+        A JSON object with the ``changes`` in sequence order, each with ``op`` (``insert``,
+        ``update`` or ``delete``), ``id_vuelo`` and, except for deletes, the flight as
+        ``vuelo``; ``next``, the token to pass as ``since`` on the next call; and ``more``,
+        whether changes remain after ``next``. Deletes may name flights inserted after
+        ``since`` that the client never saw.
+    """
+    since = parse_int(request.args, "since", minimum=0) or 0
+    limit = (
+        parse_int(request.args, "limit", minimum=1, maximum=MAX_PAGE_SIZE)
+        or MAX_PAGE_SIZE
+    )
+    fields = parse_fields(request.args, VUELOS_FIELDS)
+    serialize = vuelos_serializer(fields)
+
+    flights = db.session.execute(
+        select(
+            Vuelos.seq,
+            Vuelos.seq_created,
+            Vuelos.id_vuelo.label("cursor"),
+            *(VUELOS_FIELDS[field][0].label(field) for field in fields),
+        )
+        .where(Vuelos.seq > since)
+        .order_by(Vuelos.seq)
+        .limit(limit + 1)
+    ).all()
+    deletes = db.session.execute(
+        select(VuelosEliminados.seq, VuelosEliminados.id_vuelo)
+        .where(VuelosEliminados.seq > since)
+        .order_by(VuelosEliminados.seq)
+        .limit(limit + 1)
+    ).all()
+
+    changes = [
+        (
+            row.seq,
+            {
+                "op": "insert" if row.seq_created > since else "update",
+                "id_vuelo": row.cursor,
+                "vuelo": serialize(row),
+            },
+        )
+        for row in flights
+    ]
+    changes += [
+        (row.seq, {"op": "delete", "id_vuelo": row.id_vuelo}) for row in deletes
+    ]
+    changes.sort(key=lambda change: change[0])
+    page = changes[:limit]
+    return jsonify(
         {
-            "id_vuelo": vuelo.id_vuelo,
-            "nombre_aerolinea": Aerolineas.query.filter_by(
-                id_aerolinea=vuelo.id_aerolinea
-            )
-            .first()
-            .nombre_aerolinea,
-            "nombre_aeropuerto": Aeropuertos.query.filter_by(
-                id_aeropuerto=vuelo.id_aeropuerto
-            )
-            .first()
-            .nombre_aeropuerto,
-            "tipo_movimiento": Movimientos.query.filter_by(
-                id_movimiento=vuelo.id_movimiento
-            )
-            .first()
-            .descripcion,
-            "dia": vuelo.dia.strftime("%Y-%m-%d"),
+            "changes": [change for _, change in page],
+            "next": str(page[-1][0] if page else since),
+            "more": len(changes) > limit,
         }
-        for vuelo in all_vuelos
-    ]
-    return jsonify(vuelos_data)
+    )
+
+
+@data_bp.route("/vuelos/stream", methods=["GET"])
+def stream_vuelos():
+    """
+    Push the changes of flights as Server-Sent Events, for live flight boards.
+
+    Every committed insert, update or delete of a matching flight is sent as an ``insert``,
+    ``update`` or ``delete`` event whose data holds ``op`` and the flight as ``vuelo`` (as
+    in /data/vuelos, plus ``id_aeropuerto`` and ``id_movimiento``). The event ID is the
+    change sequence number: after a disconnection, or an ``overflow`` event sent when the
+    client falls too far behind, catch up with /data/vuelos/changes?since=<last ID>.
+    Query parameters:
+        id_aeropuerto, id_movimiento: An ID or comma-separated list of IDs; all by default.
+            Updates that move a flight away from the filter are sent too.
+
+    Returns:
+        A text/event-stream response, or 503 when the worker has no room for another
+        subscriber.
+    """
+    airports = parse_int_list(request.args, "id_aeropuerto")
+    movements = parse_int_list(request.args, "id_movimiento")
+    hub = flight_board.hub()
+    try:
+        subscription = hub.subscribe(airports, movements)
+    except BoardFull as error:
+        response = jsonify({"error": str(error)})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    response = Response(
+        stream_events(hub, subscription, current_app.config["FLIGHT_BOARD_HEARTBEAT"]),
+        mimetype="text/event-stream",
+    )
+    # A stream closed before its first chunk never runs the generator's cleanup
+    response.call_on_close(lambda: hub.unsubscribe(subscription))
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@data_bp.route("/vuelos/export", methods=["GET"])
+def export_vuelos():
+    """
+    Export flights as a CSV, Parquet or Arrow IPC stream file.
+
+    Rows are streamed from a server-side cursor in batches and encoded as they arrive, so
+    memory use does not grow with the number of flights. Names are resolved from the dimension
+    cache (dictionary-encoded in Parquet and Arrow), dates are ISO dates.
+    Query parameters:
+        format: ``csv`` (default), ``parquet`` or ``arrow``. Parquet and Arrow need pyarrow.
+        compression: ``gzip`` or ``zstd``. CSV output is compressed as a whole; Parquet
+            compresses its pages (snappy by default) and Arrow its buffers (zstd only).
+        dia_from, dia_to, id_aerolinea, id_aeropuerto, id_movimiento, fields,
+            include_archive: As for /data/vuelos.
+
+    Responses carry the same ETag and Last-Modified as /data/vuelos.
+
+    Returns:
+        The export as an attachment, ordered by flight ID.
+    """
+    fmt = request.args.get("format") or "csv"
+    compression = request.args.get("compression") or None
+    try:
+        check_export(fmt, compression)
+    except UnsupportedExport as error:
+        raise InvalidQueryParameter(str(error))
+    query, fields = vuelos_query(request.args)
+    etag, last_modified = _vuelos_validators()
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    snapshot = dimension_cache.snapshot()
+    names = {
+        field: snapshot.names[VUELOS_FIELDS[field][1]]
+        for field in fields
+        if VUELOS_FIELDS[field][1] is not None
+    }
+
+    result = db.session.execute(
+        query.order_by(query.selected_columns.cursor).execution_options(
+            yield_per=EXPORT_BATCH_SIZE
+        )
+    )
+    content_type, filename = export_metadata(fmt, compression)
+    response = Response(
+        stream_with_context(export_rows(result, fields, names, fmt, compression)),
+        mimetype=content_type,
+    )
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    _set_validators(response, etag, last_modified)
+    return response
+
+
+@data_bp.route("/vuelos/bulk", methods=["POST"])
+def load_vuelos():
+    """
+    Load flights in bulk from a CSV or NDJSON request body.
+
+    Every record holds ``id_aerolinea``, ``id_aeropuerto``, ``id_movimiento`` and ``dia``
+    (YYYY-MM-DD); CSV input starts with a header line. The body is read as a stream, the IDs
+    are validated against the dimension cache and the flights are inserted in chunks, one
+    transaction per chunk.
+    Query parameters:
+        format: ``csv`` or ``ndjson``; by default taken from the Content-Type (``text/csv``,
+            ``application/x-ndjson``).
+        chunk_size: Flights per INSERT and transaction (default 5000).
+        skip_invalid: Skip and report invalid records instead of stopping at the first one.
+
+    Returns:
+        A JSON object with the number of inserted and rejected flights and the first errors.
+        When the load stops at an invalid record, a 400 response with the error, its line and
+        the number of flights inserted before it, which are kept.
+    """
+    fmt = request.args.get("format") or BULK_CONTENT_TYPES.get(request.mimetype)
+    if fmt not in READERS:
+        raise InvalidQueryParameter(
+            "'format' must be csv or ndjson, or be given by the Content-Type"
+        )
+    chunk_size = (
+        parse_int(request.args, "chunk_size", minimum=1, maximum=MAX_CHUNK_SIZE)
+        or DEFAULT_CHUNK_SIZE
+    )
+    skip_invalid = parse_bool(request.args, "skip_invalid")
+
+    records = READERS[fmt](text_stream(request.stream))
+    try:
+        result = load_flights(records, chunk_size=chunk_size, skip_invalid=skip_invalid)
+    except FlightLoadError as error:
+        return (
+            jsonify(
+                {"error": str(error), "line": error.line, "inserted": error.inserted}
+            ),
+            400,
+        )
+    except UnicodeDecodeError:
+        return jsonify({"error": "The request body must be UTF-8 encoded"}), 400
+    return jsonify(result)
@@ -0,0 +1,151 @@
+from flask import Blueprint, jsonify, request
+from sqlalchemy import func, select
+from ..models.dimension_cache import dimension_cache
+from ..models.flight_model import db, VuelosDiarios
+from .flight_data import vuelos_filters
+from .params import InvalidQueryParameter, handle_invalid_query_parameter, parse_int
+
+stats_bp = Blueprint("stats_routes", __name__)
+stats_bp.register_error_handler(InvalidQueryParameter, handle_invalid_query_parameter)
+
+# All statistics are read from the VuelosDiarios rollup table, which holds at most one row
+# per day, airport, airline and movement type, never from the Vuelos table itself. Names
+# come from the dimension cache.
+TOTAL = func.sum(VuelosDiarios.total_vuelos)
+
+
+def _limit(query):
+    """
+    Apply the optional ``limit`` query parameter to a ranking query.
+    """
+    limit = parse_int(request.args, "limit", minimum=1)
+    return query if limit is None else query.limit(limit)
+
+
+@stats_bp.route("/aeropuertos", methods=["GET"])
+def get_aeropuertos_stats():
+    """
+    Rank airports by their number of flight movements.
+
+    Accepts the /data/vuelos filters (``dia_from``, ``dia_to``, ``id_aerolinea``,
+    ``id_aeropuerto``, ``id_movimiento``) and an optional ``limit``.
+
+    Returns:
+        A JSON list of airports with their ID, name and total movements, busiest first.
+    """
+    query = (
+        select(VuelosDiarios.id_aeropuerto, TOTAL.label("total_movimientos"))
+        .where(*vuelos_filters(request.args, VuelosDiarios))
+        .group_by(VuelosDiarios.id_aeropuerto)
+        .order_by(TOTAL.desc(), VuelosDiarios.id_aeropuerto)
+    )
+    names = dimension_cache.names("aeropuertos")
+    return jsonify(
+        [
+            {
+                "id_aeropuerto": row.id_aeropuerto,
+                "nombre_aeropuerto": names.get(row.id_aeropuerto),
+                "total_movimientos": int(row.total_movimientos),
+            }
+            for row in db.session.execute(_limit(query))
+        ]
+    )
+
+
+@stats_bp.route("/aerolineas", methods=["GET"])
+def get_aerolineas_stats():
+    """
+    Rank airlines by their number of flights and average flights per active day.
+
+    Accepts the /data/vuelos filters and an optional ``limit``.
+
+    Returns:
+        A JSON list of airlines with their ID, name, total flights, number of days with
+        flights and average flights per day, busiest first.
+    """
+    query = (
+        select(
+            VuelosDiarios.id_aerolinea,
+            TOTAL.label("total_vuelos"),
+            func.count(func.distinct(VuelosDiarios.dia)).label("dias"),
+        )
+        .where(*vuelos_filters(request.args, VuelosDiarios))
+        .group_by(VuelosDiarios.id_aerolinea)
+        .order_by(TOTAL.desc(), VuelosDiarios.id_aerolinea)
+    )
+    names = dimension_cache.names("aerolineas")
+    return jsonify(
+        [
+            {
+                "id_aerolinea": row.id_aerolinea,
+                "nombre_aerolinea": names.get(row.id_aerolinea),
+                "total_vuelos": int(row.total_vuelos),
+                "dias": row.dias,
+                "promedio_por_dia": round(int(row.total_vuelos) / row.dias, 2),
+            }
+            for row in db.session.execute(_limit(query))
+        ]
+    )
+
+
+@stats_bp.route("/aerolineas/por-dia", methods=["GET"])
+def get_aerolineas_por_dia_stats():
+    """
+    Find, for each day, the airline with the most flights.
+
+    Accepts the /data/vuelos filters. Days where several airlines tie return all of them.
+
+    Returns:
+        A JSON list ordered by day, each item with the day, the airline ID and name and the
+        number of flights of that airline on that day.
+    """
+    query = (
+        select(
+            VuelosDiarios.dia, VuelosDiarios.id_aerolinea, TOTAL.label("total_vuelos")
+        )
+        .where(*vuelos_filters(request.args, VuelosDiarios))
+        .group_by(VuelosDiarios.dia, VuelosDiarios.id_aerolinea)
+        .order_by(VuelosDiarios.dia, TOTAL.desc(), VuelosDiarios.id_aerolinea)
+    )
+    names = dimension_cache.names("aerolineas")
+    leaders = []
+    for row in db.session.execute(query):
+        total = int(row.total_vuelos)
+        if leaders and leaders[-1]["dia"] == row.dia:
+            if total < leaders[-1]["total_vuelos"]:
+                continue
+        leaders.append(
+            {
+                "dia": row.dia,
+                "id_aerolinea": row.id_aerolinea,
+                "nombre_aerolinea": names.get(row.id_aerolinea),
+                "total_vuelos": total,
+            }
+        )
+    return jsonify(leaders)
+
+
+@stats_bp.route("/dias", methods=["GET"])
+def get_dias_stats():
+    """
+    List the days with more than ``more_than`` flights (default 0).
+
+    Accepts the /data/vuelos filters.
+
+    Returns:
+        A JSON list ordered by day, each item with the day and its number of flights.
+    """
+    more_than = parse_int(request.args, "more_than", minimum=0) or 0
+    query = (
+        select(VuelosDiarios.dia, TOTAL.label("total_vuelos"))
+        .where(*vuelos_filters(request.args, VuelosDiarios))
+        .group_by(VuelosDiarios.dia)
+        .having(TOTAL > more_than)
+        .order_by(VuelosDiarios.dia)
+    )
+    return jsonify(
+        [
+            {"dia": row.dia, "total_vuelos": int(row.total_vuelos)}
+            for row in db.session.execute(query)
+        ]
+    )
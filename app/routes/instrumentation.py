@@ -0,0 +1,20 @@
+from flask import Blueprint, current_app
+
+metrics_bp = Blueprint("metrics", __name__)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@metrics_bp.route("/metrics")
+def metrics_route():
+    """
+    Prometheus Metrics
+    ---
+    get:
+      description: Get the request latency, SQL statement, upstream call, connection pool, read replica and Stack Exchange rate limiter metrics of the worker process serving the request, in the Prometheus text format
+      responses:
+        200:
+          description: The http_request_*, upstream_request_duration_seconds, db_pool_*, db_replica_* and upstream limiter metrics
+    """
+    body = current_app.extensions["instrumentation"].expose()
+    return body, 200, {"Content-Type": PROMETHEUS_CONTENT_TYPE}
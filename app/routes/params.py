@@ -0,0 +1,149 @@
+"""
+Parsing and validation of query string parameters shared by the blueprints.
+"""
+
+from datetime import date
+
+from flask import jsonify
+
+
+class InvalidQueryParameter(ValueError):
+    """
+    Raised when a query string parameter of a request is missing or malformed.
+    """
+
+
+def handle_invalid_query_parameter(error):
+    """
+    Report a malformed query string parameter to the client.
+
+    Returns:
+        A JSON object with the error message and a 400 status code.
+    """
+    return jsonify({"error": str(error)}), 400
+
+
+def parse_int(args, name, minimum=None, maximum=None):
+    """
+    Read an optional integer parameter.
+
+    Args:
+        args (Mapping): The query parameters.
+        name (str): The parameter name.
+        minimum (int, optional): The smallest accepted value.
+        maximum (int, optional): The largest accepted value.
+
+    Returns:
+        int or None: The parsed value, or None when the parameter is absent.
+    """
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        value = int(value)
+    except (ValueError, TypeError):
+        raise InvalidQueryParameter(f"'{name}' must be an integer")
+    if (minimum is not None and value < minimum) or (
+        maximum is not None and value > maximum
+    ):
+        if maximum is None:
+            bounds = f">= {minimum}"
+        elif minimum is None:
+            bounds = f"<= {maximum}"
+        else:
+            bounds = f"between {minimum} and {maximum}"
+        raise InvalidQueryParameter(f"'{name}' must be {bounds}")
+    return value
+
+
+def parse_bool(args, name):
+    """
+    Read an optional boolean flag: ``1``, ``true`` or ``yes`` and ``0``, ``false`` or ``no``.
+
+    Returns:
+        bool: The flag, False when the parameter is absent.
+    """
+    value = args.get(name)
+    if value is None or value == "":
+        return False
+    value = str(value).lower()
+    if value in ("1", "true", "yes"):
+        return True
+    if value in ("0", "false", "no"):
+        return False
+    raise InvalidQueryParameter(f"'{name}' must be true or false")
+
+
+def parse_int_list(args, name):
+    """
+    Read an optional comma-separated list of integers, e.g. ``id_aerolinea=1,3``.
+
+    Returns:
+        list or None: The parsed values, or None when the parameter is absent.
+    """
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return [int(part) for part in str(value).split(",")]
+    except ValueError:
+        raise InvalidQueryParameter(
+            f"'{name}' must be a comma-separated list of integers"
+        )
+
+
+def parse_str_list(args, name):
+    """
+    Read an optional comma-separated list of strings, e.g. ``site=stackoverflow,serverfault``.
+
+    Returns:
+        list or None: The distinct non-empty values in order, or None when the parameter is
+        absent.
+    """
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    values = [part.strip() for part in str(value).split(",") if part.strip()]
+    if not values:
+        raise InvalidQueryParameter(f"'{name}' must be a comma-separated list")
+    return list(dict.fromkeys(values))
+
+
+def parse_date(args, name):
+    """
+    Read an optional ISO date (YYYY-MM-DD) parameter.
+
+    Returns:
+        date or None: The parsed date, or None when the parameter is absent.
+    """
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        raise InvalidQueryParameter(f"'{name}' must be a date in YYYY-MM-DD format")
+
+
+def parse_fields(args, available):
+    """
+    Read the ``fields`` projection, e.g. ``fields=id_vuelo,dia``.
+
+    Args:
+        args (Mapping): The query parameters.
+        available (Iterable[str]): The fields the resource can return, in output order.
+
+    Returns:
+        list: The requested fields, or every available field when ``fields`` is absent.
+    """
+    available = list(available)
+    value = args.get("fields")
+    if not value:
+        return available
+    requested = value.split(",") if isinstance(value, str) else list(value)
+    unknown = [field for field in requested if field not in available]
+    if unknown:
+        raise InvalidQueryParameter(
+            f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}"
+        )
+    return [field for field in available if field in requested]
@@ -1,11 +1,199 @@
-from flask import Blueprint, jsonify, current_app
-import requests
-import time
+import json
+import threading
+from contextlib import contextmanager
+
+from flask import Blueprint, g, jsonify, request
+from sqlalchemy import func, select
+
+from ..models.flight_model import db
+from ..models.stackexchange_model import StackQuestion, StackSearchSnapshot
+from ..services.stackexchange_analytics import owner_reputation, summarize, summary_for
+from ..services.stackexchange_client import StackExchangeError, get_client
+from ..services.stackexchange_fanout import fan_out, summarize_searches
+from .params import (
+    InvalidQueryParameter,
+    handle_invalid_query_parameter,
+    parse_int,
+    parse_str_list,
+)
 
 stack_exchange = Blueprint("stack_exchange", __name__)
+stack_exchange.register_error_handler(
+    InvalidQueryParameter, handle_invalid_query_parameter
+)
 
-# Define the base URL for Stack Exchange API
-API_BASE_URL = "https://api.stackexchange.com/2.2/"
+# Defaults of the ``intitle`` and ``site`` query parameters
+DEFAULT_INTITLE = "perl"
+DEFAULT_SITE = "stackoverflow"
+
+# Largest ``k`` accepted by the ranking routes
+MAX_K = 100
+
+# Largest number of (intitle, site) searches of one fan-out request
+MAX_FANOUT_SEARCHES = 20
+
+# Summaries of ingested snapshots, keyed on (intitle, site, completed_at, k)
+_snapshot_summaries = {}
+_snapshot_summaries_lock = threading.Lock()
+
+
+@stack_exchange.errorhandler(StackExchangeError)
+def handle_stack_exchange_error(error):
+    """
+    Report a failed Stack Exchange call to the client.
+
+    Returns:
+        A JSON object with the error message and the error's status code, with a
+        Retry-After header when the client should retry later.
+    """
+    response = jsonify({"error": str(error)})
+    response.status_code = error.status_code
+    if getattr(error, "retry_after", None):
+        response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+
+def _k():
+    """
+    Read the ``k`` query parameter of the routes returning the top k questions (1 by
+    default). The other routes ignore it.
+    """
+    return parse_int(request.args, "k", minimum=1, maximum=MAX_K) or 1
+
+
+def search_pair(args):
+    """
+    Return the (intitle, site) search of the query parameters ``args``, with defaults.
+    """
+    return args.get("intitle") or DEFAULT_INTITLE, args.get("site") or DEFAULT_SITE
+
+
+def _search(intitle, site):
+    """
+    Run a search through the application's pooled, caching client.
+
+    Identical parameters across routes let the client serve them from one cached call.
+    Searches fetched ahead by a batch (see ``prefetched_searches``) are served from there.
+
+    Returns:
+        CachedResponse: The response. Its payload is shared and must not be mutated.
+    """
+    prefetched = g.get("stackexchange_searches")
+    if prefetched is not None and (intitle, site) in prefetched:
+        response = prefetched[(intitle, site)]
+        if isinstance(response, StackExchangeError):
+            raise response
+        return response
+    return get_client().search(
+        order="desc", sort="activity", intitle=intitle, site=site
+    )
+
+
+def live_searches(pairs):
+    """
+    Return the (intitle, site) searches of ``pairs`` without an ingested snapshot, which
+    the routes answer from the live API.
+    """
+    return [pair for pair in pairs if _snapshot_query(*pair) is None]
+
+
+def fetch_searches(pairs):
+    """
+    Run the live searches of ``pairs`` concurrently through the shared client.
+
+    Returns:
+        dict: The response of each pair, or the StackExchangeError it raised.
+    """
+    return dict(zip(pairs, fan_out(get_client(), pairs, _search)))
+
+
+@contextmanager
+def prefetched_searches(responses):
+    """
+    Serve the searches of ``responses``, as returned by ``fetch_searches``, to the routes
+    dispatched in the block instead of calling the client again, errors included.
+    """
+    g.stackexchange_searches = responses
+    try:
+        yield
+    finally:
+        g.pop("stackexchange_searches", None)
+
+
+def _live_summary(intitle, site, k):
+    """
+    Return the single-pass summary of the live search, memoized on the cached response.
+    """
+    return summary_for(_search(intitle, site), k)
+
+
+def _snapshot_query(intitle, site):
+    """
+    Return the snapshot of a search and the filter selecting its ingested questions, or
+    None when the search has not been snapshotted yet and the routes must use the live API.
+    """
+    snapshot = db.session.get(StackSearchSnapshot, (intitle, site))
+    if snapshot is None:
+        return None
+    return snapshot, (StackQuestion.intitle == intitle, StackQuestion.site == site)
+
+
+def _snapshot_items(filters, order_by, k):
+    """
+    Return the first k ingested questions in ``order_by`` order, in the API's item shape.
+    """
+    items = db.session.scalars(
+        select(StackQuestion.item).where(*filters).order_by(order_by).limit(k)
+    )
+    return [json.loads(item) for item in items]
+
+
+def _snapshot_all_items(filters):
+    """
+    Iterate over every ingested question of a snapshot, in the API's item shape.
+    """
+    return (
+        json.loads(item)
+        for item in db.session.scalars(
+            select(StackQuestion.item)
+            .where(*filters)
+            .order_by(StackQuestion.question_id)
+        )
+    )
+
+
+def _snapshot_summary(snapshot, filters, k):
+    """
+    Return the single-pass summary of an ingested snapshot, computed once per snapshot.
+    """
+    key = (snapshot.intitle, snapshot.site, snapshot.completed_at, k)
+    summary = _snapshot_summaries.get(key)
+    if summary is None:
+        summary = summarize(_snapshot_all_items(filters), k)
+        with _snapshot_summaries_lock:
+            # Forget the summaries of older snapshots of the same search
+            for other in list(_snapshot_summaries):
+                if other[:2] == key[:2] and other[2] != key[2]:
+                    del _snapshot_summaries[other]
+            _snapshot_summaries[key] = summary
+    return summary
+
+
+def _one_or_many(items, k):
+    """
+    Return the single best item for k=1, as the routes always did, or the list for k>1.
+    """
+    if k == 1:
+        return items[0] if items else None
+    return items
+
+
+def _with_integer_reputation(item):
+    """
+    Return a copy of a question whose owner reputation is an integer, or 0 if missing or invalid.
+    """
+    owner = dict(item.get("owner") or {}, reputation=owner_reputation(item))
+    return dict(item, owner=owner)
 
 
 @stack_exchange.route("/")
@@ -15,45 +203,23 @@ def stack_exchange_route():
     ---
     get:
       description: Get data from Stack Exchange API
+      parameters:
+        - {name: intitle, in: query, schema: {type: string, default: perl}}
+        - {name: site, in: query, schema: {type: string, default: stackoverflow}}
       responses:
         200:
           description: A list of data from Stack Exchange API
     """
-    # Create headers with your client ID and key
-    headers = {
-        "User-Agent": "YourApp/1.0",  # Replace with your app name and version
-        "X-API-Key": current_app.config["KEY"],
-    }
-
-    # Make the API request
-    response = requests.get(
-        API_BASE_URL + "search",
-        params={
-            "order": "desc",
-            "sort": "activity",
-            "intitle": "perl",
-            "site": "stackoverflow",
-        },
-        headers=headers,
-    )
-
-    data = response.json()
-
-    # Check for backoff and handle rate limiting
-    if "backoff" in data:
-        backoff_seconds = data["backoff"]
-        time.sleep(backoff_seconds)
-
-    # Clean up reputation values to integers or set them to 0 if missing or invalid
-    for item in data["items"]:
-        if "owner" in item and "reputation" in item["owner"]:
-            try:
-                item["owner"]["reputation"] = int(item["owner"]["reputation"])
-            except (ValueError, TypeError):
-                item["owner"]["reputation"] = 0
-        else:
-            item["owner"] = {"reputation": 0}  # Set reputation to 0 if missing
-
+    intitle, site = search_pair(request.args)
+    # Backoff requests from the API are honoured by the client's rate limiter
+    response = _search(intitle, site)
+
+    # Clean up reputation values to integers or set them to 0 if missing or invalid,
+    # once per cached payload
+    data = response.memo.get("normalized")
+    if data is None:
+        items = [_with_integer_reputation(item) for item in response.data["items"]]
+        data = response.memo.setdefault("normalized", dict(response.data, items=items))
     return jsonify(data)
 
 
@@ -64,36 +230,32 @@ def answered_unanswered_route():
     ---
     get:
       description: Get the number of answered and unanswered questions
+      parameters:
+        - {name: intitle, in: query, schema: {type: string, default: perl}}
+        - {name: site, in: query, schema: {type: string, default: stackoverflow}}
       responses:
         200:
           description: A JSON object with the count of answered and unanswered questions
     """
-    # Create headers with your client ID and key
-    headers = {
-        "User-Agent": "YourApp/1.0",  # Replace with your app name and version
-        "X-API-Key": current_app.config["KEY"],
-    }
-
-    # Make the API request
-    response = requests.get(
-        API_BASE_URL + "search",
-        params={
-            "order": "desc",
-            "sort": "activity",
-            "intitle": "perl",
-            "site": "stackoverflow",
-        },
-        headers=headers,
+    intitle, site = search_pair(request.args)
+    snapshot = _snapshot_query(intitle, site)
+    if snapshot is not None:
+        counts = dict(
+            db.session.execute(
+                select(StackQuestion.is_answered, func.count())
+                .where(*snapshot[1])
+                .group_by(StackQuestion.is_answered)
+            ).all()
+        )
+        return jsonify(
+            {"answered": counts.get(True, 0), "unanswered": counts.get(False, 0)}
+        )
+
+    summary = _live_summary(intitle, site, 1)
+    return jsonify(
+        {"answered": summary["answered"], "unanswered": summary["unanswered"]}
     )
 
-    data = response.json()
-
-    # Calculate answered and unanswered counts
-    answered = sum(1 for item in data["items"] if item["is_answered"])
-    unanswered = sum(1 for item in data["items"] if not item["is_answered"])
-
-    return jsonify({"answered": answered, "unanswered": unanswered})
-
 
 @stack_exchange.route("/highest-reputation")
 def highest_reputation_route():
@@ -102,36 +264,22 @@ def highest_reputation_route():
     ---
     get:
       description: Find and return the question with the highest owner reputation
+      parameters:
+        - {name: intitle, in: query, schema: {type: string, default: perl}}
+        - {name: site, in: query, schema: {type: string, default: stackoverflow}}
+        - {name: k, in: query, schema: {type: integer, default: 1}}
       responses:
         200:
-          description: A JSON object of the question with the highest owner reputation
-    """
-    # Create headers with your client ID and key
-    headers = {
-        "User-Agent": "YourApp/1.0",  # Replace with your app name and version
-        "X-API-Key": current_app.config["KEY"],
-    }
-
-    # Make the API request
-    response = requests.get(
-        API_BASE_URL + "search",
-        params={
-            "order": "desc",
-            "sort": "activity",
-            "intitle": "perl",
-            "site": "stackoverflow",
-        },
-        headers=headers,
-    )
-
-    data = response.json()
-
-    # Find the question with the highest owner reputation
-    highest_rep = max(
-        data["items"], key=lambda item: int(item["owner"].get("reputation", 0))
-    )
-
-    return jsonify(highest_rep)
+          description: A JSON object of the question with the highest owner reputation, or a list of the top k
+    """
+    intitle, site = search_pair(request.args)
+    k = _k()
+    snapshot = _snapshot_query(intitle, site)
+    if snapshot is not None:
+        items = _snapshot_items(snapshot[1], StackQuestion.owner_reputation.desc(), k)
+    else:
+        items = _live_summary(intitle, site, k)["highest_reputation"]
+    return jsonify(_one_or_many(items, k))
 
 
 @stack_exchange.route("/fewest-views")
@@ -141,34 +289,22 @@ def fewest_views_route():
     ---
     get:
       description: Find and return the question with the fewest views
+      parameters:
+        - {name: intitle, in: query, schema: {type: string, default: perl}}
+        - {name: site, in: query, schema: {type: string, default: stackoverflow}}
+        - {name: k, in: query, schema: {type: integer, default: 1}}
       responses:
         200:
-          description: A JSON object of the question with the fewest views
-    """
-    # Create headers with your client ID and key
-    headers = {
-        "User-Agent": "YourApp/1.0",  # Replace with your app name and version
-        "X-API-Key": current_app.config["KEY"],
-    }
-
-    # Make the API request
-    response = requests.get(
-        API_BASE_URL + "search",
-        params={
-            "order": "desc",
-            "sort": "activity",
-            "intitle": "perl",
-            "site": "stackoverflow",
-        },
-        headers=headers,
-    )
-
-    data = response.json()
-
-    # Find the question with the fewest views
-    fewest_views = min(data["items"], key=lambda item: int(item.get("view_count", 0)))
-
-    return jsonify(fewest_views)
+          description: A JSON object of the question with the fewest views, or a list of the bottom k
+    """
+    intitle, site = search_pair(request.args)
+    k = _k()
+    snapshot = _snapshot_query(intitle, site)
+    if snapshot is not None:
+        items = _snapshot_items(snapshot[1], StackQuestion.view_count, k)
+    else:
+        items = _live_summary(intitle, site, k)["fewest_views"]
+    return jsonify(_one_or_many(items, k))
 
 
 @stack_exchange.route("/oldest-recent")
@@ -178,32 +314,108 @@ def oldest_recent_route():
     ---
     get:
       description: Find and return the oldest and most recent questions based on the creation date
+      parameters:
+        - {name: intitle, in: query, schema: {type: string, default: perl}}
+        - {name: site, in: query, schema: {type: string, default: stackoverflow}}
       responses:
         200:
           description: A JSON object containing the oldest and most recent questions
     """
-    # Create headers with your client ID and key
-    headers = {
-        "User-Agent": "YourApp/1.0",  # Replace with your app name and version
-        "X-API-Key": current_app.config["KEY"],
-    }
-
-    # Make the API request
-    response = requests.get(
-        API_BASE_URL + "search",
-        params={
-            "order": "desc",
-            "sort": "activity",
-            "intitle": "perl",
-            "site": "stackoverflow",
-        },
-        headers=headers,
-    )
-
-    data = response.json()
-
-    # Find the oldest and most recent questions
-    oldest = min(data["items"], key=lambda item: int(item["creation_date"]))
-    most_recent = max(data["items"], key=lambda item: int(item["creation_date"]))
-
-    return jsonify({"oldest": oldest, "most_recent": most_recent})
+    intitle, site = search_pair(request.args)
+    snapshot = _snapshot_query(intitle, site)
+    if snapshot is not None:
+        oldest = _snapshot_items(snapshot[1], StackQuestion.creation_date, 1)
+        most_recent = _snapshot_items(
+            snapshot[1], StackQuestion.creation_date.desc(), 1
+        )
+        return jsonify(
+            {
+                "oldest": _one_or_many(oldest, 1),
+                "most_recent": _one_or_many(most_recent, 1),
+            }
+        )
+
+    summary = _live_summary(intitle, site, 1)
+    return jsonify({"oldest": summary["oldest"], "most_recent": summary["most_recent"]})
+
+
+@stack_exchange.route("/summary")
+def summary_route():
+    """
+    Stack Exchange Summary
+    ---
+    get:
+      description: Get every derived metric of a search in one call
+      parameters:
+        - {name: intitle, in: query, schema: {type: string, default: perl}}
+        - {name: site, in: query, schema: {type: string, default: stackoverflow}}
+        - {name: k, in: query, schema: {type: integer, default: 1}}
+      responses:
+        200:
+          description: A JSON object with the total, answered and unanswered counts, the top k questions by owner reputation, the bottom k by views, the oldest and most recent questions and the per-tag counts
+    """
+    intitle, site = search_pair(request.args)
+    k = _k()
+    snapshot = _snapshot_query(intitle, site)
+    if snapshot is not None:
+        summary = _snapshot_summary(*snapshot, k)
+    else:
+        summary = _live_summary(intitle, site, k)
+    return jsonify(dict(summary, intitle=intitle, site=site, k=k))
+
+
+@stack_exchange.route("/fan-out")
+def fan_out_route():
+    """
+    Stack Exchange Summary over Several Searches
+    ---
+    get:
+      description: Search several titles on several sites concurrently and summarize the distinct questions found like a single search
+      parameters:
+        - {name: intitle, in: query, description: Comma-separated titles, schema: {type: string, default: perl}}
+        - {name: site, in: query, description: Comma-separated sites, schema: {type: string, default: stackoverflow}}
+        - {name: k, in: query, schema: {type: integer, default: 1}}
+      responses:
+        200:
+          description: The /summary metrics of the merged questions, with the source and question count of each search and the searches that failed
+        400:
+          description: More than 20 intitle and site combinations
+    """
+    intitles = parse_str_list(request.args, "intitle") or [DEFAULT_INTITLE]
+    sites = parse_str_list(request.args, "site") or [DEFAULT_SITE]
+    k = _k()
+    pairs = [(intitle, site) for site in sites for intitle in intitles]
+    if len(pairs) > MAX_FANOUT_SEARCHES:
+        raise InvalidQueryParameter(
+            f"At most {MAX_FANOUT_SEARCHES} intitle and site combinations are allowed"
+        )
+
+    # Ingested snapshots are read here, on the request's database session; the other
+    # searches go to the live API concurrently
+    results = {}
+    for pair in pairs:
+        snapshot = _snapshot_query(*pair)
+        if snapshot is not None:
+            results[pair] = ("snapshot", list(_snapshot_all_items(snapshot[1])))
+    live = [pair for pair in pairs if pair not in results]
+    for pair, response in zip(live, fan_out(get_client(), live, _search)):
+        if isinstance(response, StackExchangeError):
+            results[pair] = ("error", response)
+        else:
+            results[pair] = ("live", response.data["items"])
+
+    errors = [results[pair][1] for pair in pairs if results[pair][0] == "error"]
+    if len(errors) == len(pairs):
+        raise errors[0]
+    found = [pair for pair in pairs if results[pair][0] != "error"]
+    summary = summarize_searches(found, [results[pair][1] for pair in found], k)
+    searches = []
+    for intitle, site in pairs:
+        source, value = results[(intitle, site)]
+        search = {"intitle": intitle, "site": site, "source": source}
+        if source == "error":
+            search["error"] = str(value)
+        else:
+            search["total"] = len(value)
+        searches.append(search)
+    return jsonify(dict(summary, searches=searches, k=k))
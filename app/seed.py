@@ -0,0 +1,89 @@
+"""
+Sample data loaded by ``flask seed`` (or ``flask db-init --seed``).
+"""
+
+from datetime import date
+
+from .models.flight_model import db, Aerolineas, Aeropuertos, Movimientos, Vuelos
+
+AEROLINEAS = [
+    (1, "Volaris"),
+    (2, "Aeromar"),
+    (3, "Interjet"),
+    (4, "Aeromexico"),
+]
+
+AEROPUERTOS = [
+    (1, "Benito Juarez"),
+    (2, "Guanajuato"),
+    (3, "La Paz"),
+    (4, "Oaxaca"),
+]
+
+MOVIMIENTOS = [
+    (1, "Salida"),
+    (2, "Llegada"),
+]
+
+# (id_aerolinea, id_aeropuerto, id_movimiento, dia)
+VUELOS = [
+    (1, 1, 1, date(2021, 5, 2)),
+    (2, 1, 1, date(2021, 5, 2)),
+    (3, 2, 2, date(2021, 5, 2)),
+    (4, 3, 2, date(2021, 5, 2)),
+    (1, 3, 2, date(2021, 5, 2)),
+    (2, 1, 1, date(2021, 5, 2)),
+    (2, 3, 1, date(2021, 5, 4)),
+    (3, 4, 1, date(2021, 5, 4)),
+    (3, 4, 2, date(2021, 5, 4)),
+]
+
+
+def populate_tables():
+    """
+    Populate the flight tables that are empty with the sample data.
+
+    Returns:
+        list: The names of the tables that were populated.
+    """
+    populated = []
+
+    # Check and populate Aerolineas if empty
+    if not Aerolineas.query.first():
+        db.session.add_all(
+            Aerolineas(id_aerolinea=key, nombre_aerolinea=name)
+            for key, name in AEROLINEAS
+        )
+        populated.append(Aerolineas.__table__.name)
+
+    # Check and populate Aeropuertos if empty
+    if not Aeropuertos.query.first():
+        db.session.add_all(
+            Aeropuertos(id_aeropuerto=key, nombre_aeropuerto=name)
+            for key, name in AEROPUERTOS
+        )
+        populated.append(Aeropuertos.__table__.name)
+
+    # Check and populate Movimientos if empty
+    if not Movimientos.query.first():
+        db.session.add_all(
+            Movimientos(id_movimiento=key, descripcion=name)
+            for key, name in MOVIMIENTOS
+        )
+        populated.append(Movimientos.__table__.name)
+
+    # Check and populate Vuelos if empty
+    if not Vuelos.query.first():
+        db.session.add_all(
+            Vuelos(
+                id_aerolinea=aerolinea,
+                id_aeropuerto=aeropuerto,
+                id_movimiento=movimiento,
+                dia=dia,
+            )
+            for aerolinea, aeropuerto, movimiento, dia in VUELOS
+        )
+        populated.append(Vuelos.__table__.name)
+
+    db.session.commit()
+    return populated
@@ -0,0 +1,124 @@
+"""
+Scheduled archival of old flight months.
+
+``archive_flights`` keeps the monthly partitions of vuelos ready ahead of time and moves the
+months older than the hot window to the archive (see app.models.partitions). It runs from the
+``flask archive-flights`` command (e.g. from cron) or from a ``FlightArchiver`` background
+thread, run by ``flask background-jobs`` when ``VUELOS_ARCHIVE_INTERVAL`` is set. On MySQL a
+named lock keeps concurrent runs from several hosts apart; elsewhere, run the jobs in a single
+process only.
+"""
+
+import logging
+import threading
+from datetime import date
+
+from sqlalchemy import text
+
+from ..models.changes import reserve
+from ..models.partitions import (
+    DEFAULT_PARTITIONS_AHEAD,
+    add_months,
+    archive_months,
+    ensure_partitions,
+    month_start,
+)
+
+logger = logging.getLogger(__name__)
+
+# Months, the current one included, kept in vuelos
+DEFAULT_HOT_MONTHS = 12
+
+LOCK_NAME = "vuelos_archive"
+
+
+def archive_flights(
+    engine,
+    hot_months=DEFAULT_HOT_MONTHS,
+    months_ahead=DEFAULT_PARTITIONS_AHEAD,
+    today=None,
+):
+    """
+    Prepare the coming partitions and archive the months before the hot window.
+
+    Args:
+        engine: The engine of the primary database.
+        hot_months (int): Months kept in vuelos, the current one included.
+        months_ahead (int): Months of partitions kept ready past the current one.
+        today (date, optional): The current date, for tests.
+
+    Returns:
+        dict or None: The months whose partitions were ``created`` and the ``archived``
+        (month, number of flights) pairs, or None when another run holds the lock.
+    """
+    current = month_start(today or date.today())
+    with engine.connect() as connection:
+        if not _lock(connection):
+            return None
+        try:
+            with connection.begin():
+                created = ensure_partitions(connection, months_ahead, current)
+                archived = archive_months(
+                    connection, add_months(current, 1 - hot_months)
+                )
+                if archived:
+                    # Invalidate the ETags of the bulk reads of vuelos
+                    reserve(connection)
+        finally:
+            _unlock(connection)
+    for month, count in archived:
+        logger.info("Archived %d flights of %s", count, f"{month:%Y-%m}")
+    return {"created": created, "archived": archived}
+
+
+def _lock(connection):
+    if connection.dialect.name != "mysql":
+        return True
+    acquired = connection.scalar(text("SELECT GET_LOCK(:name, 0)"), {"name": LOCK_NAME})
+    connection.commit()
+    return acquired == 1
+
+
+def _unlock(connection):
+    if connection.dialect.name == "mysql":
+        connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+        connection.commit()
+
+
+class FlightArchiver:
+    """
+    Background thread that runs ``archive_flights`` every ``interval`` seconds.
+
+    Args:
+        app (Flask): The application whose primary database is archived.
+        interval (float): Seconds between runs.
+        hot_months (int): Months kept in vuelos.
+        months_ahead (int): Months of partitions kept ready.
+    """
+
+    def __init__(self, app, interval, hot_months, months_ahead):
+        self.app = app
+        self.interval = interval
+        self.hot_months = hot_months
+        self.months_ahead = months_ahead
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="flight-archiver", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                engine = self.app.extensions["sqlalchemy"].engine
+                try:
+                    archive_flights(engine, self.hot_months, self.months_ahead)
+                except Exception:
+                    logger.exception("Archival of old flights failed")
+            self._stop.wait(self.interval)
@@ -0,0 +1,639 @@
+"""
+Live flight board: changes to Vuelos pushed to Server-Sent Events subscribers.
+
+Committed flight writes are published as events: ORM writes are collected by session
+listeners, bulk loads queue their chunks with ``queue_inserted_flights``. Events go through a
+broker to the ``FlightEventHub`` of every worker, whose dispatcher renders each event once
+(names from the dimension cache) and fans it out to the matching subscriptions, indexed by
+airport. A subscription is a bounded buffer of frames, not a thread: under gevent workers
+(``GUNICORN_WORKER_MODE=gevent``) an idle /data/vuelos/stream client costs one greenlet and
+a socket, so thousands of them fit in a worker (raise ``GUNICORN_CONNECTIONS`` to match).
+gevent is gunicorn.conf.py's default. Under gthread workers every open stream holds one of
+the worker's threads, so gunicorn caps the streams of such a worker below its
+``GUNICORN_THREADS`` (see ``fit_to_workers``). Each stream counts as a request towards
+``GUNICORN_MAX_REQUESTS``, and a recycled worker closes all of its streams: raise it, or set
+it to 0, on workers that serve the board.
+
+Brokers (``FLIGHT_BOARD_BROKER``):
+
+* empty or ``local``: events stay in the process that wrote them. Enough for one worker:
+  with several, the board is refused rather than silently missing the other workers' writes.
+  gunicorn.conf.py avoids this by running a relay for its workers when it starts several.
+* ``tcp://host:port``: events are sent to an ``EventRelay`` (``flask flight-relay``), which
+  forwards every line it receives to all connected workers, the sender included. It stands
+  in for a real broker such as Redis pub/sub and is just as lossy: events published while
+  the relay is unreachable are dropped.
+
+Delivery is best effort. A subscriber that falls ``FLIGHT_BOARD_MAX_PENDING`` events behind
+is disconnected with an ``overflow`` event; clients catch up with /data/vuelos/changes using
+the ID of the last event they received, which is its change sequence number.
+"""
+
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+from collections import deque
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from ..models.dimension_cache import dimension_cache
+from ..models.flight_model import Vuelos
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SUBSCRIBERS = 5000
+DEFAULT_MAX_PENDING = 100
+DEFAULT_HEARTBEAT = 15
+
+# Reconnection delay sent to EventSource clients, in milliseconds
+RETRY_MILLISECONDS = 3000
+
+# Seconds between attempts to reach the relay
+RELAY_RECONNECT = 1.0
+
+EVENT_COLUMNS = ("id_vuelo", "id_aerolinea", "id_aeropuerto", "id_movimiento", "dia")
+
+
+class BoardFull(Exception):
+    """
+    Raised when a worker cannot take another subscriber: it already serves
+    ``FLIGHT_BOARD_MAX_SUBSCRIBERS`` of them, or the board is refused by ``fit_to_workers``.
+    """
+
+
+def flight_event(op, seq, values, previous=None):
+    """
+    Build the event of a flight change.
+
+    Args:
+        op (str): ``insert``, ``update`` or ``delete``.
+        seq (int): The change sequence number of the change.
+        values (Mapping): The flight's columns.
+        previous (tuple, optional): The (id_aeropuerto, id_movimiento) of an updated flight
+            before the update, when they changed, so that its old board learns it left.
+
+    Returns:
+        dict: A JSON-ready event.
+    """
+    item = {"op": op, "seq": seq}
+    item.update((column, values[column]) for column in EVENT_COLUMNS)
+    item["dia"] = item["dia"].isoformat()
+    if previous is not None:
+        item["previous"] = list(previous)
+    return item
+
+
+def _event_keys(item):
+    keys = {(item["id_aeropuerto"], item["id_movimiento"])}
+    if "previous" in item:
+        keys.add(tuple(item["previous"]))
+    return keys
+
+
+class Subscription:
+    """
+    The pending frames of one stream and its filters.
+
+    Args:
+        airports (Iterable[int]): The airports of interest; empty for all.
+        movements (Iterable[int]): The movement types of interest; empty for all.
+        max_pending (int): Frames buffered before the subscription overflows.
+    """
+
+    def __init__(self, airports, movements, max_pending):
+        self.airports = frozenset(airports or ())
+        self.movements = frozenset(movements or ())
+        self.max_pending = max_pending
+        self.overflowed = False
+        self._frames = deque()
+        self._ready = threading.Event()
+
+    def matches(self, keys):
+        """Return whether any (airport, movement) pair of an event passes the filters."""
+        return any(
+            (not self.airports or airport in self.airports)
+            and (not self.movements or movement in self.movements)
+            for airport, movement in keys
+        )
+
+    def deliver(self, frame):
+        """
+        Buffer a frame. Returns False when it was dropped because the subscriber is behind.
+        """
+        if self.overflowed:
+            return False
+        if len(self._frames) >= self.max_pending:
+            self.overflowed = True
+            self._frames.clear()
+            self._ready.set()
+            return False
+        self._frames.append(frame)
+        self._ready.set()
+        return True
+
+    def get(self, timeout):
+        """
+        Wait up to ``timeout`` seconds for frames.
+
+        Returns:
+            list: The pending frames, empty when none arrived in time.
+        """
+        self._ready.wait(timeout)
+        self._ready.clear()
+        frames = []
+        while self._frames:
+            frames.append(self._frames.popleft())
+        return frames
+
+
+class LocalBroker:
+    """
+    Broker that hands the events straight back to the publishing process.
+    """
+
+    def start(self, receive):
+        self._receive = receive
+
+    def publish(self, events):
+        self._receive(events)
+
+    def close(self):
+        pass
+
+
+class RelayBroker:
+    """
+    Broker client of an ``EventRelay``. Events are sent as one JSON line per publish; a
+    background thread reads the lines the relay forwards and reconnects when it is lost.
+
+    Args:
+        host (str): The relay's host.
+        port (int): The relay's port.
+    """
+
+    def __init__(self, host, port):
+        self.address = (host, port)
+        self._lock = threading.Lock()
+        self._socket = None
+        self._closed = threading.Event()
+
+    def start(self, receive):
+        self._receive = receive
+        sock = self._connect()
+        threading.Thread(
+            target=self._run, args=(sock,), name="flight-board-relay", daemon=True
+        ).start()
+
+    def publish(self, events):
+        line = json.dumps(events, separators=(",", ":")).encode() + b"\n"
+        with self._lock:
+            sock = self._socket
+            if sock is not None:
+                try:
+                    sock.sendall(line)
+                    return
+                except OSError:
+                    pass
+        logger.warning(
+            "Dropped %d flight events: the relay is unreachable", len(events)
+        )
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            if self._socket is not None:
+                self._socket.close()
+
+    def _connect(self):
+        try:
+            sock = socket.create_connection(self.address)
+        except OSError:
+            logger.warning(
+                "Cannot reach the flight event relay at %s:%d", *self.address
+            )
+            return None
+        with self._lock:
+            self._socket = sock
+        return sock
+
+    def _run(self, sock):
+        while not self._closed.is_set():
+            if sock is None:
+                self._closed.wait(RELAY_RECONNECT)
+                sock = self._connect()
+                continue
+            try:
+                for line in sock.makefile("rb"):
+                    self._receive(json.loads(line))
+            except (OSError, ValueError):
+                pass
+            with self._lock:
+                self._socket = None
+            sock.close()
+            sock = None
+
+
+def make_broker(url):
+    """
+    Create the broker named by ``FLIGHT_BOARD_BROKER``.
+
+    Args:
+        url (str): Empty or ``local``, or ``tcp://host:port`` for an ``EventRelay``.
+    """
+    if not url or url == "local":
+        return LocalBroker()
+    if url.startswith("tcp://"):
+        host, _, port = url[len("tcp://") :].rpartition(":")
+        return RelayBroker(host or "127.0.0.1", int(port))
+    raise ValueError(f"Unknown flight board broker: {url}")
+
+
+class FlightEventHub:
+    """
+    The per-process pub/sub hub of flight events.
+
+    The dispatcher thread and the broker connection are started on first use in each
+    process, so that workers forked from a preloading master get their own.
+
+    Args:
+        app (Flask): The application whose dimension cache names the flights.
+        broker: A ``LocalBroker`` or ``RelayBroker``.
+        max_subscribers (int): Subscriptions accepted by this process.
+        max_pending (int): Frames buffered per subscription.
+    """
+
+    def __init__(self, app, broker, max_subscribers, max_pending):
+        self.app = app
+        self.broker = broker
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        # Airport ID, or None for the subscriptions to every airport -> subscriptions
+        self._buckets = {}
+        self._subscribers = 0
+        self._published = 0
+        self._dispatched = 0
+        self._dropped = 0
+        self._pid = None
+        self._inbox = None
+        # Why every subscription is refused, when it is
+        self.refusal = None
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._inbox = queue.Queue()
+            threading.Thread(
+                target=self._dispatch_forever, name="flight-board", daemon=True
+            ).start()
+            self.broker.start(self._inbox.put)
+            self._pid = os.getpid()
+
+    def subscribe(self, airports=None, movements=None):
+        """
+        Open a subscription to the flights of some airports and movement types.
+
+        Raises:
+            BoardFull: When the process already has ``max_subscribers`` subscriptions, or
+                the board is refused.
+        """
+        if self.refusal is not None:
+            raise BoardFull(self.refusal)
+        self._ensure_started()
+        subscription = Subscription(airports, movements, self.max_pending)
+        with self._lock:
+            if self._subscribers >= self.max_subscribers:
+                raise BoardFull(
+                    f"This worker already serves {self.max_subscribers} subscribers"
+                )
+            for airport in subscription.airports or (None,):
+                self._buckets.setdefault(airport, set()).add(subscription)
+            self._subscribers += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Close a subscription. Closing it twice is harmless."""
+        with self._lock:
+            removed = False
+            for airport in subscription.airports or (None,):
+                bucket = self._buckets.get(airport)
+                if bucket is not None and subscription in bucket:
+                    bucket.discard(subscription)
+                    removed = True
+                    if not bucket:
+                        del self._buckets[airport]
+            if removed:
+                self._subscribers -= 1
+
+    def fit_to_workers(self, worker_class, threads, workers):
+        """
+        Fit the subscriber cap to the gunicorn workers serving the application.
+
+        Outside gevent workers an open stream holds a thread for as long as it lasts (a sync
+        worker has one), so a worker takes at most one stream fewer than its threads, keeping
+        one for the other requests. With the local broker and several workers, a subscriber
+        would miss the writes of the other workers: the board is refused instead.
+
+        Args:
+            worker_class (str): The gunicorn worker class, e.g. ``gthread`` or ``gevent``.
+            threads (int): The threads of a worker.
+            workers (int): The number of workers.
+        """
+        if workers > 1 and isinstance(self.broker, LocalBroker):
+            self.refusal = (
+                "The live flight board needs FLIGHT_BOARD_BROKER=tcp://HOST:PORT "
+                "(flask flight-relay) when several workers serve it"
+            )
+            logger.error(
+                "The live flight board is disabled: %d workers share no broker. %s.",
+                workers,
+                self.refusal,
+            )
+        elif "gevent" not in worker_class:
+            self.max_subscribers = min(self.max_subscribers, max(threads - 1, 0))
+
+    def publish(self, events):
+        """
+        Publish committed flight changes to every worker.
+
+        Args:
+            events (list): Events built with ``flight_event``.
+        """
+        if not events:
+            return
+        self._ensure_started()
+        self._published += len(events)
+        self.broker.publish(events)
+
+    def state(self):
+        """
+        Return the number of subscribers and of published, dispatched and dropped events.
+        """
+        return {
+            "subscribers": self._subscribers,
+            "published": self._published,
+            "dispatched": self._dispatched,
+            "dropped": self._dropped,
+        }
+
+    def wait_idle(self):
+        """
+        Block until the events received by this process so far have been dispatched.
+        """
+        if self._pid == os.getpid():
+            self._inbox.join()
+
+    def _dispatch_forever(self):
+        while True:
+            events = self._inbox.get()
+            try:
+                self.dispatch(events)
+            except Exception:
+                logger.exception("Dispatch of %d flight events failed", len(events))
+            finally:
+                self._inbox.task_done()
+
+    def dispatch(self, events):
+        """
+        Hand events to the matching subscriptions, rendering each event at most once and
+        only when some subscription wants it.
+        """
+        names = None
+        for item in events:
+            keys = _event_keys(item)
+            with self._lock:
+                candidates = set(self._buckets.get(None, ()))
+                for airport, _ in keys:
+                    candidates.update(self._buckets.get(airport, ()))
+            targets = [
+                subscription
+                for subscription in candidates
+                if subscription.matches(keys)
+            ]
+            if not targets:
+                continue
+            if names is None:
+                with self.app.app_context():
+                    names = dimension_cache.snapshot().names
+            frame = self.render(item, names, self.app.json.dumps)
+            for subscription in targets:
+                if subscription.deliver(frame):
+                    self._dispatched += 1
+                else:
+                    self._dropped += 1
+
+    @staticmethod
+    def render(item, names, dumps):
+        """
+        Return the Server-Sent Events frame of an event, with the flight as /data/vuelos
+        shows it plus its airport and movement IDs.
+        """
+        flight = {
+            "id_vuelo": item["id_vuelo"],
+            "nombre_aerolinea": names["aerolineas"].get(item["id_aerolinea"]),
+            "nombre_aeropuerto": names["aeropuertos"].get(item["id_aeropuerto"]),
+            "tipo_movimiento": names["movimientos"].get(item["id_movimiento"]),
+            "dia": item["dia"],
+            "id_aeropuerto": item["id_aeropuerto"],
+            "id_movimiento": item["id_movimiento"],
+        }
+        data = dumps({"op": item["op"], "vuelo": flight}, separators=(",", ":"))
+        return f"id: {item['seq']}\nevent: {item['op']}\ndata: {data}\n\n".encode()
+
+
+class FlightBoard:
+    """
+    Flask extension publishing flight changes to the live board subscribers.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Create the application's event hub.
+
+        Args:
+            app (Flask): The application. ``FLIGHT_BOARD_BROKER`` selects the broker,
+                ``FLIGHT_BOARD_MAX_SUBSCRIBERS`` caps the streams per worker,
+                ``FLIGHT_BOARD_MAX_PENDING`` the events buffered per stream and
+                ``FLIGHT_BOARD_HEARTBEAT`` the seconds between keep-alive comments.
+        """
+        app.config.setdefault("FLIGHT_BOARD_BROKER", "")
+        app.config.setdefault("FLIGHT_BOARD_MAX_SUBSCRIBERS", DEFAULT_MAX_SUBSCRIBERS)
+        app.config.setdefault("FLIGHT_BOARD_MAX_PENDING", DEFAULT_MAX_PENDING)
+        app.config.setdefault("FLIGHT_BOARD_HEARTBEAT", DEFAULT_HEARTBEAT)
+        app.extensions["flight_board"] = FlightEventHub(
+            app,
+            make_broker(app.config["FLIGHT_BOARD_BROKER"]),
+            app.config["FLIGHT_BOARD_MAX_SUBSCRIBERS"],
+            app.config["FLIGHT_BOARD_MAX_PENDING"],
+        )
+
+    @staticmethod
+    def hub():
+        """Return the event hub of the current application."""
+        return current_app.extensions["flight_board"]
+
+
+flight_board = FlightBoard()
+
+
+def stream_events(hub, subscription, heartbeat):
+    """
+    Yield the Server-Sent Events of a subscription until the client disconnects or falls
+    too far behind.
+
+    Args:
+        hub (FlightEventHub): The hub the subscription belongs to.
+        subscription (Subscription): An open subscription, closed when the stream ends.
+        heartbeat (float): Seconds of silence after which a keep-alive comment is sent.
+    """
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n".encode()
+        while True:
+            frames = subscription.get(heartbeat)
+            if subscription.overflowed:
+                yield b"event: overflow\ndata: {}\n\n"
+                return
+            yield b"".join(frames) if frames else b": keep-alive\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+def queue_inserted_flights(session, first, last):
+    """
+    Queue the events of flights inserted with Core statements, published on commit.
+
+    Args:
+        session: The session whose transaction inserted the flights.
+        first (int): The change sequence number of the first inserted flight.
+        last (int): The change sequence number of the last one.
+    """
+    rows = session.execute(
+        select(
+            Vuelos.seq, *(getattr(Vuelos, column) for column in EVENT_COLUMNS)
+        ).where(Vuelos.seq.between(first, last))
+    ).mappings()
+    session.info.setdefault("flight_events", []).extend(
+        flight_event("insert", row["seq"], row) for row in rows
+    )
+
+
+def _values(flight):
+    return {column: getattr(flight, column) for column in EVENT_COLUMNS}
+
+
+def _previous_route(flight):
+    """
+    Return the (id_aeropuerto, id_movimiento) of a modified flight before the pending
+    changes, or None when neither changed.
+    """
+    state = inspect(flight)
+    route = []
+    changed = False
+    for column in ("id_aeropuerto", "id_movimiento"):
+        history = state.attrs[column].history
+        if history.deleted:
+            changed = True
+            route.append(history.deleted[0])
+        else:
+            route.append(getattr(flight, column))
+    return tuple(route) if changed else None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flight_events(session, flush_context):
+    """
+    Remember the flights written by a flush until the transaction commits.
+    """
+    events = []
+    for flight in session.new:
+        if isinstance(flight, Vuelos):
+            events.append(flight_event("insert", flight.seq, _values(flight)))
+    for flight in session.dirty:
+        if isinstance(flight, Vuelos) and session.is_modified(flight):
+            events.append(
+                flight_event(
+                    "update", flight.seq, _values(flight), _previous_route(flight)
+                )
+            )
+    for flight in session.deleted:
+        if isinstance(flight, Vuelos):
+            events.append(flight_event("delete", flight.seq, _values(flight)))
+    if events:
+        session.info.setdefault("flight_events", []).extend(events)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session):
+    """
+    Publish the flight events of a committed transaction.
+    """
+    events = session.info.pop("flight_events", None)
+    if events and has_app_context() and "flight_board" in current_app.extensions:
+        try:
+            current_app.extensions["flight_board"].publish(events)
+        except Exception:
+            logger.exception("Publishing %d flight events failed", len(events))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_flight_events(session):
+    session.info.pop("flight_events", None)
+
+
+class EventRelay(socketserver.ThreadingTCPServer):
+    """
+    Minimal stand-in for a pub/sub broker: every line received from a client is forwarded
+    to all connected clients. A client that cannot keep up slows the others down.
+
+    Args:
+        address (tuple): The (host, port) to listen on; port 0 picks a free one.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _RelayHandler)
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+
+    def add(self, sock):
+        with self._clients_lock:
+            self._clients[sock] = threading.Lock()
+
+    def remove(self, sock):
+        with self._clients_lock:
+            self._clients.pop(sock, None)
+
+    def broadcast(self, line):
+        with self._clients_lock:
+            clients = list(self._clients.items())
+        for sock, lock in clients:
+            try:
+                with lock:
+                    sock.sendall(line)
+            except OSError:
+                self.remove(sock)
+
+
+class _RelayHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.add(self.request)
+        try:
+            for line in self.rfile:
+                self.server.broadcast(line)
+        finally:
+            self.server.remove(self.request)
@@ -0,0 +1,263 @@
+"""
+Streaming export of flights as CSV, Parquet or Arrow IPC.
+
+Rows are read from a server-side cursor one batch at a time and written straight into the
+output writer, whose bytes are handed to the response as soon as each batch is encoded, so
+memory stays bounded by the batch size whatever the number of flights.
+
+Airline, airport and movement names come from the dimension cache. In Parquet and Arrow they
+are dictionary-encoded columns whose dictionary is the whole dimension table, so each row only
+carries a small integer index.
+
+Parquet and Arrow need the optional ``pyarrow`` package and zstd compression the optional
+``zstandard`` package; ``available_formats`` and ``available_compressions`` report what the
+running server supports.
+"""
+
+import csv
+import io
+import zlib
+from datetime import date
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Rows fetched from the cursor and encoded per batch (one Parquet row group each)
+EXPORT_BATCH_SIZE = 10000
+
+# Format -> (content type, file extension)
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+# Compression of the whole output -> (content type, file extension suffix). Parquet and
+# Arrow compress their data pages and buffers instead, and keep their own content type.
+COMPRESSIONS = {
+    "gzip": ("application/gzip", "gz"),
+    "zstd": ("application/zstd", "zst"),
+}
+
+
+class UnsupportedExport(ValueError):
+    """
+    Raised when a format or compression is unknown or not available on this server.
+    """
+
+
+def available_formats():
+    """Return the export formats supported by the installed packages."""
+    return [fmt for fmt in FORMATS if fmt == "csv" or pa is not None]
+
+
+def available_compressions():
+    """Return the compressions supported by the installed packages."""
+    return [name for name in COMPRESSIONS if name == "gzip" or zstandard is not None]
+
+
+def check_export(fmt, compression):
+    """
+    Validate a format and an optional compression.
+
+    Raises:
+        UnsupportedExport: If either is unknown or unavailable, or the combination is invalid.
+    """
+    if fmt not in available_formats():
+        raise UnsupportedExport(
+            f"'format' must be one of {', '.join(available_formats())}"
+        )
+    if compression is not None and compression not in available_compressions():
+        raise UnsupportedExport(
+            f"'compression' must be one of {', '.join(available_compressions())}"
+        )
+    if fmt == "arrow" and compression == "gzip":
+        raise UnsupportedExport("Arrow streams support zstd compression only")
+
+
+def export_metadata(fmt, compression, name="vuelos"):
+    """
+    Return the content type and file name of an export.
+    """
+    content_type, extension = FORMATS[fmt]
+    filename = f"{name}.{extension}"
+    if fmt == "csv" and compression is not None:
+        content_type, suffix = COMPRESSIONS[compression]
+        filename += "." + suffix
+    return content_type, filename
+
+
+class _Sink(io.RawIOBase):
+    """
+    Write-only file collecting the bytes produced by a writer until they are drained,
+    optionally compressing them on the way.
+    """
+
+    def __init__(self, compression=None):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+        if compression == "gzip":
+            self._compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+        elif compression == "zstd":
+            self._compressor = zstandard.ZstdCompressor().compressobj()
+        else:
+            self._compressor = None
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        size = len(data)
+        self._position += size
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        if data:
+            self._chunks.append(data)
+        return size
+
+    def tell(self):
+        return self._position
+
+    def drain(self, final=False):
+        """
+        Return the bytes written since the last call; with ``final``, flush the compressor.
+        """
+        if final and self._compressor is not None:
+            self._chunks.append(self._compressor.flush())
+            self._compressor = None
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _CsvEncoder:
+    """
+    Encodes batches of rows as CSV lines with a header, names and ISO dates.
+    """
+
+    def __init__(self, fields, names, sink):
+        self.fields = fields
+        self.names = names
+        self.sink = sink
+        self.text = io.StringIO()
+        self.writer = csv.writer(self.text, lineterminator="\n")
+        self.writer.writerow(fields)
+        # The header goes out even when no row follows
+        self._flush()
+
+    def _flush(self):
+        self.sink.write(self.text.getvalue().encode())
+        self.text.seek(0)
+        self.text.truncate()
+
+    def write(self, rows):
+        names = [self.names.get(field) for field in self.fields]
+        for row in rows:
+            self.writer.writerow(
+                [
+                    (
+                        mapping.get(value)
+                        if mapping is not None
+                        else value.isoformat() if isinstance(value, date) else value
+                    )
+                    for mapping, value in zip(names, row[1:])
+                ]
+            )
+        self._flush()
+
+    def close(self):
+        """CSV has no trailer: every batch is already in the sink."""
+
+
+class _ArrowEncoder:
+    """
+    Encodes batches of rows as Arrow record batches, written to an IPC stream or a Parquet file.
+    """
+
+    def __init__(self, fields, names, sink, fmt, compression):
+        self.fields = fields
+        self.dictionaries = {}
+        arrow_fields = []
+        for field in fields:
+            if field in names:
+                # Index of every ID in the dimension's dictionary of names
+                ids = list(names[field])
+                self.dictionaries[field] = (
+                    {key: position for position, key in enumerate(ids)},
+                    pa.array([names[field][key] for key in ids], pa.string()),
+                )
+                arrow_fields.append(
+                    pa.field(field, pa.dictionary(pa.int32(), pa.string()))
+                )
+            elif field == "dia":
+                arrow_fields.append(pa.field(field, pa.date32()))
+            else:
+                arrow_fields.append(pa.field(field, pa.int64()))
+        self.schema = pa.schema(arrow_fields)
+        if fmt == "parquet":
+            self.writer = pq.ParquetWriter(
+                sink, self.schema, compression=compression or "snappy"
+            )
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=compression)
+            self.writer = pa.ipc.new_stream(sink, self.schema, options=options)
+
+    def write(self, rows):
+        columns = []
+        for index, field in enumerate(self.fields, start=1):
+            values = [row[index] for row in rows]
+            if field in self.dictionaries:
+                positions, dictionary = self.dictionaries[field]
+                indices = pa.array(
+                    [positions.get(value) for value in values], pa.int32()
+                )
+                columns.append(pa.DictionaryArray.from_arrays(indices, dictionary))
+            else:
+                columns.append(pa.array(values, self.schema.field(field).type))
+        self.writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def export_rows(result, fields, names, fmt, compression=None):
+    """
+    Encode a server-side cursor of rows, one batch at a time.
+
+    Args:
+        result: A SQLAlchemy result opened with ``yield_per``, whose rows hold a cursor
+            column followed by ``fields``.
+        fields (list): The output fields.
+        names (dict): Field -> {id: name} for the fields holding dimension IDs.
+        fmt (str): ``csv``, ``parquet`` or ``arrow``.
+        compression (str, optional): ``gzip`` or ``zstd``.
+
+    Yields:
+        bytes: Chunks of the output.
+    """
+    try:
+        if fmt == "csv":
+            sink = _Sink(compression)
+            encoder = _CsvEncoder(fields, names, sink)
+        else:
+            sink = _Sink()
+            encoder = _ArrowEncoder(fields, names, sink, fmt, compression)
+        for rows in result.partitions():
+            encoder.write(rows)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        encoder.close()
+        yield sink.drain(final=True)
+    finally:
+        result.close()
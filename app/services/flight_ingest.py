@@ -0,0 +1,232 @@
+"""
+Bulk loading of flights from CSV or NDJSON streams.
+
+Each record holds ``id_aerolinea``, ``id_aeropuerto``, ``id_movimiento`` and ``dia``
+(YYYY-MM-DD). Records are validated against the in-memory dimension tables, so a load costs
+no lookup queries, and written in chunks: one Core executemany INSERT plus the matching
+VuelosDiarios deltas and change sequence numbers per chunk, committed as one transaction.
+
+Loads are not atomic as a whole. When a load stops at an invalid record, every record before
+it has been committed and ``FlightLoadError.line`` tells where to resume.
+"""
+
+import csv
+import io
+import json
+from datetime import date
+
+from sqlalchemy import insert
+
+from ..models.changes import stamp_flights
+from ..models.dimension_cache import dimension_cache
+from ..models.flight_model import db, Vuelos
+from ..models.rollup import apply_rollup_deltas, count_flights
+from .flight_board import queue_inserted_flights
+
+# Records written per executemany and transaction
+DEFAULT_CHUNK_SIZE = 5000
+
+# Rejected records reported back in detail when invalid records are skipped
+MAX_REPORTED_ERRORS = 100
+
+# Flight columns that reference a dimension table
+FOREIGN_KEYS = (
+    ("id_aerolinea", "aerolineas"),
+    ("id_aeropuerto", "aeropuertos"),
+    ("id_movimiento", "movimientos"),
+)
+
+COLUMNS = tuple(column for column, _ in FOREIGN_KEYS) + ("dia",)
+
+
+class InvalidFlightRecord(ValueError):
+    """
+    Raised when a record of a bulk load is malformed or references an unknown dimension ID.
+    """
+
+
+class FlightLoadError(InvalidFlightRecord):
+    """
+    Raised when a load stops at an invalid record.
+
+    Attributes:
+        line (int): The line of the invalid record in the input.
+        inserted (int): The number of flights committed before it.
+    """
+
+    def __init__(self, message, line, inserted):
+        super().__init__(message)
+        self.line = line
+        self.inserted = inserted
+
+
+def read_csv(stream):
+    """
+    Read flight records from CSV text with a header line.
+
+    Args:
+        stream (Iterable[str]): The lines of the input.
+
+    Yields:
+        tuple: (line number, record dict).
+    """
+    reader = csv.DictReader(stream)
+    missing = [column for column in COLUMNS if column not in (reader.fieldnames or ())]
+    if missing:
+        raise FlightLoadError(
+            f"CSV header is missing the columns {', '.join(missing)}", 1, 0
+        )
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_ndjson(stream):
+    """
+    Read flight records from newline-delimited JSON objects. Blank lines are ignored.
+
+    Args:
+        stream (Iterable[str]): The lines of the input.
+
+    Yields:
+        tuple: (line number, record dict, or None for a line that is not a JSON object).
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+
+# Input format -> reader
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+class _RawReader(io.RawIOBase):
+    """
+    Adapts a file-like object that only has ``read`` (e.g. gunicorn's request body) to the
+    io interface expected by ``io.TextIOWrapper``.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def text_stream(binary):
+    """
+    Decode a binary stream (e.g. the request body) as UTF-8 lines.
+    """
+    if not hasattr(binary, "readable"):
+        binary = io.BufferedReader(_RawReader(binary))
+    return io.TextIOWrapper(binary, encoding="utf-8", newline="")
+
+
+def flight_values(record, names):
+    """
+    Convert an input record into the column values of a Vuelos row.
+
+    Args:
+        record (dict): The record read from the input, or None if it could not be parsed.
+        names (dict): The dimension id -> name maps of a dimension cache snapshot.
+
+    Returns:
+        dict: The column values.
+
+    Raises:
+        InvalidFlightRecord: If a field is missing or malformed or an ID is unknown.
+    """
+    if record is None:
+        raise InvalidFlightRecord("Record is not a JSON object")
+    values = {}
+    for column, dimension in FOREIGN_KEYS:
+        try:
+            key = int(record[column])
+        except KeyError:
+            raise InvalidFlightRecord(f"Missing field '{column}'")
+        except (ValueError, TypeError):
+            raise InvalidFlightRecord(f"'{column}' must be an integer")
+        if key not in names[dimension]:
+            raise InvalidFlightRecord(f"Unknown {column} {key}")
+        values[column] = key
+    try:
+        values["dia"] = date.fromisoformat(record["dia"])
+    except KeyError:
+        raise InvalidFlightRecord("Missing field 'dia'")
+    except (ValueError, TypeError):
+        raise InvalidFlightRecord("'dia' must be a date in YYYY-MM-DD format")
+    return values
+
+
+def load_flights(records, chunk_size=DEFAULT_CHUNK_SIZE, skip_invalid=False):
+    """
+    Validate and insert flight records, one transaction per chunk.
+
+    Args:
+        records (Iterable[tuple]): (line number, record) pairs from ``read_csv`` or
+            ``read_ndjson``.
+        chunk_size (int): The number of flights written per INSERT and transaction.
+        skip_invalid (bool): Skip invalid records and report them instead of stopping.
+
+    Returns:
+        dict: ``inserted`` and ``rejected`` counts, and ``errors``, the line and message of
+        the first rejected records.
+
+    Raises:
+        FlightLoadError: On the first invalid record unless ``skip_invalid`` is set. The
+            records before it are committed.
+    """
+    names = dimension_cache.snapshot().names
+    inserted = 0
+    rejected = 0
+    errors = []
+    chunk = []
+    for line, record in records:
+        try:
+            chunk.append(flight_values(record, names))
+        except InvalidFlightRecord as error:
+            if not skip_invalid:
+                # Keep what precedes the invalid record, so the load can resume from it
+                inserted += _write_chunk(chunk)
+                raise FlightLoadError(str(error), line, inserted) from None
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": line, "error": str(error)})
+            continue
+        if len(chunk) >= chunk_size:
+            inserted += _write_chunk(chunk)
+            chunk = []
+    inserted += _write_chunk(chunk)
+    return {"inserted": inserted, "rejected": rejected, "errors": errors}
+
+
+def _write_chunk(rows):
+    """
+    Insert a chunk of flights and their rollup deltas in one transaction, and queue their
+    flight board events for the commit.
+
+    Returns:
+        int: The number of flights inserted.
+    """
+    if not rows:
+        return 0
+    try:
+        connection = db.session.connection()
+        stamped = stamp_flights(connection, rows)
+        db.session.execute(insert(Vuelos.__table__), stamped)
+        apply_rollup_deltas(connection, count_flights(rows))
+        queue_inserted_flights(db.session, stamped[0]["seq"], stamped[-1]["seq"])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(rows)
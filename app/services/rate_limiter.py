@@ -0,0 +1,126 @@
+"""
+Shared rate-limit state for the Stack Exchange API.
+
+The API asks clients to pause with a ``backoff`` field (seconds) and reports the remaining
+daily quota in ``quota_remaining``. Instead of sleeping inside a request, the limiter records
+the backoff deadline and the quota from every response, and the client consults it before
+calling upstream: while in backoff or out of quota it serves stale cached data or rejects the
+request immediately. Out of quota, one call is let through every ``QUOTA_RETRY`` seconds to
+read the quota again, since only responses report it. The number of concurrent upstream calls
+is capped without blocking.
+"""
+
+import threading
+import time
+from collections import Counter
+
+DEFAULT_MAX_CONCURRENT = 4
+
+# Seconds between the calls that check whether an exhausted daily quota was reset
+QUOTA_RETRY = 60.0
+
+
+class RateLimiter:
+    """
+    Backoff deadline, quota and concurrency bookkeeping shared by all requests of a worker.
+
+    Args:
+        max_concurrent (int): Maximum number of upstream calls in flight at once.
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT):
+        self.max_concurrent = max_concurrent
+        self.backoff_until = 0.0
+        self.quota_remaining = None
+        self.quota_max = None
+        self.quota_blocked_until = 0.0
+        self.inflight = 0
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, data):
+        """
+        Update the state from an API payload.
+
+        Args:
+            data (dict): The decoded response, possibly holding ``backoff``,
+                ``quota_remaining`` and ``quota_max``.
+        """
+        with self._lock:
+            if data.get("backoff"):
+                self.backoff_until = max(
+                    self.backoff_until, time.monotonic() + float(data["backoff"])
+                )
+                self.counters["backoff_received"] += 1
+            if "quota_remaining" in data:
+                self.quota_remaining = data["quota_remaining"]
+                self.quota_blocked_until = (
+                    time.monotonic() + QUOTA_RETRY if self.quota_remaining <= 0 else 0.0
+                )
+            if "quota_max" in data:
+                self.quota_max = data["quota_max"]
+
+    def blocked_for(self):
+        """
+        Return how many seconds upstream calls must wait, or 0 if they may proceed now.
+        """
+        with self._lock:
+            now = time.monotonic()
+            remaining = self.backoff_until - now
+            if remaining > 0:
+                return remaining
+            if self.quota_remaining is not None and self.quota_remaining <= 0:
+                # The daily quota resets at an unknown time: let this call through to read
+                # it again, and hold the others back until the next check
+                remaining = self.quota_blocked_until - now
+                if remaining > 0:
+                    return remaining
+                self.quota_blocked_until = now + QUOTA_RETRY
+            return 0.0
+
+    def try_acquire(self):
+        """
+        Reserve a slot for an upstream call without waiting.
+
+        Returns:
+            bool: True if the call may proceed; the caller must then call ``release``.
+        """
+        with self._lock:
+            if self.inflight >= self.max_concurrent:
+                return False
+            self.inflight += 1
+            self.counters["upstream_calls"] += 1
+            return True
+
+    def release(self):
+        """
+        Free a slot reserved with ``try_acquire``.
+        """
+        with self._lock:
+            self.inflight -= 1
+
+    def count(self, name):
+        """
+        Increment one of the event counters exposed in ``state``.
+        """
+        with self._lock:
+            self.counters[name] += 1
+
+    def state(self):
+        """
+        Return a snapshot of the limiter for the metrics.
+
+        Returns:
+            dict: The backoff remaining, quota, upstream concurrency and event counters.
+        """
+        with self._lock:
+            return {
+                "backoff_remaining": round(
+                    max(0.0, self.backoff_until - time.monotonic()), 3
+                ),
+                "quota_remaining": self.quota_remaining,
+                "quota_max": self.quota_max,
+                "inflight": self.inflight,
+                "max_concurrent": self.max_concurrent,
+                "counters": dict(self.counters),
+            }
@@ -0,0 +1,113 @@
+"""
+Single-pass analytics over a Stack Exchange result set.
+
+``summarize`` walks the items once and derives every metric the /stackexchange routes
+serve: answered/unanswered counts, the top-k questions by owner reputation, the bottom-k by
+views, the oldest and most recent questions and the number of questions per tag.
+``summary_for`` memoizes the result on a cached client response, so every route and request
+served by the same payload shares one computation.
+"""
+
+import heapq
+from collections import Counter
+
+
+def owner_reputation(item):
+    """
+    Return the owner's reputation of a question as an integer, 0 if missing or invalid.
+    """
+    try:
+        return int((item.get("owner") or {}).get("reputation", 0))
+    except (ValueError, TypeError):
+        return 0
+
+
+def summarize(items, k=1):
+    """
+    Compute all derived metrics of a result set in one pass.
+
+    Ties are resolved in favour of the item that comes first, like ``min`` and ``max``.
+
+    Args:
+        items (Iterable[dict]): The questions as returned by the API.
+        k (int): How many questions to keep in the top/bottom rankings.
+
+    Returns:
+        dict: ``total``, ``answered``, ``unanswered``, ``highest_reputation`` and
+        ``fewest_views`` (lists of up to k items, best first), ``oldest``, ``most_recent``
+        and ``tags`` (tag -> count, most frequent first).
+    """
+    answered = 0
+    total = 0
+    # Min-heaps of size k holding (sort key, -position, item); the root is the entry to evict.
+    # Positions are unique, so items themselves are never compared.
+    top_reputation = []
+    bottom_views = []
+    oldest = most_recent = None
+    oldest_date = most_recent_date = None
+    tags = Counter()
+
+    for index, item in enumerate(items):
+        total += 1
+        if item.get("is_answered"):
+            answered += 1
+
+        entry = (owner_reputation(item), -index, item)
+        if len(top_reputation) < k:
+            heapq.heappush(top_reputation, entry)
+        elif entry > top_reputation[0]:
+            heapq.heapreplace(top_reputation, entry)
+
+        entry = (-int(item.get("view_count", 0)), -index, item)
+        if len(bottom_views) < k:
+            heapq.heappush(bottom_views, entry)
+        elif entry > bottom_views[0]:
+            heapq.heapreplace(bottom_views, entry)
+
+        created = int(item["creation_date"])
+        if oldest_date is None or created < oldest_date:
+            oldest, oldest_date = item, created
+        if most_recent_date is None or created > most_recent_date:
+            most_recent, most_recent_date = item, created
+
+        tags.update(item.get("tags", ()))
+
+    return {
+        "total": total,
+        "answered": answered,
+        "unanswered": total - answered,
+        "highest_reputation": _ranked(top_reputation),
+        "fewest_views": _ranked(bottom_views),
+        "oldest": oldest,
+        "most_recent": most_recent,
+        "tags": dict(tags.most_common()),
+    }
+
+
+def _ranked(heap):
+    """
+    Turn a ranking heap into its items, best first.
+    """
+    return [
+        item for _, _, item in sorted(heap, key=lambda entry: entry[:2], reverse=True)
+    ]
+
+
+def summary_for(response, k=1):
+    """
+    Return the summary of a cached client response, computing it at most once per k.
+
+    Args:
+        response (CachedResponse): A response returned by the Stack Exchange client.
+        k (int): How many questions to keep in the rankings.
+
+    Returns:
+        dict: See ``summarize``.
+    """
+    key = ("summary", k)
+    summary = response.memo.get(key)
+    if summary is None:
+        summary = response.memo.setdefault(
+            key, summarize(response.data.get("items", []), k)
+        )
+    return summary
@@ -0,0 +1,289 @@
+"""
+Shared HTTP client for the Stack Exchange API.
+
+One client is created per application and reused by every route. It keeps a pooled
+``requests.Session`` (connection reuse, one TLS handshake per pooled connection), applies a
+timeout to every call, caches successful responses for ``STACKEXCHANGE_CACHE_TTL`` seconds
+keyed on the path and query parameters, and coalesces concurrent identical requests so that
+N simultaneous callers cause a single upstream call (single-flight).
+
+Upstream calls go through a ``RateLimiter``: while the API has asked for a backoff, the quota
+is exhausted or too many calls are already in flight, expired cache entries are served stale
+(up to ``STACKEXCHANGE_STALE_TTL`` seconds old) and requests without one are rejected at once
+with ``UpstreamUnavailable`` rather than blocking a worker.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+from .rate_limiter import DEFAULT_MAX_CONCURRENT, RateLimiter
+
+# Define the base URL for Stack Exchange API
+API_BASE_URL = "https://api.stackexchange.com/2.2/"
+
+DEFAULT_CACHE_TTL = 60
+DEFAULT_STALE_TTL = 3600
+DEFAULT_TIMEOUT = 10
+DEFAULT_POOL_SIZE = 10
+MAX_CACHE_ENTRIES = 256
+
+
+class StackExchangeError(Exception):
+    """
+    Raised when the Stack Exchange API cannot be reached or returns an error.
+
+    Attributes:
+        status_code (int): The HTTP status to report to our own client.
+    """
+
+    def __init__(self, message, status_code=502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UpstreamUnavailable(StackExchangeError):
+    """
+    Raised when no upstream call may be made right now and no stale data can be served.
+
+    Attributes:
+        retry_after (int): Seconds after which the client may retry.
+    """
+
+    def __init__(self, message, retry_after, status_code=503):
+        super().__init__(message, status_code)
+        self.retry_after = retry_after
+
+
+class CachedResponse:
+    """
+    A decoded API response held in the client cache.
+
+    Attributes:
+        data (dict): The decoded JSON payload. Shared between callers, must not be mutated.
+        fetched_at (float): ``time.monotonic()`` when the payload was received.
+        memo (dict): Scratch space for values derived from ``data``, computed once per payload.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.fetched_at = time.monotonic()
+        self.memo = {}
+
+    def age(self):
+        """
+        Return the number of seconds since the payload was received.
+        """
+        return time.monotonic() - self.fetched_at
+
+
+class _Call:
+    """
+    An upstream request in progress that other callers can wait on.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class StackExchangeClient:
+    """
+    Pooled, caching and request-coalescing client for the Stack Exchange API.
+
+    Args:
+        base_url (str): The API root, ending with a slash.
+        key (str, optional): The API key, sent in the ``X-API-Key`` header.
+        timeout (float): Seconds to wait for the connection and for each read.
+        cache_ttl (float): Seconds a successful response is served from the cache.
+        pool_size (int): Maximum number of pooled connections to the API host.
+        stale_ttl (float): Seconds an expired response may still be served while upstream
+            calls are not allowed.
+        limiter (RateLimiter, optional): The backoff, quota and concurrency limiter.
+    """
+
+    def __init__(
+        self,
+        base_url=API_BASE_URL,
+        key=None,
+        timeout=DEFAULT_TIMEOUT,
+        cache_ttl=DEFAULT_CACHE_TTL,
+        pool_size=DEFAULT_POOL_SIZE,
+        stale_ttl=DEFAULT_STALE_TTL,
+        limiter=None,
+    ):
+        self.base_url = base_url
+        self.stale_ttl = stale_ttl
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = "YourApp/1.0"
+        if key:
+            self.session.headers["X-API-Key"] = key
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        # Callables ``(url, status, seconds)`` told about every upstream call
+        self.observers = []
+
+    def search(self, **params):
+        """
+        Call the ``/search`` endpoint.
+
+        Returns:
+            CachedResponse: The (possibly cached) response.
+        """
+        return self.get("search", params)
+
+    def get(self, path, params, cache=True):
+        """
+        GET an API path, answering from the cache or joining an identical call in flight.
+
+        Args:
+            path (str): The path relative to ``base_url``.
+            params (dict): The query parameters.
+            cache (bool): Whether to store the response, False for one-off reads such as
+                paging through a full result set.
+
+        Returns:
+            CachedResponse: The (possibly cached) response.
+
+        Raises:
+            UpstreamUnavailable: If upstream may not be called and there is no stale data.
+            StackExchangeError: If the request fails or the API returns an error.
+        """
+        key = (path, tuple(sorted(params.items())))
+        refused = None
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry.age() < self.cache_ttl:
+                return entry
+            if entry is not None and entry.age() >= self.stale_ttl:
+                entry = None
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                blocked_for = self.limiter.blocked_for()
+                if blocked_for:
+                    refused = ("backoff", blocked_for)
+                elif not self.limiter.try_acquire():
+                    refused = ("concurrency", 1)
+                else:
+                    call = self._inflight[key] = _Call()
+
+        if refused is not None:
+            return self._stale_or_reject(entry, *refused)
+        if not leader:
+            if entry is not None:
+                # Someone is already refreshing this entry: answer stale instead of waiting
+                self.limiter.count("stale_served")
+                return entry
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = CachedResponse(self._fetch(path, params))
+            if cache:
+                with self._lock:
+                    self._cache[key] = call.result
+                    self._cache.move_to_end(key)
+                    while len(self._cache) > MAX_CACHE_ENTRIES:
+                        self._cache.popitem(last=False)
+            return call.result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            self.limiter.release()
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def _stale_or_reject(self, entry, reason, retry_after):
+        """
+        Serve a stale entry, or reject the request when there is none.
+        """
+        if entry is not None:
+            self.limiter.count("stale_served")
+            return entry
+        self.limiter.count(f"rejected_{reason}")
+        raise UpstreamUnavailable(
+            f"Stack Exchange is unavailable ({reason}), retry later",
+            retry_after=max(1, math.ceil(retry_after)),
+            status_code=503 if reason == "backoff" else 429,
+        )
+
+    def _fetch(self, path, params):
+        url = self.base_url + path
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.RequestException as error:
+            self._observe(url, "error", started)
+            raise StackExchangeError(f"Stack Exchange request failed: {error}")
+        self._observe(url, response.status_code, started)
+        try:
+            data = response.json()
+        except requests.RequestException as error:
+            raise StackExchangeError(f"Stack Exchange request failed: {error}")
+        except ValueError:
+            raise StackExchangeError("Stack Exchange returned an invalid JSON body")
+        self.limiter.record(data)
+        if response.status_code >= 400 or "error_id" in data:
+            raise StackExchangeError(
+                data.get("error_message", f"HTTP {response.status_code}")
+            )
+        return data
+
+    def _observe(self, url, status, started):
+        elapsed = time.perf_counter() - started
+        for observer in self.observers:
+            observer(url, status, elapsed)
+
+    def clear(self):
+        """
+        Drop every cached response.
+        """
+        with self._lock:
+            self._cache.clear()
+
+
+def init_app(app):
+    """
+    Create the application's shared client from its configuration.
+
+    Args:
+        app (Flask): The application. Reads ``STACKEXCHANGE_API_URL``, ``KEY``,
+            ``STACKEXCHANGE_TIMEOUT``, ``STACKEXCHANGE_CACHE_TTL``, ``STACKEXCHANGE_POOL_SIZE``,
+            ``STACKEXCHANGE_STALE_TTL`` and ``STACKEXCHANGE_MAX_CONCURRENT``.
+    """
+    app.extensions["stackexchange_client"] = StackExchangeClient(
+        base_url=app.config.get("STACKEXCHANGE_API_URL", API_BASE_URL),
+        key=app.config.get("KEY"),
+        timeout=app.config.get("STACKEXCHANGE_TIMEOUT", DEFAULT_TIMEOUT),
+        cache_ttl=app.config.get("STACKEXCHANGE_CACHE_TTL", DEFAULT_CACHE_TTL),
+        pool_size=app.config.get("STACKEXCHANGE_POOL_SIZE", DEFAULT_POOL_SIZE),
+        stale_ttl=app.config.get("STACKEXCHANGE_STALE_TTL", DEFAULT_STALE_TTL),
+        limiter=RateLimiter(
+            app.config.get("STACKEXCHANGE_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT)
+        ),
+    )
+
+
+def get_client():
+    """
+    Return the shared client of the current application.
+    """
+    return current_app.extensions["stackexchange_client"]
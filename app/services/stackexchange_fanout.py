@@ -0,0 +1,105 @@
+"""
+Concurrent Stack Exchange searches over several titles and sites.
+
+``fan_out`` runs one search per (intitle, site) pair on an asyncio event loop. Each search
+goes through the application's shared client in a worker thread, so the fan-out keeps the
+pooled connections, the response cache, the coalescing of identical calls and the rate
+limiter, while the searches overlap: ten searches take about as long as the slowest one.
+
+An asyncio semaphore bounds the searches in flight to what the limiter allows: its
+concurrency cap and, once the API has reported it, the remaining daily quota.
+"""
+
+import asyncio
+import contextvars
+import math
+
+from .stackexchange_analytics import summarize
+from .stackexchange_client import StackExchangeError
+
+
+def concurrency_limit(limiter, searches):
+    """
+    Return how many searches of a fan-out may run at once.
+
+    Args:
+        limiter (RateLimiter): The client's rate limiter.
+        searches (int): The number of searches to run.
+
+    Returns:
+        int: At least 1, at most the limiter's concurrency cap, the remaining quota and
+        ``searches``.
+    """
+    quota = limiter.quota_remaining
+    if quota is None:
+        quota = math.inf
+    return max(1, min(limiter.max_concurrent, quota, searches))
+
+
+async def _search_all(search, pairs, limit):
+    semaphore = asyncio.Semaphore(limit)
+
+    loop = asyncio.get_running_loop()
+
+    async def run(intitle, site):
+        async with semaphore:
+            try:
+                return await loop.run_in_executor(
+                    None, contextvars.copy_context().run, search, intitle, site
+                )
+            except StackExchangeError as error:
+                return error
+
+    return await asyncio.gather(*(run(intitle, site) for intitle, site in pairs))
+
+
+def fan_out(client, pairs, search):
+    """
+    Run the searches of ``pairs`` concurrently.
+
+    Args:
+        client (StackExchangeClient): The shared client, whose limiter bounds the fan-out.
+        pairs (list): The (intitle, site) pairs to search.
+        search (Callable): ``search(intitle, site)`` returning the response of one pair.
+            It runs in worker threads with a copy of the caller's context, so it may use the
+            application and request contexts.
+
+    Returns:
+        list: The response of each pair, in order, or the StackExchangeError it raised.
+    """
+    limit = concurrency_limit(client.limiter, len(pairs))
+    return asyncio.run(_search_all(search, pairs, limit))
+
+
+def merge_items(pairs, item_lists):
+    """
+    Merge the items of several searches, dropping questions found by more than one search.
+
+    Args:
+        pairs (list): The (intitle, site) pair of each search.
+        item_lists (list): The items of each search, in the order of ``pairs``.
+
+    Returns:
+        list: The distinct questions, first occurrence first. Question ids are unique per
+        site only, so questions are identified by (site, question_id).
+    """
+    seen = set()
+    merged = []
+    for (_, site), items in zip(pairs, item_lists):
+        for item in items:
+            key = (site, item.get("question_id"))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(item)
+    return merged
+
+
+def summarize_searches(pairs, item_lists, k=1):
+    """
+    Summarize the merged items of several searches like a single search.
+
+    Returns:
+        dict: The ``summarize`` metrics of the distinct questions.
+    """
+    return summarize(merge_items(pairs, item_lists), k)
@@ -0,0 +1,240 @@
+"""
+Ingestion of complete Stack Exchange search results into the database.
+
+``ingest_search`` pages through ``/search`` with ``pagesize=100`` until ``has_more`` is false,
+upserts every question into StackQuestion, removes questions that no longer match, and records
+a StackSearchSnapshot. The analytics routes then answer from indexed queries over the whole
+result set instead of calling the API.
+
+Ingestion runs from the ``flask ingest-stackexchange`` command (e.g. from cron) or from a
+``StackExchangeIngestor`` background thread, run by ``flask background-jobs`` when
+``STACKEXCHANGE_INGEST_INTERVAL`` is set. The web workers never start it.
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select, update
+
+from ..models.flight_model import db
+from ..models.stackexchange_model import StackQuestion, StackSearchSnapshot
+from .stackexchange_client import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100
+
+
+def question_row(intitle, site, item):
+    """
+    Convert an API item into the column values of a StackQuestion.
+
+    Args:
+        intitle (str): The search term.
+        site (str): The Stack Exchange site.
+        item (dict): The question as returned by the API.
+
+    Returns:
+        dict: The StackQuestion column values.
+    """
+    try:
+        reputation = int((item.get("owner") or {}).get("reputation", 0))
+    except (ValueError, TypeError):
+        reputation = 0
+    return {
+        "intitle": intitle,
+        "site": site,
+        "question_id": item["question_id"],
+        "title": item.get("title", "")[:512],
+        "is_answered": bool(item.get("is_answered")),
+        "view_count": int(item.get("view_count", 0)),
+        "answer_count": int(item.get("answer_count", 0)),
+        "score": int(item.get("score", 0)),
+        "creation_date": int(item["creation_date"]),
+        "last_activity_date": int(
+            item.get("last_activity_date", item["creation_date"])
+        ),
+        "owner_reputation": reputation,
+        "item": json.dumps(item),
+    }
+
+
+def _upsert_questions(rows):
+    """
+    Insert new questions and update known ones with two executemany statements.
+    """
+    if not rows:
+        return
+    intitle, site = rows[0]["intitle"], rows[0]["site"]
+    existing = set(
+        db.session.scalars(
+            select(StackQuestion.question_id).where(
+                StackQuestion.intitle == intitle,
+                StackQuestion.site == site,
+                StackQuestion.question_id.in_([row["question_id"] for row in rows]),
+            )
+        )
+    )
+    new_rows = [row for row in rows if row["question_id"] not in existing]
+    known_rows = [row for row in rows if row["question_id"] in existing]
+    if new_rows:
+        db.session.execute(insert(StackQuestion), new_rows)
+    if known_rows:
+        db.session.execute(update(StackQuestion), known_rows)
+
+
+def _fetch_page(client, params, max_wait):
+    """
+    Fetch one result page, waiting out backoffs requested by the API. Sleeping is fine here:
+    this runs in the ingestion thread or command, never in a request worker.
+    """
+    deadline = time.monotonic() + max_wait
+    while True:
+        try:
+            return client.get("search", params, cache=False).data
+        except UpstreamUnavailable as error:
+            if time.monotonic() + error.retry_after > deadline:
+                raise
+            time.sleep(error.retry_after)
+
+
+def ingest_search(client, intitle, site, max_pages=None, max_wait=300):
+    """
+    Snapshot the full result set of a search into the database.
+
+    Args:
+        client (StackExchangeClient): The client used for the API calls.
+        intitle (str): The search term.
+        site (str): The Stack Exchange site.
+        max_pages (int, optional): Stop after this many pages. A run stopped before the last
+            page updates the questions it read but records no snapshot: the routes keep
+            answering from the last complete one, or from the live API.
+        max_wait (float): Longest total time to wait for API backoffs before giving up.
+
+    Returns:
+        int: The number of questions ingested.
+    """
+    started = datetime.utcnow()
+    seen = set()
+    page = 1
+    while True:
+        data = _fetch_page(
+            client,
+            {
+                "order": "desc",
+                "sort": "activity",
+                "intitle": intitle,
+                "site": site,
+                "page": page,
+                "pagesize": PAGE_SIZE,
+            },
+            max_wait,
+        )
+        rows = [question_row(intitle, site, item) for item in data.get("items", [])]
+        rows = [row for row in rows if row["question_id"] not in seen]
+        seen.update(row["question_id"] for row in rows)
+        _upsert_questions(rows)
+        db.session.commit()
+        if not data.get("has_more") or (max_pages and page >= max_pages):
+            break
+        page += 1
+
+    if data.get("has_more"):
+        logger.warning(
+            "Stopped ingesting %s@%s after %d pages, before the last one: no snapshot "
+            "recorded",
+            intitle,
+            site,
+            page,
+        )
+        return len(seen)
+
+    # Remove the questions that no longer match the search
+    stale = set(
+        db.session.scalars(
+            select(StackQuestion.question_id).where(
+                StackQuestion.intitle == intitle, StackQuestion.site == site
+            )
+        )
+    ).difference(seen)
+    stale = sorted(stale)
+    # Chunked to stay below the bind parameter limits of the databases
+    for offset in range(0, len(stale), 500):
+        db.session.execute(
+            delete(StackQuestion).where(
+                StackQuestion.intitle == intitle,
+                StackQuestion.site == site,
+                StackQuestion.question_id.in_(stale[offset : offset + 500]),
+            )
+        )
+    db.session.merge(
+        StackSearchSnapshot(
+            intitle=intitle,
+            site=site,
+            total=len(seen),
+            pages=page,
+            completed_at=started,
+        )
+    )
+    db.session.commit()
+    logger.info("Ingested %d questions for %s@%s", len(seen), intitle, site)
+    return len(seen)
+
+
+def parse_searches(value):
+    """
+    Parse a list of searches written as ``intitle@site`` separated by commas.
+
+    Returns:
+        list: (intitle, site) tuples.
+    """
+    searches = []
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if entry:
+            intitle, _, site = entry.partition("@")
+            searches.append((intitle, site or "stackoverflow"))
+    return searches
+
+
+class StackExchangeIngestor:
+    """
+    Background thread that re-ingests a list of searches every ``interval`` seconds.
+
+    Args:
+        app (Flask): The application whose database and client are used.
+        searches (list): (intitle, site) tuples.
+        interval (float): Seconds between ingestion rounds.
+    """
+
+    def __init__(self, app, searches, interval):
+        self.app = app
+        self.searches = searches
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="stackexchange-ingestor", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.app.app_context():
+                client = self.app.extensions["stackexchange_client"]
+                for intitle, site in self.searches:
+                    try:
+                        ingest_search(client, intitle, site)
+                    except Exception:
+                        db.session.rollback()
+                        logger.exception("Ingestion of %s@%s failed", intitle, site)
+                db.session.remove()
+            self._stop.wait(self.interval)
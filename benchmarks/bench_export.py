@@ -0,0 +1,89 @@
+"""
+Benchmark of the /data/vuelos/export formats against the /data/vuelos JSON array.
+
+Seeds N flights into a temporary SQLite database, downloads them through each variant and
+reports the time, the response size and the peak Python memory allocated while serving it.
+
+Usage:
+    python -m benchmarks.bench_export --flights 200000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from main import create_app
+from app.database import init_database
+from app.models.flight_model import db
+from app.seed import populate_tables
+from app.services.flight_export import available_compressions, available_formats
+from benchmarks.bench_vuelos import seed_flights
+
+
+def variants():
+    """Return (name, URL) of every variant supported by the installed packages."""
+    urls = [("json array", "/data/vuelos")]
+    for fmt in available_formats():
+        urls.append((fmt, f"/data/vuelos/export?format={fmt}"))
+        for compression in available_compressions():
+            if fmt == "arrow" and compression == "gzip":
+                continue
+            urls.append(
+                (
+                    f"{fmt} + {compression}",
+                    f"/data/vuelos/export?format={fmt}&compression={compression}",
+                )
+            )
+    return urls
+
+
+def download(client, url):
+    """Stream a response and return its size in bytes."""
+    response = client.get(url, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return size
+
+
+def measure(client, url):
+    """
+    Return (seconds, bytes, peak traced memory in bytes) of a download. Memory is traced in a
+    separate run, as tracing slows the code down.
+    """
+    started = time.perf_counter()
+    size = download(client, url)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    download(client, url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--flights", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = "sqlite:///" + os.path.join(tmp, "export.db")
+        app = create_app({"SQLALCHEMY_DATABASE_URI": uri})
+        with app.app_context():
+            init_database(db.engine)
+            populate_tables()
+            seed_flights(args.flights)
+        client = app.test_client()
+        client.get("/data/aerolineas")  # Warm the dimension cache
+
+        print(f"{'variant':<16}{'seconds':>10}{'MB':>10}{'peak MB':>10}")
+        for name, url in variants():
+            elapsed, size, peak = measure(client, url)
+            print(f"{name:<16}{elapsed:>10.2f}{size / 1e6:>10.2f}{peak / 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark for the composite indexes on the vuelos table.
+
+Seeds N flights into a temporary SQLite database, drops the composite indexes and rolls
+the schema version back to simulate a database created before they existed, then runs the
+typical filtered queries before and after ``upgrade`` re-applies the index migration.
+The query plan and the mean latency of each query are printed for both states.
+
+Usage:
+    python -m benchmarks.bench_indexes --flights 200000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import date
+
+from sqlalchemy import delete, select, text
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from main import create_app
+from app.database import init_database
+from app.seed import populate_tables
+from app.migrations import schema_version, upgrade
+from app.models.flight_model import db, Vuelos
+from benchmarks.bench_vuelos import seed_flights
+
+QUERIES = {
+    "airport+movement by day range": select(Vuelos.id_vuelo).where(
+        Vuelos.dia.between(date(2021, 3, 1), date(2021, 3, 7)),
+        Vuelos.id_aeropuerto == 2,
+        Vuelos.id_movimiento == 1,
+    ),
+    "airline by day range": select(Vuelos.id_vuelo).where(
+        Vuelos.id_aerolinea == 3,
+        Vuelos.dia.between(date(2021, 3, 1), date(2021, 3, 31)),
+    ),
+}
+
+
+def explain(connection, query):
+    """Return the database's query plan for ``query`` as a single string."""
+    compiled = query.compile(connection, compile_kwargs={"literal_binds": True})
+    prefix = (
+        "EXPLAIN QUERY PLAN " if connection.dialect.name == "sqlite" else "EXPLAIN "
+    )
+    rows = connection.execute(text(prefix + str(compiled))).all()
+    return "; ".join(" ".join(str(value) for value in row) for row in rows)
+
+
+def run(engine, label, repeat):
+    print(f"== {label}")
+    with engine.connect() as connection:
+        for name, query in QUERIES.items():
+            started = time.perf_counter()
+            for _ in range(repeat):
+                connection.execute(query).all()
+            elapsed = (time.perf_counter() - started) / repeat
+            print(f"{name:<32}{elapsed * 1000:>10.2f} ms")
+            print(f"    plan: {explain(connection, query)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--flights", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = "sqlite:///" + os.path.join(tmp, "bench.db")
+        app = create_app({"SQLALCHEMY_DATABASE_URI": uri})
+        with app.app_context():
+            init_database(db.engine)
+            populate_tables()
+            seed_flights(args.flights)
+            engine = db.engine
+
+        with engine.begin() as connection:
+            for index in Vuelos.__table__.indexes:
+                index.drop(connection)
+            connection.execute(
+                delete(schema_version).where(schema_version.c.version >= 2)
+            )
+        run(engine, "without composite indexes", args.repeat)
+
+        print(f"applied migrations: {upgrade(engine)}")
+        with engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+        run(engine, "with composite indexes", args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark of bulk flight loading.
+
+Generates a CSV batch of daily schedules (N flights over a few days) and loads it into a
+temporary SQLite database three ways: the per-object ORM path used by ``populate_tables``
+(``db.session.add_all``), the chunked Core loader ``load_flights``, and the loader behind
+POST /data/vuelos/bulk. Rows per second are reported for each, with the rollup table
+maintained in all three.
+
+Usage:
+    python -m benchmarks.bench_ingest --flights 200000
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from main import create_app
+from app.database import init_database
+from app.models.dimension_cache import dimension_cache
+from app.models.flight_model import db, Vuelos
+from app.seed import populate_tables
+from app.services.flight_ingest import flight_values, load_flights, read_csv
+
+
+def schedule_csv(count, days=7):
+    """Return a CSV schedule of ``count`` flights over ``days`` days and the seed IDs."""
+    start = date(2022, 1, 1)
+    lines = ["id_aerolinea,id_aeropuerto,id_movimiento,dia"]
+    lines.extend(
+        f"{1 + i % 4},{1 + (i // 4) % 4},{1 + i % 2},{start + timedelta(days=i % days)}"
+        for i in range(count)
+    )
+    return "\n".join(lines) + "\n"
+
+
+def orm_load(text):
+    """The per-object ORM path: one Vuelos instance per record, flushed by the session."""
+    names = dimension_cache.snapshot().names
+    db.session.add_all(
+        Vuelos(**flight_values(record, names))
+        for _, record in read_csv(io.StringIO(text))
+    )
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--flights", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    text = schedule_csv(args.flights, args.days)
+    print(f"{'path':<16}{'seconds':>10}{'rows/s':>12}")
+    for name in ("orm add_all", "core chunks", "http endpoint"):
+        with tempfile.TemporaryDirectory() as tmp:
+            uri = "sqlite:///" + os.path.join(tmp, "ingest.db")
+            app = create_app({"SQLALCHEMY_DATABASE_URI": uri})
+            with app.app_context():
+                init_database(db.engine)
+                populate_tables()
+
+                started = time.perf_counter()
+                if name == "orm add_all":
+                    orm_load(text)
+                elif name == "core chunks":
+                    load_flights(
+                        read_csv(io.StringIO(text)), chunk_size=args.chunk_size
+                    )
+                else:
+                    response = app.test_client().post(
+                        f"/data/vuelos/bulk?chunk_size={args.chunk_size}",
+                        data=text.encode(),
+                        content_type="text/csv",
+                    )
+                    assert response.status_code == 200, response.get_json()
+                elapsed = time.perf_counter() - started
+                db.session.remove()
+                db.engine.dispose()
+            print(f"{name:<16}{elapsed:>10.2f}{args.flights / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
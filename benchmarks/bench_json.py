@@ -0,0 +1,90 @@
+"""
+Micro-benchmark of JSON serialization and response compression on a large vuelos result.
+
+Builds N /data/vuelos rows and serializes them with Flask's default (standard library) JSON
+provider, after formatting the dates with ``strftime`` as the routes used to, and with the
+orjson provider, which writes the dates itself. The body is then compressed with gzip and
+brotli at the levels used by the compression layer.
+
+Usage:
+    python -m benchmarks.bench_json --rows 100000
+"""
+
+import argparse
+import time
+import zlib
+from datetime import date, timedelta
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.compression import brotli
+from app.json_provider import OrjsonProvider
+
+
+def vuelos_rows(count):
+    """Return ``count`` rows shaped like the /data/vuelos items, with date objects."""
+    start = date(2021, 1, 1)
+    airlines = ["Volaris", "Aeromar", "Interjet", "Aeromexico"]
+    airports = ["Benito Juarez", "Guanajuato", "La Paz", "Oaxaca"]
+    return [
+        {
+            "id_vuelo": i + 1,
+            "nombre_aerolinea": airlines[i % 4],
+            "nombre_aeropuerto": airports[(i // 4) % 4],
+            "tipo_movimiento": "Salida" if i % 2 else "Llegada",
+            "dia": start + timedelta(days=i % 365),
+        }
+        for i in range(count)
+    ]
+
+
+def timed(call, repeat):
+    """Return the best time of ``repeat`` calls and the last result."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = call()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = vuelos_rows(args.rows)
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = OrjsonProvider(app)
+
+    def stdlib():
+        formatted = [dict(row, dia=row["dia"].strftime("%Y-%m-%d")) for row in rows]
+        return default.dumps(formatted, separators=(",", ":")).encode()
+
+    print(f"{'serializer':<24}{'ms':>10}{'MB':>10}")
+    for name, call in (
+        ("stdlib json + strftime", stdlib),
+        ("orjson", lambda: fast.dumps_bytes(rows)),
+    ):
+        elapsed, body = timed(call, args.repeat)
+        print(f"{name:<24}{elapsed * 1000:>10.1f}{len(body) / 1e6:>10.2f}")
+
+    encoders = [("gzip level 6", lambda: zlib.compress(body, 6))]
+    if brotli is not None:
+        encoders.append(("brotli quality 4", lambda: brotli.compress(body, quality=4)))
+    print(f"\n{'encoding':<24}{'ms':>10}{'MB':>10}{'ratio':>10}")
+    print(f"{'identity':<24}{0:>10.1f}{len(body) / 1e6:>10.2f}{1:>10.1f}")
+    for name, call in encoders:
+        elapsed, compressed = timed(call, args.repeat)
+        print(
+            f"{name:<24}{elapsed * 1000:>10.1f}{len(compressed) / 1e6:>10.2f}"
+            f"{len(body) / len(compressed):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
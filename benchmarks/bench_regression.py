@@ -0,0 +1,152 @@
+"""
+Regression benchmarks of the HTTP routes, run with pytest-benchmark.
+
+Every flight route is measured against SQLite databases seeded at each ``--bench-scales``
+scale; the Stack Exchange routes replay the recorded payload of the tests from a local
+server (see benchmarks/conftest.py). For each route the suite records:
+
+    median_ms: The median latency of the test client request, body included.
+    queries: The SQL statements of one request.
+    peak_kib: The peak Python memory allocated while serving one request (tracemalloc).
+
+The values are attached to the pytest-benchmark report as ``extra_info`` and compared with
+benchmarks/baseline.json; a benchmark fails if it issues more statements than its baseline,
+or its memory or latency grows beyond the tolerances. Latencies depend on the machine:
+record a baseline on the machine that runs the comparison, or raise the tolerance.
+
+Usage:
+    pip install pytest-benchmark
+    python -m pytest benchmarks/bench_regression.py
+    python -m pytest benchmarks/bench_regression.py --bench-scales 1k --bench-save-baseline
+
+pytest-benchmark's own options also apply, e.g. ``--benchmark-autosave`` and
+``--benchmark-compare-fail=median:25%`` to compare latencies between saved runs.
+"""
+
+import tracemalloc
+
+import pytest
+from sqlalchemy import event
+
+from app.models.flight_model import db
+from benchmarks.conftest import parse_scale, scales
+
+FLIGHT_ROUTES = {
+    "vuelos": "/data/vuelos",
+    "vuelos_page": "/data/vuelos?limit=100&after=1000",
+    "vuelos_filtered": "/data/vuelos?id_aeropuerto=2&id_movimiento=1"
+    "&dia_from=2021-03-01&dia_to=2021-03-31",
+    "vuelos_changes": "/data/vuelos/changes?since=0&limit=1000",
+    "export_csv": "/data/vuelos/export?format=csv",
+    "stats_aeropuertos": "/data/stats/aeropuertos",
+    "stats_aerolineas": "/data/stats/aerolineas",
+    "stats_dias": "/data/stats/dias",
+    "aerolineas": "/data/aerolineas",
+}
+
+STACKEXCHANGE_ROUTES = {
+    "search": "/stackexchange/",
+    "answered_unanswered": "/stackexchange/answered-unanswered",
+    "highest_reputation": "/stackexchange/highest-reputation?k=3",
+    "summary": "/stackexchange/summary",
+    "fan_out": "/stackexchange/fan-out?intitle=perl,json&site=stackoverflow,superuser",
+}
+
+
+def get(client, path, headers=None):
+    """
+    Request a path and read the whole body, as a client would, without keeping it: the
+    peak memory is the server's.
+    """
+    response = client.get(path, headers=headers, buffered=False)
+    for _ in response.response:
+        pass
+    response.close()
+    return response
+
+
+def count_statements(app, call):
+    """Return the number of SQL statements issued by ``call``."""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return len(statements)
+
+
+def peak_memory(call):
+    """Return the peak Python memory in bytes allocated while running ``call``."""
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(benchmark, baseline, name, app, path, headers=None, status=200, rounds=10):
+    """
+    Benchmark one route and fail on regressions against the baseline.
+    """
+    client = app.test_client()
+    # Warms the dimension cache and the connection pool
+    response = get(client, path, headers)
+    assert response.status_code == status, path
+
+    def call():
+        return get(client, path, headers)
+
+    measurement = {
+        "queries": count_statements(app, call),
+        "peak_kib": round(peak_memory(call) / 1024, 1),
+    }
+    benchmark.pedantic(call, rounds=rounds, warmup_rounds=1)
+    if not benchmark.disabled:
+        measurement["median_ms"] = round(benchmark.stats.stats.median * 1000, 3)
+    benchmark.extra_info.update(measurement)
+
+    regressions = baseline.check(name, measurement)
+    if regressions:
+        pytest.fail(f"{name} regressed: " + "; ".join(regressions))
+
+
+@pytest.mark.parametrize("route", FLIGHT_ROUTES)
+def test_flight_route(benchmark, baseline, bench_app, scale, route, request):
+    rounds = 3 if parse_scale(scale) >= 1000000 else 10
+    measure(
+        benchmark,
+        baseline,
+        request.node.name,
+        bench_app(scale),
+        FLIGHT_ROUTES[route],
+        rounds=rounds,
+    )
+
+
+def test_vuelos_not_modified(benchmark, baseline, bench_app, scale, request):
+    app = bench_app(scale)
+    etag = app.test_client().get("/data/vuelos?limit=1").headers["ETag"]
+    measure(
+        benchmark,
+        baseline,
+        request.node.name,
+        app,
+        "/data/vuelos",
+        headers={"If-None-Match": etag},
+        status=304,
+    )
+
+
+@pytest.mark.parametrize("route", STACKEXCHANGE_ROUTES)
+def test_stackexchange_route(benchmark, baseline, bench_app, route, request):
+    # The routes do not read flights: the smallest database will do
+    app = bench_app(min(scales(request.config), key=parse_scale))
+    measure(benchmark, baseline, request.node.name, app, STACKEXCHANGE_ROUTES[route])
@@ -0,0 +1,99 @@
+"""
+Benchmark of application startup.
+
+Compares the current ``create_app``, which never touches the database, with the former
+eager startup that created the schema and probed/seeded every table on each import. Both
+are timed against an initialized SQLite database (the steady state of a worker boot) and,
+for the current factory, against an unreachable MySQL server, where the former startup
+blocked for up to 25 s in its retry loop. The database round trips of each are counted.
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 20
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy_utils import create_database, database_exists
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from main import create_app
+from app.database import init_database
+from app.migrations import upgrade
+from app.models.flight_model import db
+from app.seed import populate_tables
+
+
+def legacy_startup(config):
+    """The startup work create_app used to do on every import, kept for comparison."""
+    app = create_app(config)
+    with app.app_context():
+        engine = db.engine
+        if not database_exists(engine.url):
+            create_database(engine.url)
+        upgrade(engine)
+        populate_tables()
+    return app
+
+
+def measure(factory, config, repeat):
+    """
+    Return the median startup time of ``factory`` and the statements one startup executes.
+    """
+    timings = []
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # Listen on every engine, including the one the factory creates
+    event.listen(Engine, "before_cursor_execute", count)
+    try:
+        for _ in range(repeat):
+            statements.clear()
+            started = time.perf_counter()
+            app = factory(config)
+            timings.append(time.perf_counter() - started)
+            with app.app_context():
+                db.engine.dispose()
+    finally:
+        event.remove(Engine, "before_cursor_execute", count)
+    timings.sort()
+    return timings[len(timings) // 2], len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = "sqlite:///" + os.path.join(tmp, "startup.db")
+        config = {"SQLALCHEMY_DATABASE_URI": uri}
+        app = create_app(config)
+        with app.app_context():
+            init_database(db.engine)
+            populate_tables()
+            db.engine.dispose()
+
+        unreachable = {
+            "SQLALCHEMY_DATABASE_URI": "mysql+pymysql://user:pw@127.0.0.1:1/missing"
+        }
+        rows = [
+            ("eager (former)", legacy_startup, config),
+            ("lazy (current)", create_app, config),
+            ("lazy, db down", create_app, unreachable),
+        ]
+        print(f"{'startup':<18}{'ms':>10}{'statements':>12}")
+        for name, factory, factory_config in rows:
+            median, statements = measure(factory, factory_config, args.repeat)
+            print(f"{name:<18}{median * 1000:>10.2f}{statements:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark for GET /data/vuelos.
+
+Seeds N flights into a temporary SQLite database and compares the original per-flight
+lookup implementation (one query for the flights plus three per flight) with the
+current streamed route. Query count and latency are reported for both.
+
+Usage:
+    python -m benchmarks.bench_vuelos --flights 10000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from flask import jsonify
+from sqlalchemy import event, insert
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from main import create_app
+from app.database import init_database
+from app.seed import populate_tables
+from app.models.changes import stamp_flights
+from app.models.flight_model import db, Aerolineas, Aeropuertos, Movimientos, Vuelos
+from app.models.rollup import rebuild_rollup
+
+
+def legacy_get_vuelos():
+    """The original N+1 implementation of get_vuelos, kept for comparison."""
+    all_vuelos = Vuelos.query.all()
+    vuelos_data = [
+        {
+            "id_vuelo": vuelo.id_vuelo,
+            "nombre_aerolinea": Aerolineas.query.filter_by(
+                id_aerolinea=vuelo.id_aerolinea
+            )
+            .first()
+            .nombre_aerolinea,
+            "nombre_aeropuerto": Aeropuertos.query.filter_by(
+                id_aeropuerto=vuelo.id_aeropuerto
+            )
+            .first()
+            .nombre_aeropuerto,
+            "tipo_movimiento": Movimientos.query.filter_by(
+                id_movimiento=vuelo.id_movimiento
+            )
+            .first()
+            .descripcion,
+            "dia": vuelo.dia.strftime("%Y-%m-%d"),
+        }
+        for vuelo in all_vuelos
+    ]
+    return jsonify(vuelos_data)
+
+
+def seed_flights(count, batch_size=10000):
+    """
+    Insert ``count`` synthetic flights on top of the default seed data, stamped with change
+    sequence numbers, and rebuild the daily rollup.
+    """
+    start = date(2021, 1, 1)
+    connection = db.session.connection()
+    for offset in range(0, count, batch_size):
+        db.session.execute(
+            insert(Vuelos),
+            stamp_flights(
+                connection,
+                [
+                    {
+                        "id_aerolinea": 1 + i % 4,
+                        "id_aeropuerto": 1 + (i // 4) % 4,
+                        "id_movimiento": 1 + i % 2,
+                        "dia": start + timedelta(days=i % 365),
+                    }
+                    for i in range(offset, min(offset + batch_size, count))
+                ],
+            ),
+        )
+    rebuild_rollup(connection)
+    db.session.commit()
+
+
+def measure(app, call):
+    """Run ``call`` and return (seconds, number of SQL statements, response bytes)."""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, many):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        started = time.perf_counter()
+        body = call()
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return elapsed, len(statements), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--flights", type=int, default=10000)
+    parser.add_argument(
+        "--skip-legacy",
+        action="store_true",
+        help="Skip the N+1 implementation, which is very slow for large N.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = "sqlite:///" + os.path.join(tmp, "bench.db")
+        app = create_app({"SQLALCHEMY_DATABASE_URI": uri})
+        app.add_url_rule("/legacy/vuelos", view_func=legacy_get_vuelos)
+        with app.app_context():
+            init_database(db.engine)
+            populate_tables()
+            seed_flights(args.flights)
+        client = app.test_client()
+
+        print(f"{'implementation':<16}{'queries':>10}{'seconds':>12}{'bytes':>14}")
+        routes = [("current", "/data/vuelos")]
+        if not args.skip_legacy:
+            routes.insert(0, ("legacy N+1", "/legacy/vuelos"))
+        for name, url in routes:
+            elapsed, queries, size = measure(app, lambda: client.get(url).data)
+            print(f"{name:<16}{queries:>10}{elapsed:>12.3f}{size:>14}")
+
+
+if __name__ == "__main__":
+    main()
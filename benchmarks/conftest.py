@@ -0,0 +1,181 @@
+"""
+Fixtures and options of the regression benchmarks in benchmarks/bench_regression.py.
+
+Each scale gets its own SQLite file seeded with that many synthetic flights, and the app is
+pointed at a local server that replays the recorded Stack Exchange payload of the tests, so
+the suite needs neither MySQL nor the network.
+
+Options:
+    --bench-scales: Comma-separated flight counts, e.g. ``1k,100k,1m`` (the default).
+    --bench-baseline: The baseline file (default benchmarks/baseline.json).
+    --bench-save-baseline: Record the measurements of this run in the baseline instead of
+        comparing against it. Entries of benchmarks that did not run are kept.
+    --bench-latency-tolerance, --bench-memory-tolerance: Allowed growth of the median
+        latency and of the peak memory over the baseline, as a fraction (default 1.0 and
+        0.25). The number of SQL statements may not grow at all.
+"""
+
+import json
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from main import create_app
+from app.database import init_database
+from app.models.flight_model import db
+from app.seed import populate_tables
+from benchmarks.bench_vuelos import seed_flights
+from tests.stub_upstream import StubUpstream
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SUFFIXES = {"k": 1000, "m": 1000000}
+
+
+def parse_scale(label):
+    """
+    Return the number of flights of a scale label such as ``5000``, ``100k`` or ``1m``.
+    """
+    label = label.strip().lower()
+    if label[-1:] in SUFFIXES:
+        return int(label[:-1]) * SUFFIXES[label[-1]]
+    return int(label)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("regression benchmarks")
+    group.addoption("--bench-scales", default="1k,100k,1m")
+    group.addoption("--bench-baseline", default=BASELINE)
+    group.addoption("--bench-save-baseline", action="store_true")
+    group.addoption("--bench-latency-tolerance", type=float, default=1.0)
+    group.addoption("--bench-memory-tolerance", type=float, default=0.25)
+
+
+def scales(config):
+    return [label.strip() for label in config.getoption("--bench-scales").split(",")]
+
+
+def pytest_generate_tests(metafunc):
+    if "scale" in metafunc.fixturenames:
+        metafunc.parametrize("scale", scales(metafunc.config), scope="session")
+
+
+@pytest.fixture(scope="session")
+def upstream():
+    with StubUpstream() as server:
+        yield server
+
+
+@pytest.fixture(scope="session")
+def bench_app(upstream, tmp_path_factory):
+    """
+    Return a function building, once per scale label, an app on a seeded SQLite file.
+    """
+    directory = tmp_path_factory.mktemp("bench")
+    apps = {}
+
+    def build(scale):
+        if scale not in apps:
+            path = os.path.join(directory, f"vuelos-{scale}.db")
+            app = create_app(
+                {
+                    "SQLALCHEMY_DATABASE_URI": "sqlite:///" + path,
+                    "STACKEXCHANGE_API_URL": upstream.url,
+                    # Every request goes upstream, as on a cache miss
+                    "STACKEXCHANGE_CACHE_TTL": 0,
+                }
+            )
+            with app.app_context():
+                init_database(db.engine)
+                populate_tables()
+                seed_flights(parse_scale(scale))
+            apps[scale] = app
+        return apps[scale]
+
+    return build
+
+
+class Baseline:
+    """
+    The stored measurements of every benchmark, keyed by test name.
+
+    Args:
+        path (str): The JSON file.
+        save (bool): Record measurements instead of comparing them.
+        latency_tolerance (float): Allowed growth of the median latency, as a fraction.
+        memory_tolerance (float): Allowed growth of the peak memory, as a fraction.
+    """
+
+    # Allocations this small vary between runs and Python builds
+    MEMORY_SLACK_KIB = 64
+
+    def __init__(self, path, save, latency_tolerance, memory_tolerance):
+        self.path = path
+        self.save = save
+        self.latency_tolerance = latency_tolerance
+        self.memory_tolerance = memory_tolerance
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as baseline:
+                self.entries = json.load(baseline)
+        self.measured = {}
+
+    def check(self, name, measurement):
+        """
+        Record a measurement and return the regressions against the baseline.
+
+        Args:
+            name (str): The benchmark.
+            measurement (dict): ``queries``, ``peak_kib`` and, unless benchmarks are
+                disabled, ``median_ms``.
+
+        Returns:
+            list: Descriptions of the regressions, empty if there are none.
+        """
+        self.measured[name] = measurement
+        stored = self.entries.get(name)
+        if self.save or stored is None:
+            return []
+        regressions = []
+        if measurement["queries"] > stored["queries"]:
+            regressions.append(
+                f"{measurement['queries']} SQL statements, baseline {stored['queries']}"
+            )
+        memory_limit = (
+            stored["peak_kib"] * (1 + self.memory_tolerance) + self.MEMORY_SLACK_KIB
+        )
+        if measurement["peak_kib"] > memory_limit:
+            regressions.append(
+                f"peak memory {measurement['peak_kib']:.0f} KiB, "
+                f"baseline {stored['peak_kib']:.0f} KiB"
+            )
+        if "median_ms" in measurement and "median_ms" in stored:
+            if measurement["median_ms"] > stored["median_ms"] * (
+                1 + self.latency_tolerance
+            ):
+                regressions.append(
+                    f"median latency {measurement['median_ms']:.2f} ms, "
+                    f"baseline {stored['median_ms']:.2f} ms"
+                )
+        return regressions
+
+    def write(self):
+        entries = dict(self.entries, **self.measured)
+        with open(self.path, "w") as baseline:
+            json.dump(entries, baseline, indent=2, sort_keys=True)
+            baseline.write("\n")
+
+
+@pytest.fixture(scope="session")
+def baseline(pytestconfig):
+    stored = Baseline(
+        pytestconfig.getoption("--bench-baseline"),
+        pytestconfig.getoption("--bench-save-baseline"),
+        pytestconfig.getoption("--bench-latency-tolerance"),
+        pytestconfig.getoption("--bench-memory-tolerance"),
+    )
+    yield stored
+    if stored.save:
+        stored.write()
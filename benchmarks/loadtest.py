@@ -0,0 +1,165 @@
+"""
+Load test of the gunicorn worker modes.
+
+Seeds a temporary SQLite database, starts a local stub of the Stack Exchange API that
+answers after ``--upstream-delay`` seconds, then for each worker mode boots gunicorn with
+gunicorn.conf.py and drives every route with ``--concurrency`` closed-loop clients for
+``--duration`` seconds (wrk-style). Requests per second, p50 and p99 latency and the number
+of failed requests are printed per mode and route.
+
+The Stack Exchange cache is disabled so that every request of the I/O-bound routes reaches
+the (slow) upstream, each with a different search term.
+
+Usage:
+    python -m benchmarks.loadtest --modes sync,gthread,gevent --duration 10
+"""
+
+import argparse
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from main import create_app
+from app.database import init_database
+from app.seed import populate_tables
+from app.models.flight_model import db
+from benchmarks.bench_vuelos import seed_flights
+from tests.stub_upstream import StubUpstream
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = {
+    "aerolineas": "/data/aerolineas",
+    "vuelos page": "/data/vuelos?limit=100",
+    "stats": "/data/stats/aeropuertos",
+    "se summary": "/stackexchange/summary?intitle={n}",
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(mode, database_uri, upstream_url):
+    """Boot gunicorn in ``mode`` and wait until it answers. Returns (process, base URL)."""
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URI=database_uri,
+        STACKEXCHANGE_API_URL=upstream_url,
+        STACKEXCHANGE_CACHE_TTL="0",
+        STACKEXCHANGE_STALE_TTL="0",
+        STACKEXCHANGE_MAX_CONCURRENT="10000",
+        GUNICORN_WORKER_MODE=mode,
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_ACCESSLOG="",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(base_url + "/data/aerolineas", timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn ({mode}) did not start")
+
+
+def drive(url_template, concurrency, duration):
+    """Run closed-loop clients against a URL. Returns (latencies, failures)."""
+    latencies = []
+    failures = [0]
+    lock = threading.Lock()
+    counter = itertools.count()
+    deadline = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        local = []
+        failed = 0
+        while time.monotonic() < deadline:
+            url = url_template.format(n=next(counter))
+            started = time.perf_counter()
+            try:
+                ok = session.get(url, timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            local.append(time.perf_counter() - started)
+            failed += not ok
+        with lock:
+            latencies.extend(local)
+            failures[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), failures[0]
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", default="sync,gthread,gevent")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--flights", type=int, default=10000)
+    parser.add_argument("--upstream-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, StubUpstream(
+        delay=args.upstream_delay
+    ) as upstream:
+        database_uri = "sqlite:///" + os.path.join(tmp, "load.db")
+        app = create_app({"SQLALCHEMY_DATABASE_URI": database_uri})
+        with app.app_context():
+            init_database(db.engine)
+            populate_tables()
+            seed_flights(args.flights)
+            db.engine.dispose()
+
+        print(
+            f"{'mode':<10}{'route':<14}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}"
+        )
+        for mode in args.modes.split(","):
+            process, base_url = start_gunicorn(mode, database_uri, upstream.url)
+            try:
+                for name, path in ROUTES.items():
+                    latencies, failures = drive(
+                        base_url + path, args.concurrency, args.duration
+                    )
+                    print(
+                        f"{mode:<10}{name:<14}{len(latencies) / args.duration:>10.1f}"
+                        f"{percentile(latencies, 0.5) * 1000:>10.1f}"
+                        f"{percentile(latencies, 0.99) * 1000:>10.1f}{failures:>8}"
+                    )
+            finally:
+                process.terminate()
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Load test of the live flight board fan-out.
+
+Seeds a temporary SQLite database, starts an ``EventRelay`` and boots gunicorn with gevent
+workers sharing it (``FLIGHT_BOARD_BROKER=tcp://...``). ``--subscribers`` idle
+/data/vuelos/stream connections are opened, each filtered on one of the four seeded
+airports, and read from a single selector loop, so the client does not need a thread per
+connection either. Then ``--events`` flights are loaded one at a time through
+POST /data/vuelos/bulk, ``--interval`` seconds apart, cycling through the airports.
+
+For every delivery the latency from the start of the POST to the arrival of the event at
+the subscriber is measured; p50, p99 and max are printed together with the deliveries
+expected and received and the connections that failed.
+
+Usage:
+    python -m benchmarks.loadtest_board --subscribers 3000 --workers 1 --events 50
+"""
+
+import argparse
+import os
+import re
+import resource
+import selectors
+import socket
+import tempfile
+import threading
+import time
+
+import requests
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from main import create_app
+from app.database import init_database
+from app.seed import AEROPUERTOS, populate_tables
+from app.models.flight_model import db
+from app.services.flight_board import EventRelay
+from benchmarks.loadtest import free_port, percentile, start_gunicorn
+
+EVENT_ID = re.compile(rb"^id: (\d+)$", re.MULTILINE)
+
+
+class Subscribers:
+    """
+    Idle SSE connections read by one selector loop, recording when each event arrives.
+
+    Connections are opened ``batch`` at a time, each batch once the previous one has been
+    answered, so that the server's listen backlog never overflows.
+
+    Args:
+        base_url (str): The server, e.g. http://127.0.0.1:5001.
+        count (int): Connections to open.
+        batch (int): Connections opened at once.
+        timeout (float): Seconds to wait for a batch to be answered.
+    """
+
+    def __init__(self, base_url, count, batch=500, timeout=60):
+        host, port = base_url.rsplit("//", 1)[1].split(":")
+        self.selector = selectors.DefaultSelector()
+        self.arrivals = {}  # connection index -> {event id: arrival time}
+        self.airports = {}
+        self.answered = 0
+        self.streaming = set()
+        self.failed = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        for start in range(0, count, batch):
+            for index in range(start, min(start + batch, count)):
+                self._open(host, int(port), index)
+            deadline = time.monotonic() + timeout
+            while (
+                self.answered + self.failed < min(start + batch, count)
+                and time.monotonic() < deadline
+            ):
+                time.sleep(0.05)
+
+    def _open(self, host, port, index):
+        airport = AEROPUERTOS[index % len(AEROPUERTOS)][0]
+        try:
+            sock = socket.create_connection((host, port))
+        except OSError:
+            self.failed += 1
+            return
+        # HTTP/1.0 keeps gunicorn from chunking the stream
+        sock.sendall(
+            f"GET /data/vuelos/stream?id_aeropuerto={airport} HTTP/1.0\r\n"
+            f"Host: {host}\r\n\r\n".encode()
+        )
+        sock.setblocking(False)
+        self.arrivals[index] = {}
+        self.airports[index] = airport
+        self.selector.register(sock, selectors.EVENT_READ, [index, b"", False])
+
+    def _run(self):
+        while not self._stop.is_set():
+            for key, _ in self.selector.select(timeout=0.1):
+                state = key.data
+                try:
+                    data = key.fileobj.recv(65536)
+                except OSError:
+                    data = b""
+                now = time.perf_counter()
+                if not data:
+                    self.selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    self.failed += 1
+                    continue
+                buffer = state[1] + data
+                if not state[2]:
+                    head, separator, buffer = buffer.partition(b"\r\n\r\n")
+                    if not separator:
+                        state[1] = head
+                        continue
+                    if b" 200 " not in head.split(b"\r\n", 1)[0]:
+                        self.selector.unregister(key.fileobj)
+                        key.fileobj.close()
+                        self.failed += 1
+                        continue
+                    state[2] = True
+                    self.answered += 1
+                    self.streaming.add(state[0])
+                frames, _, state[1] = buffer.rpartition(b"\n\n")
+                for match in EVENT_ID.finditer(frames):
+                    self.arrivals[state[0]].setdefault(int(match.group(1)), now)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.1)
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = args.subscribers * 2 + 256
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+    relay = EventRelay(("127.0.0.1", free_port()))
+    threading.Thread(target=relay.serve_forever, daemon=True).start()
+    os.environ.update(
+        FLIGHT_BOARD_BROKER="tcp://127.0.0.1:%d" % relay.server_address[1],
+        FLIGHT_BOARD_MAX_SUBSCRIBERS=str(args.subscribers + 100),
+        GUNICORN_WORKERS=str(args.workers),
+        GUNICORN_CONNECTIONS=str(args.subscribers + 100),
+        # Recycling a worker would close every stream it serves
+        GUNICORN_MAX_REQUESTS="0",
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = "sqlite:///" + os.path.join(tmp, "board.db")
+        app = create_app({"SQLALCHEMY_DATABASE_URI": database_uri})
+        with app.app_context():
+            init_database(db.engine)
+            populate_tables()
+            db.engine.dispose()
+
+        process, base_url = start_gunicorn("gevent", database_uri, "http://127.0.0.1:9")
+        subscribers = None
+        try:
+            started = time.perf_counter()
+            subscribers = Subscribers(base_url, args.subscribers)
+            print(
+                f"{subscribers.answered} subscribers streaming after "
+                f"{time.perf_counter() - started:.1f}s ({subscribers.failed} failed)"
+            )
+
+            session = requests.Session()
+            published = []  # (airport, POST start time), in sequence order
+            for number in range(args.events):
+                airport = AEROPUERTOS[number % len(AEROPUERTOS)][0]
+                body = f"id_aerolinea,id_aeropuerto,id_movimiento,dia\n1,{airport},1,2022-01-01\n"
+                sent = time.perf_counter()
+                response = session.post(
+                    base_url + "/data/vuelos/bulk",
+                    data=body,
+                    headers={"Content-Type": "text/csv"},
+                )
+                response.raise_for_status()
+                published.append((airport, sent))
+                time.sleep(args.interval)
+            time.sleep(2)
+        finally:
+            process.terminate()
+            process.wait()
+            relay.shutdown()
+            relay.server_close()
+            if subscribers is not None:
+                subscribers.close()
+
+    # The loads are the only writes: the n-th event seen is the n-th flight posted
+    seqs = sorted(
+        {seq for arrivals in subscribers.arrivals.values() for seq in arrivals}
+    )
+    sent_at = dict(zip(seqs, published))
+    latencies = []
+    expected = 0
+    for index, arrivals in subscribers.arrivals.items():
+        if index not in subscribers.streaming:
+            continue
+        for seq, (airport, sent) in sent_at.items():
+            if airport == subscribers.airports[index]:
+                expected += 1
+                if seq in arrivals:
+                    latencies.append(arrivals[seq] - sent)
+    latencies.sort()
+    print(f"events published: {len(published)}, seen: {len(seqs)}")
+    print(f"deliveries: {len(latencies)} of {expected}")
+    print(
+        f"latency ms: p50 {percentile(latencies, 0.5) * 1000:.1f}  "
+        f"p99 {percentile(latencies, 0.99) * 1000:.1f}  "
+        f"max {(latencies[-1] if latencies else 0) * 1000:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
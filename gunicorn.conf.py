@@ -0,0 +1,130 @@
+"""
+Gunicorn configuration for production serving.
+
+    gunicorn -c gunicorn.conf.py
+
+Every setting can be overridden from the environment:
+
+    GUNICORN_WORKER_MODE  sync, gthread or gevent (default). The /data routes are short,
+                          CPU-light database reads; the /stackexchange routes mostly wait on
+                          the upstream API, which thread or gevent workers overlap cheaply,
+                          and a live board client (/data/vuelos/stream) costs a gevent
+                          worker a greenlet but a gthread worker a whole thread.
+    GUNICORN_WORKERS      Worker processes. Defaults to 2 * cores + 1 for sync workers and to
+                          the number of cores for gthread and gevent workers, whose
+                          concurrency comes from threads or greenlets instead.
+    GUNICORN_THREADS      Threads per gthread worker (default 4). A /data/vuelos/stream
+                          client holds a thread: a gthread worker serves at most
+                          GUNICORN_THREADS - 1 of them.
+    GUNICORN_CONNECTIONS  Concurrent connections per gevent worker (default 1000).
+    GUNICORN_BIND         Listen address (default 0.0.0.0:$FLASK_RUN_PORT or 0.0.0.0:5001).
+    FLIGHT_BOARD_RELAY_PORT
+                          Port of the flight event relay the master starts for its workers
+                          (default 5002), see below.
+
+Several workers share the live board's flight events through a relay (see
+app/services/flight_board.py). Unless FLIGHT_BOARD_BROKER names one, e.g. a relay shared by
+several hosts, the master runs `flask flight-relay` on 127.0.0.1 for its own workers.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+
+worker_mode = os.getenv("GUNICORN_WORKER_MODE", "gevent")
+
+if worker_mode == "gevent":
+    # Patch the standard library before the application (and requests/ssl) is preloaded
+    from gevent import monkey
+
+    monkey.patch_all()
+
+cores = multiprocessing.cpu_count()
+
+wsgi_app = "main:app"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:" + os.getenv("FLASK_RUN_PORT", "5001"))
+
+if worker_mode == "sync":
+    worker_class = "sync"
+    workers = int(os.getenv("GUNICORN_WORKERS", 2 * cores + 1))
+elif worker_mode == "gevent":
+    worker_class = "gevent"
+    workers = int(os.getenv("GUNICORN_WORKERS", cores))
+    worker_connections = int(os.getenv("GUNICORN_CONNECTIONS", 1000))
+elif worker_mode == "gthread":
+    worker_class = "gthread"
+    workers = int(os.getenv("GUNICORN_WORKERS", cores))
+    threads = int(os.getenv("GUNICORN_THREADS", 4))
+else:
+    raise ValueError(f"Unknown GUNICORN_WORKER_MODE: {worker_mode}")
+
+# Set before the application is preloaded, which reads FLIGHT_BOARD_BROKER
+relay_port = int(os.getenv("FLIGHT_BOARD_RELAY_PORT", 5002))
+run_relay = (
+    worker_mode != "sync" and workers > 1 and not os.getenv("FLIGHT_BOARD_BROKER")
+)
+if run_relay:
+    os.environ["FLIGHT_BOARD_BROKER"] = f"tcp://127.0.0.1:{relay_port}"
+
+# Import create_app once in the master so workers fork with the code already loaded.
+# create_app starts no thread: the background jobs run in `flask background-jobs`
+preload_app = True
+
+# Seconds an idle keep-alive connection stays open (ignored by sync workers). Behind a load
+# balancer, set it above the balancer's idle timeout so it never reuses a closing connection
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Graceful restarts: recycle workers after a jittered number of requests to cap memory
+# growth, and give in-flight requests time to finish on SIGHUP/SIGTERM
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG", "-") or None
+
+
+def on_starting(server):
+    """
+    Start the flight event relay of the workers, a process of its own, before they fork.
+    """
+    if run_relay:
+        server.flight_relay = subprocess.Popen(
+            [sys.executable, "-m", "flask", "--app", "main", "flight-relay"]
+            + ["--port", str(relay_port)]
+        )
+
+
+def on_exit(server):
+    """Stop the flight event relay started by ``on_starting``."""
+    relay = getattr(server, "flight_relay", None)
+    if relay is not None:
+        relay.terminate()
+        relay.wait(10)
+
+
+def when_ready(server):
+    """
+    Fit the live flight board to the workers before they fork from the preloaded app: cap
+    its streams below the threads of non-gevent workers, and refuse it when several workers
+    would only see their own writes (FLIGHT_BOARD_BROKER=local).
+    """
+    from main import app
+
+    app.extensions["flight_board"].fit_to_workers(
+        server.cfg.worker_class_str, server.cfg.threads, server.cfg.workers
+    )
+
+
+def post_fork(server, worker):
+    """
+    Drop the database connections inherited from the preloading master, so each worker opens
+    its own instead of sharing sockets with its siblings.
+    """
+    from main import app
+    from app.models.flight_model import db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -2,155 +2,133 @@ import os
 from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
-from sqlalchemy_utils import database_exists, create_database
-from sqlalchemy.exc import OperationalError
-from time import sleep
 
 # Assuming this path is correct
-from app.models.flight_model import db, Aerolineas, Aeropuertos, Movimientos, Vuelos
+from app.models.flight_model import db
+from app.models.dimension_cache import dimension_cache
+from app.compression import compression
+from app.json_provider import OrjsonProvider
+from app.instrumentation import instrumentation
+from app.database import database_check, engine_options, init_database
+from app.replicas import replicas
+from app.cli import register_commands
+from app.seed import populate_tables
+from app.routes.batch import batch_bp
 from app.routes.flight_data import data_bp
+from app.routes.flight_stats import stats_bp
+from app.routes.instrumentation import metrics_bp
 from app.routes.stackexchange import stack_exchange
+from app.services import stackexchange_client
+from app.services.flight_board import flight_board
 
 # Load environment variables
 load_dotenv()
 
 
-def create_app():
+def create_app(config=None):
+    """
+    Create and configure the Flask application.
+
+    Args:
+        config (dict, optional): Configuration overrides applied on top of the values
+            loaded from the environment, e.g. to point the app at a test database.
+
+    Returns:
+        Flask: The configured application.
+    """
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     CORS(app)
 
     # Load configuration values
     app.config["CLIENT_ID"] = os.getenv("CLIENT_ID")
     app.config["KEY"] = os.getenv("KEY")
+    app.config["STACKEXCHANGE_API_URL"] = os.getenv(
+        "STACKEXCHANGE_API_URL", stackexchange_client.API_BASE_URL
+    )
+    app.config["STACKEXCHANGE_CACHE_TTL"] = int(
+        os.getenv("STACKEXCHANGE_CACHE_TTL", "60")
+    )
+    app.config["STACKEXCHANGE_STALE_TTL"] = int(
+        os.getenv("STACKEXCHANGE_STALE_TTL", "3600")
+    )
+    app.config["STACKEXCHANGE_MAX_CONCURRENT"] = int(
+        os.getenv("STACKEXCHANGE_MAX_CONCURRENT", "4")
+    )
+    app.config["STACKEXCHANGE_INGEST_INTERVAL"] = int(
+        os.getenv("STACKEXCHANGE_INGEST_INTERVAL", "0")
+    )
+    app.config["STACKEXCHANGE_INGEST_SEARCHES"] = os.getenv(
+        "STACKEXCHANGE_INGEST_SEARCHES", "perl@stackoverflow"
+    )
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URI")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-    # Initialize SQLAlchemy with the Flask app
+    app.config["DIMENSION_CACHE_TTL"] = int(os.getenv("DIMENSION_CACHE_TTL", "300"))
+    app.config["DATABASE_CHECK_INTERVAL"] = int(
+        os.getenv("DATABASE_CHECK_INTERVAL", "5")
+    )
+    app.config["DATABASE_POOL_SIZE"] = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+    app.config["DATABASE_MAX_OVERFLOW"] = int(os.getenv("DATABASE_MAX_OVERFLOW", "5"))
+    app.config["DATABASE_POOL_TIMEOUT"] = float(
+        os.getenv("DATABASE_POOL_TIMEOUT", "10")
+    )
+    app.config["DATABASE_POOL_RECYCLE"] = int(
+        os.getenv("DATABASE_POOL_RECYCLE", "1800")
+    )
+    app.config["DATABASE_POOL_PRE_PING"] = os.getenv(
+        "DATABASE_POOL_PRE_PING", "1"
+    ) not in ("0", "false", "False")
+    app.config["VUELOS_ARCHIVE_INTERVAL"] = int(
+        os.getenv("VUELOS_ARCHIVE_INTERVAL", "0")
+    )
+    app.config["VUELOS_HOT_MONTHS"] = int(os.getenv("VUELOS_HOT_MONTHS", "12"))
+    app.config["VUELOS_PARTITIONS_AHEAD"] = int(
+        os.getenv("VUELOS_PARTITIONS_AHEAD", "3")
+    )
+    app.config["DATABASE_REPLICA_URIS"] = [
+        uri for uri in os.getenv("DATABASE_REPLICA_URIS", "").split(",") if uri
+    ]
+    app.config["DATABASE_REPLICA_RETRY"] = int(
+        os.getenv("DATABASE_REPLICA_RETRY", "30")
+    )
+    app.config["FLIGHT_BOARD_BROKER"] = os.getenv("FLIGHT_BOARD_BROKER", "")
+    app.config["FLIGHT_BOARD_MAX_SUBSCRIBERS"] = int(
+        os.getenv("FLIGHT_BOARD_MAX_SUBSCRIBERS", "5000")
+    )
+    app.config["FLIGHT_BOARD_HEARTBEAT"] = float(
+        os.getenv("FLIGHT_BOARD_HEARTBEAT", "15")
+    )
+    if config:
+        app.config.update(config)
+    # Pool options of server databases, derived from the final URI and DATABASE_POOL_* values
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
+
+    # The replica binds must be declared before Flask-SQLAlchemy creates the engines
+    replicas.init_app(app)
+    # Initialize SQLAlchemy with the Flask app. Nothing connects to the database here: the
+    # schema is managed with `flask db-init` and checked lazily on the first request
     db.init_app(app)
-
-    with app.app_context():
-        # Implement retry logic
-        max_retries = 5
-        retry_count = 0
-
-        while retry_count < max_retries:
-            try:
-                engine = db.get_engine(app, bind=None)
-                if not database_exists(engine.url):  # Checks if database exists
-                    create_database(engine.url)  # Creates database if it does not exist
-                    print("Database created.")
-                db.create_all()  # Attempt to create tables, will silently fail if tables already exist
-                break  # Break out of the loop if successful
-            except OperationalError as e:
-                print(
-                    f"Database connection failed. Retrying... ({retry_count + 1}/{max_retries})"
-                )
-                sleep(5)  # Wait for 5 seconds before retrying
-                retry_count += 1
-
-        if retry_count == max_retries:
-            print("Failed to connect to the database after several retries.")
-            raise OperationalError("Could not connect to the database.")
-
-        # Function to populate tables if they're found to be empty
-        def populate_tables():
-            # Check and populate Aerolineas if empty
-            if not Aerolineas.query.first():
-                aerolineas = [
-                    Aerolineas(id_aerolinea=1, nombre_aerolinea="Volaris"),
-                    Aerolineas(id_aerolinea=2, nombre_aerolinea="Aeromar"),
-                    Aerolineas(id_aerolinea=3, nombre_aerolinea="Interjet"),
-                    Aerolineas(id_aerolinea=4, nombre_aerolinea="Aeromexico"),
-                ]
-                db.session.add_all(aerolineas)
-
-            # Check and populate Aeropuertos if empty
-            if not Aeropuertos.query.first():
-                aeropuertos = [
-                    Aeropuertos(id_aeropuerto=1, nombre_aeropuerto="Benito Juarez"),
-                    Aeropuertos(id_aeropuerto=2, nombre_aeropuerto="Guanajuato"),
-                    Aeropuertos(id_aeropuerto=3, nombre_aeropuerto="La Paz"),
-                    Aeropuertos(id_aeropuerto=4, nombre_aeropuerto="Oaxaca"),
-                ]
-                db.session.add_all(aeropuertos)
-
-            # Check and populate Movimientos if empty
-            if not Movimientos.query.first():
-                movimientos = [
-                    Movimientos(id_movimiento=1, descripcion="Salida"),
-                    Movimientos(id_movimiento=2, descripcion="Llegada"),
-                ]
-                db.session.add_all(movimientos)
-
-            # Check and populate Vuelos if empty
-            if not Vuelos.query.first():
-                vuelos = [
-                    Vuelos(
-                        id_aerolinea=1,
-                        id_aeropuerto=1,
-                        id_movimiento=1,
-                        dia="2021-05-02",
-                    ),
-                    Vuelos(
-                        id_aerolinea=2,
-                        id_aeropuerto=1,
-                        id_movimiento=1,
-                        dia="2021-05-02",
-                    ),
-                    Vuelos(
-                        id_aerolinea=3,
-                        id_aeropuerto=2,
-                        id_movimiento=2,
-                        dia="2021-05-02",
-                    ),
-                    Vuelos(
-                        id_aerolinea=4,
-                        id_aeropuerto=3,
-                        id_movimiento=2,
-                        dia="2021-05-02",
-                    ),
-                    Vuelos(
-                        id_aerolinea=1,
-                        id_aeropuerto=3,
-                        id_movimiento=2,
-                        dia="2021-05-02",
-                    ),
-                    Vuelos(
-                        id_aerolinea=2,
-                        id_aeropuerto=1,
-                        id_movimiento=1,
-                        dia="2021-05-02",
-                    ),
-                    Vuelos(
-                        id_aerolinea=2,
-                        id_aeropuerto=3,
-                        id_movimiento=1,
-                        dia="2021-05-04",
-                    ),
-                    Vuelos(
-                        id_aerolinea=3,
-                        id_aeropuerto=4,
-                        id_movimiento=1,
-                        dia="2021-05-04",
-                    ),
-                    Vuelos(
-                        id_aerolinea=3,
-                        id_aeropuerto=4,
-                        id_movimiento=2,
-                        dia="2021-05-04",
-                    ),
-                ]
-                db.session.add_all(vuelos)
-
-            db.session.commit()
-
-        # Call populate_tables after db.create_all()
-        populate_tables()
-        print("Tables populated if they were empty.")
+    database_check.init_app(app)
+    dimension_cache.init_app(app)
+    stackexchange_client.init_app(app)
+    compression.init_app(app)
+    instrumentation.init_app(app)
+    flight_board.init_app(app)
 
     # Register blueprints
     app.register_blueprint(data_bp, url_prefix="/data")
+    app.register_blueprint(stats_bp, url_prefix="/data/stats")
     app.register_blueprint(stack_exchange, url_prefix="/stackexchange")
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(batch_bp)
+    # Pool metrics matter most while the database is unhealthy
+    database_check.exempt(app, metrics_bp)
+    # The /data reads tolerate replication lag; writes and everything else use the primary
+    replicas.route_reads(app, data_bp)
+    replicas.route_reads(app, stats_bp)
+    replicas.route_reads(app, batch_bp, methods=("POST",))
+
+    register_commands(app)
 
     return app
 
@@ -158,5 +136,11 @@ def create_app():
 app = create_app()
 
 if __name__ == "__main__":
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
     port = os.getenv("FLASK_RUN_PORT", "5001")
-    app.run(host="0.0.0.0", port=int(port), debug=True)
+    debug = os.getenv("FLASK_DEBUG", "1") not in ("0", "false", "False")
+    # The development server prepares its own database; deployments run `flask db-init`
+    with app.app_context():
+        init_database(db.engine)
+        populate_tables()
+    app.run(host="0.0.0.0", port=int(port), debug=debug)
@@ -0,0 +1,83 @@
+"""
+A local stand-in for the Stack Exchange API used by the tests.
+
+The server answers every ``/search`` request with a recorded payload, records each request
+and the client port it came from, and can be told to delay its answers or to override
+fields of the payload (e.g. ``backoff`` or ``quota_remaining``).
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_payload(name="stackexchange_search.json"):
+    with open(os.path.join(FIXTURES, name)) as fixture:
+        return json.load(fixture)
+
+
+class StubUpstream:
+    def __init__(self, payload=None, delay=0.0):
+        self.payload = payload if payload is not None else load_payload()
+        self.delay = delay
+        self.overrides = {}
+        self.requests = []
+        self.client_ports = set()
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately: without this, delayed ACKs add
+            # tens of milliseconds to every keep-alive request
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                with stub._lock:
+                    stub.requests.append((url.path, params))
+                    stub.client_ports.add(self.client_address[1])
+                if stub.delay:
+                    time.sleep(stub.delay)
+                body = json.dumps(stub.respond(url.path, params)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def respond(self, path, params):
+        """
+        Build the payload for a request. Subclasses or tests may replace this method.
+        """
+        payload = copy.deepcopy(self.payload)
+        payload.update(self.overrides)
+        return payload
+
+    @property
+    def request_count(self):
+        with self._lock:
+            return len(self.requests)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
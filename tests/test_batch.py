@@ -0,0 +1,165 @@
+import os
+import time
+import unittest
+from unittest import mock
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from sqlalchemy import event
+
+from tests.testing_app import create_test_app
+from tests.stub_upstream import StubUpstream
+from app.models.flight_model import db
+from app.routes.batch import MAX_BATCH_REQUESTS
+
+STACKEXCHANGE_RESOURCES = [
+    "stackexchange",
+    "stackexchange/answered-unanswered",
+    "stackexchange/highest-reputation",
+    "stackexchange/fewest-views",
+    "stackexchange/oldest-recent",
+    "stackexchange/summary",
+]
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.upstream = StubUpstream().__enter__()
+        self.addCleanup(self.upstream.__exit__, None, None, None)
+        self.app = create_test_app(
+            {"STACKEXCHANGE_API_URL": self.upstream.url, "STACKEXCHANGE_CACHE_TTL": 0}
+        )
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def batch(self, *requests):
+        response = self.client.post("/batch", json={"requests": list(requests)})
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        return response.get_json()["responses"]
+
+    def test_subrequests_answer_like_the_routes(self):
+        responses = self.batch(
+            {"id": "airlines", "resource": "aerolineas"},
+            {
+                "id": "flights",
+                "resource": "vuelos",
+                "filters": {"id_aeropuerto": [1, 2], "limit": 3},
+                "fields": ["id_vuelo", "dia"],
+            },
+            {"id": "airports", "resource": "stats/aeropuertos"},
+        )
+        self.assertEqual(
+            [entry["id"] for entry in responses], ["airlines", "flights", "airports"]
+        )
+        for entry, path in zip(
+            responses,
+            [
+                "/data/aerolineas",
+                "/data/vuelos?id_aeropuerto=1,2&limit=3&fields=id_vuelo,dia",
+                "/data/stats/aeropuertos",
+            ],
+        ):
+            self.assertEqual(entry["status"], 200)
+            self.assertEqual(entry["body"], self.client.get(path).get_json())
+        self.assertEqual(responses[1]["next"], "3")
+        self.assertNotIn("next", responses[0])
+
+    def test_flights_are_paginated(self):
+        (entry,) = self.batch({"resource": "vuelos"})
+        self.assertEqual(len(entry["body"]), 9)
+        self.assertNotIn("next", entry)
+
+    def test_searches_are_shared_by_the_stackexchange_routes(self):
+        responses = self.batch(
+            *({"resource": resource} for resource in STACKEXCHANGE_RESOURCES)
+        )
+        self.assertEqual(self.upstream.request_count, 1)
+        self.assertEqual([entry["status"] for entry in responses], [200] * 6)
+        self.assertEqual(responses[1]["body"], {"answered": 7, "unanswered": 3})
+        self.assertEqual(responses[2]["body"]["question_id"], 70009896)
+
+    def test_searches_run_concurrently(self):
+        self.upstream.delay = 0.3
+        started = time.perf_counter()
+        responses = self.batch(
+            {"resource": "stackexchange/summary", "filters": {"site": "stackoverflow"}},
+            {"resource": "stackexchange/summary", "filters": {"site": "superuser"}},
+            {"resource": "stackexchange/summary", "filters": {"site": "askubuntu"}},
+            {"resource": "vuelos"},
+        )
+        self.assertLess(time.perf_counter() - started, 0.6)
+        self.assertEqual(self.upstream.request_count, 3)
+        self.assertEqual(
+            [entry["body"]["site"] for entry in responses[:3]],
+            ["stackoverflow", "superuser", "askubuntu"],
+        )
+
+    def test_identical_subrequests_run_once(self):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        self.batch({"resource": "stats/dias"})  # loads the dimension cache
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", record)
+        self.batch({"resource": "stats/dias"})
+        single = len(statements)
+        statements.clear()
+        responses = self.batch(
+            {"id": "a", "resource": "stats/dias"}, {"id": "b", "resource": "stats/dias"}
+        )
+        self.assertEqual(len(statements), single)
+        self.assertEqual(responses[0]["body"], responses[1]["body"])
+
+    def test_failures_stay_in_their_entry(self):
+        self.upstream.overrides = {"error_id": 502, "error_message": "unavailable"}
+        responses = self.batch(
+            {"resource": "stackexchange/summary"},
+            {"resource": "vuelos", "filters": {"dia_from": "yesterday"}},
+            {"resource": "movimientos"},
+        )
+        self.assertEqual([entry["status"] for entry in responses], [502, 400, 200])
+        self.assertEqual(responses[0]["body"], {"error": "unavailable"})
+        self.assertIn("dia_from", responses[1]["body"]["error"])
+
+    def test_unexpected_errors_stay_in_their_entry(self):
+        def fail():
+            raise RuntimeError("boom")
+
+        with mock.patch.dict(
+            self.app.view_functions, {"data_routes.get_aerolineas": fail}
+        ), self.assertLogs("app.routes.batch", "ERROR"):
+            responses = self.batch(
+                {"resource": "aerolineas"},
+                {"resource": "movimientos"},
+                {"resource": "stackexchange/summary"},
+            )
+        self.assertEqual([entry["status"] for entry in responses], [500, 200, 200])
+        self.assertIn("error", responses[0]["body"])
+
+    def test_invalid_batches(self):
+        for body in (
+            None,
+            {"requests": []},
+            {"requests": [{"resource": "vuelos/export"}]},
+            {"requests": [{"resource": "vuelos", "filters": [1]}]},
+            {
+                "requests": [
+                    {"resource": "vuelos", "id": 1},
+                    {"resource": "aerolineas", "id": 1},
+                ]
+            },
+            {"requests": [{"resource": "aerolineas"}] * (MAX_BATCH_REQUESTS + 1)},
+        ):
+            response = self.client.post("/batch", json=body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn("error", response.get_json())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import gzip
+import json
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from tests.testing_app import create_test_app
+from app.compression import brotli
+from app.models.flight_model import db
+
+
+class TestResponseCompression(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_large_json_is_gzipped(self):
+        identity = self.client.get("/data/vuelos?limit=100")
+        response = self.client.get(
+            "/data/vuelos?limit=100", headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertLess(len(response.data), len(identity.data))
+        self.assertEqual(gzip.decompress(response.data), identity.data)
+
+    @unittest.skipIf(brotli is None, "brotli is not installed")
+    def test_brotli_is_preferred_unless_the_client_weighs_it_down(self):
+        response = self.client.get(
+            "/data/vuelos?limit=100", headers={"Accept-Encoding": "gzip, br"}
+        )
+        self.assertEqual(response.headers["Content-Encoding"], "br")
+        self.assertEqual(
+            brotli.decompress(response.data),
+            self.client.get("/data/vuelos?limit=100").data,
+        )
+        response = self.client.get(
+            "/data/vuelos?limit=100", headers={"Accept-Encoding": "br;q=0.1, gzip"}
+        )
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+
+    def test_small_responses_and_refused_encodings_stay_identity(self):
+        response = self.client.get(
+            "/data/movimientos", headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertNotIn("Content-Encoding", response.headers)
+        response = self.client.get(
+            "/data/vuelos?limit=100", headers={"Accept-Encoding": "gzip;q=0"}
+        )
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    def test_streamed_response_is_compressed_per_chunk(self):
+        identity = self.client.get("/data/vuelos").data
+        response = self.client.get(
+            "/data/vuelos", headers={"Accept-Encoding": "gzip"}, buffered=False
+        )
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertNotIn("Content-Length", response.headers)
+        body = b"".join(response.response)
+        response.close()
+        self.assertEqual(gzip.decompress(body), identity)
+
+    def test_binary_and_precompressed_exports_are_left_alone(self):
+        response = self.client.get(
+            "/data/vuelos/export?compression=gzip",
+            headers={"Accept-Encoding": "gzip"},
+        )
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(response.mimetype, "application/gzip")
+
+    def test_compressed_etag_is_weak_and_still_validates(self):
+        self.app.config["COMPRESS_MIN_SIZE"] = 10
+        response = self.client.get(
+            "/data/aerolineas", headers={"Accept-Encoding": "gzip"}
+        )
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertTrue(response.headers["ETag"].startswith('W/"'))
+        response = self.client.get(
+            "/data/aerolineas",
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": response.headers["ETag"],
+            },
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class TestJsonProvider(unittest.TestCase):
+    def test_dates_decimals_and_layout(self):
+        app = create_test_app(seed=False)
+        provider = app.json
+        self.assertEqual(
+            provider.dumps({"dia": date(2021, 5, 2), "total": Decimal("3")}),
+            '{"dia":"2021-05-02","total":"3"}',
+        )
+        self.assertEqual(provider.loads(b'{"a": [1]}'), {"a": [1]})
+        self.assertEqual(provider.dumps({1: 2}, indent=2), '{\n  "1": 2\n}')
+        with app.app_context():
+            response = provider.response([{"dia": date(2021, 5, 4)}])
+        self.assertEqual(json.loads(response.data), [{"dia": "2021-05-04"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
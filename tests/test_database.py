@@ -0,0 +1,177 @@
+import os
+import tempfile
+import time
+import unittest
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.exc import OperationalError, TimeoutError
+
+from tests.testing_app import create_test_app
+from main import create_app
+from app.database import (
+    InstrumentedQueuePool,
+    engine_options,
+    init_database,
+    wait_for_database,
+)
+from app.models.flight_model import db, Vuelos
+
+
+class TestStartup(unittest.TestCase):
+    def test_create_app_does_not_connect(self):
+        started = time.monotonic()
+        app = create_app(
+            {"SQLALCHEMY_DATABASE_URI": "mysql+pymysql://user:pw@127.0.0.1:1/missing"}
+        )
+        self.assertLess(time.monotonic() - started, 1)
+        with app.app_context():
+            self.assertEqual(db.engine.pool.checkedout(), 0)
+
+    def test_lazy_check_reports_an_uninitialized_schema(self):
+        app = create_app(
+            {"SQLALCHEMY_DATABASE_URI": "sqlite://", "DATABASE_CHECK_INTERVAL": 0}
+        )
+        client = app.test_client()
+        response = client.get("/data/vuelos?limit=1")
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("flask db-init", response.get_json()["error"])
+
+        with app.app_context():
+            init_database(db.engine)
+        self.assertEqual(client.get("/data/vuelos?limit=1").status_code, 200)
+
+    def test_lazy_check_runs_once_per_process(self):
+        app = create_test_app()
+        statements = []
+        with app.app_context():
+            event.listen(
+                db.engine,
+                "before_cursor_execute",
+                lambda *args: statements.append(args[2]),
+            )
+        client = app.test_client()
+        client.get("/data/aerolineas")
+        checked = len(statements)
+        client.get("/data/aerolineas")
+        self.assertEqual(len(statements), checked)
+
+    def test_unreachable_database_is_not_retried_on_every_request(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            uri = "sqlite:///" + os.path.join(tmp, "missing", "app.db")
+            app = create_app({"SQLALCHEMY_DATABASE_URI": uri})
+            client = app.test_client()
+            attempts = []
+            with app.app_context():
+                event.listen(db.engine, "do_connect", lambda *args: attempts.append(1))
+            for _ in range(3):
+                response = client.get("/data/aerolineas")
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response.get_json(), {"error": "Database unavailable"})
+                self.assertEqual(response.headers["Retry-After"], "5")
+            self.assertEqual(len(attempts), 1)
+
+    def test_wait_for_database_gives_up_after_timeout(self):
+        engine = create_engine("mysql+pymysql://user:pw@127.0.0.1:1/missing")
+        started = time.monotonic()
+        with self.assertRaises(OperationalError):
+            wait_for_database(engine, timeout=0.3, interval=0.1)
+        self.assertLess(time.monotonic() - started, 1)
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.uri = "sqlite:///" + os.path.join(self.tmp.name, "app.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_engine_options(self):
+        options = engine_options(
+            {
+                "SQLALCHEMY_DATABASE_URI": "mysql+pymysql://user:pw@db/app",
+                "DATABASE_POOL_SIZE": 8,
+                "DATABASE_POOL_RECYCLE": 600,
+            }
+        )
+        self.assertIs(options["poolclass"], InstrumentedQueuePool)
+        self.assertEqual(options["pool_size"], 8)
+        self.assertEqual(options["pool_recycle"], 600)
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertEqual(engine_options({"SQLALCHEMY_DATABASE_URI": self.uri}), {})
+
+    def test_pool_counts_checkouts_and_timeouts(self):
+        engine = create_engine(
+            self.uri,
+            poolclass=InstrumentedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.05,
+        )
+        with engine.connect():
+            with self.assertRaises(TimeoutError):
+                engine.connect()
+        with engine.connect():
+            pass
+        stats = engine.pool.stats()
+        self.assertEqual(stats["checkouts"], 3)
+        self.assertEqual(stats["connects"], 1)
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertGreaterEqual(stats["wait_seconds_max"], 0.05)
+        engine.dispose()
+
+    def test_pool_exhaustion_is_reported_as_503(self):
+        app = create_test_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": self.uri,
+                "SQLALCHEMY_ENGINE_OPTIONS": {
+                    "poolclass": InstrumentedQueuePool,
+                    "pool_size": 1,
+                    "max_overflow": 0,
+                    "pool_timeout": 0.05,
+                },
+            }
+        )
+        client = app.test_client()
+        self.assertEqual(client.get("/data/vuelos?limit=1").status_code, 200)
+        with app.app_context(), db.engine.connect():
+            response = client.get("/data/vuelos?limit=1")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.get_json(), {"error": "Database busy"})
+
+            text = client.get("/metrics").get_data(as_text=True)
+            self.assertIn('db_pool_size{engine="default"} 1', text)
+            self.assertIn(
+                'db_pool_connections{engine="default",state="checked_out"} 1', text
+            )
+            self.assertIn('db_pool_timeouts_total{engine="default"} 1', text)
+        with app.app_context():
+            db.engine.dispose()
+
+    def test_pool_metrics_are_served_while_the_database_is_unavailable(self):
+        uri = "sqlite:///" + os.path.join(self.tmp.name, "missing", "app.db")
+        client = create_app({"SQLALCHEMY_DATABASE_URI": uri}).test_client()
+        self.assertEqual(client.get("/data/aerolineas").status_code, 503)
+        self.assertEqual(client.get("/metrics").status_code, 200)
+
+
+class TestDatabaseCommands(unittest.TestCase):
+    def test_db_init_and_seed(self):
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+        runner = app.test_cli_runner()
+
+        result = runner.invoke(args=["db-init", "--seed"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Applied migrations", result.output)
+        self.assertIn("Populated", result.output)
+
+        result = runner.invoke(args=["db-init"])
+        self.assertIn("Schema is up to date.", result.output)
+        result = runner.invoke(args=["seed"])
+        self.assertIn("Tables already populated.", result.output)
+        with app.app_context():
+            self.assertEqual(db.session.scalar(select(func.count(Vuelos.id_vuelo))), 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
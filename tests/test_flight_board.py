@@ -0,0 +1,192 @@
+import json
+import threading
+import unittest
+from datetime import date
+
+from tests.testing_app import create_test_app
+from app.models.flight_model import db, Vuelos
+from app.services.flight_board import EventRelay, flight_event
+
+
+def parse_frame(frame):
+    fields = dict(line.split(": ", 1) for line in frame.decode().strip().splitlines())
+    return fields["event"], int(fields["id"]), json.loads(fields["data"])
+
+
+def add_flight(app, id_aeropuerto, id_movimiento=1):
+    with app.app_context():
+        flight = Vuelos(
+            id_aerolinea=1,
+            id_aeropuerto=id_aeropuerto,
+            id_movimiento=id_movimiento,
+            dia=date(2021, 6, 1),
+        )
+        db.session.add(flight)
+        db.session.commit()
+        return flight.id_vuelo, flight.seq
+
+
+class TestFlightEventHub(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app({"FLIGHT_BOARD_MAX_PENDING": 3})
+        self.hub = self.app.extensions["flight_board"]
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def event(self, id_vuelo, id_aeropuerto, id_movimiento, previous=None):
+        values = {
+            "id_vuelo": id_vuelo,
+            "id_aerolinea": 1,
+            "id_aeropuerto": id_aeropuerto,
+            "id_movimiento": id_movimiento,
+            "dia": date(2021, 5, 2),
+        }
+        return flight_event("update", id_vuelo, values, previous)
+
+    def test_events_reach_the_matching_subscriptions(self):
+        everything = self.hub.subscribe()
+        airport = self.hub.subscribe([1])
+        arrivals = self.hub.subscribe([1, 2], [2])
+        self.hub.dispatch(
+            [self.event(1, 1, 1), self.event(2, 2, 2), self.event(3, 3, 2, (1, 2))]
+        )
+        received = {
+            name: [parse_frame(frame)[1] for frame in subscription.get(0)]
+            for name, subscription in (
+                ("everything", everything),
+                ("airport", airport),
+                ("arrivals", arrivals),
+            )
+        }
+        self.assertEqual(
+            received, {"everything": [1, 2, 3], "airport": [1, 3], "arrivals": [2, 3]}
+        )
+        _, _, data = parse_frame(self.hub.render(self.event(3, 3, 2), *self.names()))
+        self.assertEqual(data["vuelo"]["nombre_aeropuerto"], "La Paz")
+        self.assertEqual(data["vuelo"]["tipo_movimiento"], "Llegada")
+
+        for subscription in (everything, airport, arrivals):
+            self.hub.unsubscribe(subscription)
+            self.hub.unsubscribe(subscription)
+        self.assertEqual(self.hub.state()["subscribers"], 0)
+
+    def names(self):
+        with self.app.app_context():
+            from app.models.dimension_cache import dimension_cache
+
+            return dimension_cache.snapshot().names, self.app.json.dumps
+
+    def test_slow_subscribers_overflow(self):
+        subscription = self.hub.subscribe()
+        self.hub.dispatch([self.event(i, 1, 1) for i in range(1, 5)])
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(subscription.get(0), [])
+        self.assertEqual(self.hub.state()["dropped"], 1)
+
+
+class TestStreamRoute(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app({"FLIGHT_BOARD_HEARTBEAT": 5})
+        self.client = self.app.test_client()
+        self.hub = self.app.extensions["flight_board"]
+        # Load the names before the dispatcher needs them: the in-memory database has a
+        # single connection, which the dispatcher thread must not share with the test
+        self.client.get("/data/aerolineas")
+        self.hub.wait_idle()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_committed_flights_are_pushed(self):
+        response = self.client.get(
+            "/data/vuelos/stream?id_aeropuerto=1", buffered=False
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        self.assertNotIn("Content-Encoding", response.headers)
+        stream = iter(response.response)
+        self.assertEqual(next(stream), b"retry: 3000\n\n")
+
+        add_flight(self.app, id_aeropuerto=2)
+        id_vuelo, seq = add_flight(self.app, id_aeropuerto=1)
+        op, event_id, data = parse_frame(next(stream))
+        self.assertEqual((op, event_id), ("insert", seq))
+        self.assertEqual(data["vuelo"]["id_vuelo"], id_vuelo)
+        self.assertEqual(data["vuelo"]["nombre_aeropuerto"], "Benito Juarez")
+
+        with self.app.app_context():
+            db.session.delete(db.session.get(Vuelos, id_vuelo))
+            db.session.commit()
+        op, _, data = parse_frame(next(stream))
+        self.assertEqual((op, data["vuelo"]["id_vuelo"]), ("delete", id_vuelo))
+
+        self.client.post(
+            "/data/vuelos/bulk",
+            data="id_aerolinea,id_aeropuerto,id_movimiento,dia\n"
+            "2,1,2,2021-06-02\n2,3,2,2021-06-02\n",
+            content_type="text/csv",
+        )
+        op, _, data = parse_frame(next(stream))
+        self.assertEqual((op, data["vuelo"]["tipo_movimiento"]), ("insert", "Llegada"))
+
+        response.close()
+        self.assertEqual(self.hub.state()["subscribers"], 0)
+
+    def test_full_worker_rejects_subscribers(self):
+        self.app.extensions["flight_board"].max_subscribers = 0
+        response = self.client.get("/data/vuelos/stream")
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+
+    def test_subscribers_fit_the_workers(self):
+        self.hub.fit_to_workers("gthread", threads=4, workers=1)
+        self.assertEqual(self.hub.max_subscribers, 3)
+        self.hub.fit_to_workers("gevent", threads=1, workers=1)
+        self.assertEqual(self.hub.max_subscribers, 3)
+
+        # Without a relay, the other workers' writes would never reach the stream
+        self.hub.fit_to_workers("gevent", threads=1, workers=2)
+        response = self.client.get("/data/vuelos/stream")
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("FLIGHT_BOARD_BROKER", response.get_json()["error"])
+
+
+class TestRelayBroker(unittest.TestCase):
+    def setUp(self):
+        self.relay = EventRelay(("127.0.0.1", 0))
+        threading.Thread(target=self.relay.serve_forever, daemon=True).start()
+        self.addCleanup(self.relay.server_close)
+        self.addCleanup(self.relay.shutdown)
+
+    def test_workers_share_events_through_the_relay(self):
+        broker = "tcp://127.0.0.1:%d" % self.relay.server_address[1]
+        writer = create_test_app({"FLIGHT_BOARD_BROKER": broker})
+        reader = create_test_app({"FLIGHT_BOARD_BROKER": broker})
+        for app in (writer, reader):
+            app.test_client().get("/data/aerolineas")  # see TestStreamRoute.setUp
+        hubs = [app.extensions["flight_board"] for app in (writer, reader)]
+        subscriptions = [hub.subscribe([4]) for hub in hubs]
+
+        _, seq = add_flight(writer, id_aeropuerto=4)
+        for subscription in subscriptions:
+            # The events of the seed data may still be on their way
+            received = []
+            while seq not in received:
+                frames = subscription.get(5)
+                self.assertTrue(frames, "the flight was not relayed")
+                received.extend(parse_frame(frame)[1] for frame in frames)
+        for hub in hubs:
+            hub.broker.close()
+        for app in (writer, reader):
+            with app.app_context():
+                db.session.remove()
+                db.drop_all()
+
+
+if __name__ == "__main__":
+    unittest.main()
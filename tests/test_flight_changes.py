@@ -0,0 +1,205 @@
+import unittest
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, event, text, update
+from sqlalchemy.pool import StaticPool
+
+from tests.testing_app import create_test_app
+from app.migrations import upgrade
+from app.models.flight_model import db, Aerolineas, SecuenciaCambios, Vuelos
+
+
+class TestChangeFeed(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def changes(self, since, **params):
+        response = self.client.get(
+            "/data/vuelos/changes", query_string=dict(params, since=since)
+        )
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        return response.get_json()
+
+    def test_first_call_returns_every_flight(self):
+        feed = self.changes(0)
+        self.assertEqual([change["op"] for change in feed["changes"]], ["insert"] * 9)
+        self.assertEqual(
+            feed["changes"][0]["vuelo"],
+            self.client.get("/data/vuelos?limit=1").get_json()[0],
+        )
+        self.assertFalse(feed["more"])
+        self.assertEqual(self.changes(feed["next"]), dict(feed, changes=[]))
+
+    def test_inserts_updates_and_deletes(self):
+        token = self.changes(0)["next"]
+        with self.app.app_context():
+            db.session.get(Vuelos, 3).dia = date(2021, 5, 3)
+            db.session.delete(db.session.get(Vuelos, 5))
+            db.session.add(
+                Vuelos(
+                    id_aerolinea=1,
+                    id_aeropuerto=1,
+                    id_movimiento=1,
+                    dia=date(2021, 6, 1),
+                )
+            )
+            db.session.commit()
+        response = self.client.post(
+            "/data/vuelos/bulk",
+            data="id_aerolinea,id_aeropuerto,id_movimiento,dia\n2,2,2,2021-06-02\n",
+            content_type="text/csv",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        feed = self.changes(token, fields="id_vuelo,dia")
+        self.assertEqual(
+            sorted(
+                (change["op"], change["id_vuelo"], change.get("vuelo"))
+                for change in feed["changes"]
+            ),
+            [
+                ("delete", 5, None),
+                ("insert", 10, {"id_vuelo": 10, "dia": "2021-06-01"}),
+                ("insert", 11, {"id_vuelo": 11, "dia": "2021-06-02"}),
+                ("update", 3, {"id_vuelo": 3, "dia": "2021-05-03"}),
+            ],
+        )
+        self.assertEqual(self.changes(feed["next"])["changes"], [])
+
+    def test_pages(self):
+        first = self.changes(0, limit=4)
+        self.assertEqual([c["id_vuelo"] for c in first["changes"]], [1, 2, 3, 4])
+        self.assertTrue(first["more"])
+        second = self.changes(first["next"], limit=5)
+        self.assertEqual([c["id_vuelo"] for c in second["changes"]], [5, 6, 7, 8, 9])
+        self.assertFalse(second["more"])
+
+    def test_invalid_token(self):
+        response = self.client.get("/data/vuelos/changes?since=abc")
+        self.assertEqual(response.status_code, 400)
+
+
+class TestConditionalBulkReads(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+        self.statements = []
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self.record)
+
+    def tearDown(self):
+        with self.app.app_context():
+            event.remove(db.engine, "before_cursor_execute", self.record)
+            db.session.remove()
+            db.drop_all()
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def age_watermark(self):
+        """Make the last change a minute old, as if no write had happened since."""
+        with self.app.app_context():
+            db.session.execute(
+                update(SecuenciaCambios).values(
+                    actualizado=datetime.now(timezone.utc).replace(tzinfo=None)
+                    - timedelta(minutes=1)
+                )
+            )
+            db.session.commit()
+
+    def test_unchanged_polls_are_not_modified(self):
+        self.age_watermark()
+        response = self.client.get("/data/vuelos")
+        etag = response.headers["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn("Last-Modified", response.headers)
+
+        self.statements.clear()
+        response = self.client.get("/data/vuelos", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertFalse(any("FROM vuelos" in sql for sql in self.statements))
+
+        last_modified = self.client.get("/data/vuelos").headers["Last-Modified"]
+        response = self.client.get(
+            "/data/vuelos", headers={"If-Modified-Since": last_modified}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            "/data/vuelos/export", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get("/data/vuelos").headers["ETag"]
+        with self.app.app_context():
+            db.session.get(Vuelos, 1).id_movimiento = 2
+            db.session.commit()
+        response = self.client.get("/data/vuelos", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.get_json()[0]["tipo_movimiento"], "Llegada")
+
+    def test_last_modified_follows_every_change(self):
+        self.age_watermark()
+        last_modified = self.client.get("/data/vuelos").headers["Last-Modified"]
+        with self.app.app_context():
+            db.session.get(Aerolineas, 1).nombre_aerolinea = "Renombrada"
+            db.session.commit()
+        response = self.client.get(
+            "/data/vuelos", headers={"If-Modified-Since": last_modified}
+        )
+        self.assertEqual(response.status_code, 200)
+        # A write later in the same second would carry the same time
+        self.assertNotIn("Last-Modified", response.headers)
+
+    def test_not_modified_repeats_the_compressed_etag(self):
+        response = self.client.get("/data/vuelos", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        etag = response.headers["ETag"]
+        response = self.client.get(
+            "/data/vuelos",
+            headers={"Accept-Encoding": "gzip", "If-None-Match": etag},
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+
+
+class TestChangeSequenceMigration(unittest.TestCase):
+    def test_existing_flights_are_numbered_by_id(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "CREATE TABLE vuelos (id_vuelo INTEGER NOT NULL PRIMARY KEY, "
+                "id_aerolinea INTEGER NOT NULL, id_aeropuerto INTEGER NOT NULL, "
+                "id_movimiento INTEGER NOT NULL, dia DATE NOT NULL)"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO vuelos VALUES (4, 1, 1, 1, '2021-05-02'), "
+                "(7, 1, 1, 1, '2021-05-02')"
+            )
+
+        upgrade(engine)
+
+        with engine.connect() as connection:
+            self.assertEqual(
+                connection.execute(
+                    text("SELECT id_vuelo, seq, seq_created FROM vuelos ORDER BY 1")
+                ).all(),
+                [(4, 4, 4), (7, 7, 7)],
+            )
+            self.assertEqual(
+                connection.scalar(text("SELECT valor FROM secuencia_cambios")), 7
+            )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
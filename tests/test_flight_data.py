@@ -0,0 +1,154 @@
+import os
+import unittest
+from datetime import date
+
+from sqlalchemy import event, insert
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from tests.testing_app import create_test_app
+from app.models.flight_model import db, Aeropuertos, Vuelos
+
+
+class TestFlightDataRoutes(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+        self.statements = []
+
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._count_statement)
+
+    def tearDown(self):
+        with self.app.app_context():
+            event.remove(db.engine, "before_cursor_execute", self._count_statement)
+            db.session.remove()
+            db.drop_all()
+
+    def _count_statement(self, conn, cursor, statement, parameters, context, many):
+        self.statements.append(statement)
+
+    def test_vuelos_route(self):
+        response = self.client.get("/data/vuelos")
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(len(data), 9)
+        self.assertEqual(
+            data[0],
+            {
+                "id_vuelo": 1,
+                "nombre_aerolinea": "Volaris",
+                "nombre_aeropuerto": "Benito Juarez",
+                "tipo_movimiento": "Salida",
+                "dia": "2021-05-02",
+            },
+        )
+
+    def test_vuelos_route_uses_a_single_query(self):
+        with self.app.app_context():
+            db.session.execute(
+                insert(Vuelos),
+                [
+                    {
+                        "id_aerolinea": 1 + i % 4,
+                        "id_aeropuerto": 1 + i % 4,
+                        "id_movimiento": 1 + i % 2,
+                        "dia": date(2021, 6, 1),
+                    }
+                    for i in range(2500)
+                ],
+            )
+            db.session.commit()
+
+        self.client.get("/data/aerolineas")  # warm the dimension cache
+        self.statements.clear()
+        response = self.client.get("/data/vuelos")
+        data = response.get_json()
+        self.assertEqual(len(data), 2509)
+        # The flights in one query, after the change sequence lookup behind the ETag
+        self.assertEqual(len(self.statements), 2)
+        self.assertIn("secuencia_cambios", self.statements[0])
+        self.assertNotIn("JOIN", self.statements[1])
+        self.assertEqual([v["id_vuelo"] for v in data], list(range(1, 2510)))
+
+    def test_vuelos_keyset_pagination(self):
+        response = self.client.get("/data/vuelos?limit=4")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([v["id_vuelo"] for v in response.get_json()], [1, 2, 3, 4])
+        self.assertEqual(response.headers["X-Next-Cursor"], "4")
+        self.assertIn("after=4", response.headers["Link"])
+
+        response = self.client.get("/data/vuelos?limit=4&after=8")
+        self.assertEqual([v["id_vuelo"] for v in response.get_json()], [9])
+        self.assertNotIn("X-Next-Cursor", response.headers)
+
+    def test_vuelos_filters_and_fields(self):
+        response = self.client.get(
+            "/data/vuelos?dia_from=2021-05-03&id_aerolinea=2,3&fields=id_vuelo,dia"
+        )
+        self.assertEqual(
+            response.get_json(),
+            [
+                {"id_vuelo": 7, "dia": "2021-05-04"},
+                {"id_vuelo": 8, "dia": "2021-05-04"},
+                {"id_vuelo": 9, "dia": "2021-05-04"},
+            ],
+        )
+
+        response = self.client.get("/data/vuelos?id_aeropuerto=4&id_movimiento=2")
+        self.assertEqual([v["id_vuelo"] for v in response.get_json()], [9])
+
+    def test_invalid_parameters(self):
+        for query in (
+            "limit=0",
+            "limit=abc",
+            "dia_from=05-02-2021",
+            "fields=unknown",
+            "id_aerolinea=x",
+        ):
+            response = self.client.get("/data/vuelos?" + query)
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn("error", response.get_json())
+
+        for path, error in (
+            ("/data/vuelos?limit=0", "'limit' must be between 1 and 1000"),
+            ("/data/stats/aerolineas?limit=0", "'limit' must be >= 1"),
+        ):
+            self.assertEqual(self.client.get(path).get_json()["error"], error)
+
+    def test_dimension_routes_pagination(self):
+        response = self.client.get("/data/aerolineas?limit=2&after=1&fields=nombre")
+        self.assertEqual(
+            response.get_json(), [{"nombre": "Aeromar"}, {"nombre": "Interjet"}]
+        )
+        response = self.client.get("/data/movimientos")
+        self.assertEqual(
+            response.get_json(),
+            [{"id": 1, "descripcion": "Salida"}, {"id": 2, "descripcion": "Llegada"}],
+        )
+
+    def test_dimension_routes_are_served_from_memory(self):
+        first = self.client.get("/data/aeropuertos")
+        self.assertEqual(len(first.get_json()), 4)
+        etag = first.headers["ETag"]
+
+        self.statements.clear()
+        response = self.client.get("/data/aeropuertos", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get("/data/aeropuertos?limit=1")
+        self.assertEqual(response.get_json(), [{"id": 1, "nombre": "Benito Juarez"}])
+        self.assertEqual(self.statements, [])
+
+    def test_dimension_cache_invalidated_on_commit(self):
+        etag = self.client.get("/data/aeropuertos").headers["ETag"]
+        with self.app.app_context():
+            db.session.add(Aeropuertos(id_aeropuerto=5, nombre_aeropuerto="Cancun"))
+            db.session.commit()
+
+        response = self.client.get("/data/aeropuertos", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()[-1], {"id": 5, "nombre": "Cancun"})
+
+
+if __name__ == "__main__":
+    unittest.main()
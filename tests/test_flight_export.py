@@ -0,0 +1,113 @@
+import csv
+import gzip
+import io
+import unittest
+from unittest import mock
+
+from tests.testing_app import create_test_app
+from app.models.flight_model import db
+from app.services.flight_export import pa, pq, zstandard
+
+
+class TestVuelosExport(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_csv_export(self):
+        response = self.client.get("/data/vuelos/export")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/csv")
+        self.assertEqual(
+            response.headers["Content-Disposition"],
+            'attachment; filename="vuelos.csv"',
+        )
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(
+            rows[0],
+            {
+                "id_vuelo": "1",
+                "nombre_aerolinea": "Volaris",
+                "nombre_aeropuerto": "Benito Juarez",
+                "tipo_movimiento": "Salida",
+                "dia": "2021-05-02",
+            },
+        )
+
+    def test_empty_csv_export_has_the_header(self):
+        for query in ("", "&compression=gzip"):
+            response = self.client.get(
+                "/data/vuelos/export?format=csv&dia_from=2030-01-01" + query
+            )
+            self.assertEqual(response.status_code, 200)
+            body = response.get_data()
+            if query:
+                body = gzip.decompress(body)
+            self.assertEqual(
+                body,
+                b"id_vuelo,nombre_aerolinea,nombre_aeropuerto,tipo_movimiento,dia\n",
+            )
+
+    def test_filters_fields_and_gzip(self):
+        response = self.client.get(
+            "/data/vuelos/export?compression=gzip&dia_from=2021-05-04"
+            "&id_aerolinea=3&fields=id_vuelo,dia"
+        )
+        self.assertEqual(response.mimetype, "application/gzip")
+        self.assertIn("vuelos.csv.gz", response.headers["Content-Disposition"])
+        self.assertEqual(
+            gzip.decompress(response.data).decode(),
+            "id_vuelo,dia\n8,2021-05-04\n9,2021-05-04\n",
+        )
+
+    def test_rows_are_streamed_in_batches(self):
+        with mock.patch("app.routes.flight_data.EXPORT_BATCH_SIZE", 2):
+            response = self.client.get("/data/vuelos/export", buffered=False)
+            chunks = [chunk for chunk in response.response if chunk]
+            response.close()
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(b"".join(chunks).count(b"\n"), 10)
+
+    @unittest.skipIf(pa is None, "pyarrow is not installed")
+    def test_parquet_export(self):
+        response = self.client.get("/data/vuelos/export?format=parquet&id_movimiento=2")
+        self.assertEqual(response.mimetype, "application/vnd.apache.parquet")
+        table = pq.read_table(io.BytesIO(response.data))
+        self.assertEqual(table.num_rows, 4)
+        self.assertTrue(
+            pa.types.is_dictionary(table.schema.field("tipo_movimiento").type)
+        )
+        self.assertEqual(set(table.column("tipo_movimiento").to_pylist()), {"Llegada"})
+
+    @unittest.skipIf(pa is None or zstandard is None, "pyarrow or zstandard missing")
+    def test_arrow_export(self):
+        response = self.client.get(
+            "/data/vuelos/export?format=arrow&compression=zstd&fields=dia,nombre_aerolinea"
+        )
+        self.assertIn("vuelos.arrows", response.headers["Content-Disposition"])
+        table = pa.ipc.open_stream(response.data).read_all()
+        self.assertEqual(table.column_names, ["nombre_aerolinea", "dia"])
+        self.assertEqual(table.column("nombre_aerolinea")[0].as_py(), "Volaris")
+
+    def test_invalid_export_parameters(self):
+        for query in ("format=xml", "compression=brotli", "dia_from=yesterday"):
+            response = self.client.get("/data/vuelos/export?" + query)
+            self.assertEqual(response.status_code, 400, query)
+        if pa is not None:
+            response = self.client.get(
+                "/data/vuelos/export?format=arrow&compression=gzip"
+            )
+            self.assertEqual(
+                response.get_json(),
+                {"error": "Arrow streams support zstd compression only"},
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import func, select
+
+from tests.testing_app import create_test_app
+from app.models.flight_model import db, Vuelos, VuelosDiarios
+from app.models.rollup import rebuild_rollup
+from app.services.flight_ingest import read_csv, text_stream
+
+CSV = (
+    "id_aerolinea,id_aeropuerto,id_movimiento,dia\n"
+    "1,2,1,2021-06-01\n"
+    "1,2,1,2021-06-01\n"
+    "4,4,2,2021-06-02\n"
+)
+
+
+class TestBulkLoad(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _count(self):
+        with self.app.app_context():
+            return db.session.scalar(select(func.count(Vuelos.id_vuelo)))
+
+    def _rollup(self):
+        with self.app.app_context():
+            return sorted(
+                db.session.execute(
+                    select(VuelosDiarios.__table__).order_by(
+                        *VuelosDiarios.__table__.primary_key
+                    )
+                ).all()
+            )
+
+    def test_load_csv(self):
+        response = self.client.post(
+            "/data/vuelos/bulk", data=CSV, content_type="text/csv"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.get_json(), {"inserted": 3, "rejected": 0, "errors": []}
+        )
+        self.assertEqual(self._count(), 12)
+
+        # The rollup was maintained chunk by chunk
+        incremental = self._rollup()
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                rebuild_rollup(connection)
+        self.assertEqual(incremental, self._rollup())
+
+    def test_load_ndjson(self):
+        body = "\n".join(
+            json.dumps(
+                {"id_aerolinea": 2, "id_aeropuerto": 3, "id_movimiento": 1, "dia": dia}
+            )
+            for dia in ("2021-06-01", "2021-06-02")
+        )
+        response = self.client.post(
+            "/data/vuelos/bulk?chunk_size=1",
+            data=body + "\n\n",
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.get_json()["inserted"], 2)
+        self.assertEqual(self._count(), 11)
+
+    def test_invalid_record_stops_the_load_after_the_previous_ones(self):
+        body = CSV + "9,1,1,2021-06-03\n1,1,1,2021-06-03\n"
+        response = self.client.post(
+            "/data/vuelos/bulk?format=csv&chunk_size=2", data=body
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.get_json(),
+            {"error": "Unknown id_aerolinea 9", "line": 5, "inserted": 3},
+        )
+        self.assertEqual(self._count(), 12)
+
+    def test_skip_invalid_records(self):
+        body = CSV + "1,1,1,yesterday\n1,1\n1,1,1,2021-06-03\n"
+        response = self.client.post(
+            "/data/vuelos/bulk?format=csv&skip_invalid=true", data=body
+        )
+        self.assertEqual(
+            response.get_json(),
+            {
+                "inserted": 4,
+                "rejected": 2,
+                "errors": [
+                    {
+                        "line": 5,
+                        "error": "'dia' must be a date in YYYY-MM-DD format",
+                    },
+                    {"line": 6, "error": "'id_movimiento' must be an integer"},
+                ],
+            },
+        )
+
+    def test_bad_requests(self):
+        response = self.client.post("/data/vuelos/bulk", data=CSV)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("format", response.get_json()["error"])
+
+        response = self.client.post(
+            "/data/vuelos/bulk?format=csv", data="id_aerolinea,dia\n1,2021-06-01\n"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["line"], 1)
+        self.assertEqual(self._count(), 9)
+
+    def test_load_flights_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "schedule.csv")
+            with open(path, "w") as source:
+                source.write(CSV)
+            result = self.app.test_cli_runner().invoke(args=["load-flights", path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Inserted 3 flights, rejected 0.", result.output)
+        self.assertEqual(self._count(), 12)
+
+
+class TestTextStream(unittest.TestCase):
+    def test_read_only_bodies_are_decoded(self):
+        class Body:
+            # Like gunicorn's request body: read() and nothing else
+            def __init__(self, data):
+                self._data = io.BytesIO(data)
+
+            def read(self, size=-1):
+                return self._data.read(size)
+
+        records = list(read_csv(text_stream(Body(CSV.encode()))))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0][1]["dia"], "2021-06-01")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import unittest
+from datetime import date
+
+from sqlalchemy import select
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from tests.testing_app import create_test_app
+from app.models.flight_model import db, Vuelos, VuelosDiarios
+from app.models.rollup import rebuild_rollup
+
+
+class TestFlightStatsRoutes(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _rollup(self):
+        with self.app.app_context():
+            return {
+                (row.dia, row.id_aeropuerto, row.id_aerolinea, row.id_movimiento): (
+                    row.total_vuelos
+                )
+                for row in db.session.scalars(select(VuelosDiarios))
+            }
+
+    def test_rollup_tracks_orm_writes(self):
+        with self.app.app_context():
+            expected = self._rollup()
+            with db.engine.begin() as connection:
+                rebuild_rollup(connection)
+            self.assertEqual(self._rollup(), expected)
+
+            vuelo = Vuelos(
+                id_aerolinea=1, id_aeropuerto=1, id_movimiento=1, dia=date(2021, 5, 2)
+            )
+            db.session.add(vuelo)
+            db.session.commit()
+            self.assertEqual(self._rollup()[(date(2021, 5, 2), 1, 1, 1)], 2)
+
+            vuelo.id_aeropuerto = 4
+            db.session.commit()
+            self.assertEqual(self._rollup()[(date(2021, 5, 2), 1, 1, 1)], 1)
+            self.assertEqual(self._rollup()[(date(2021, 5, 2), 4, 1, 1)], 1)
+
+            db.session.delete(vuelo)
+            db.session.commit()
+            self.assertNotIn((date(2021, 5, 2), 4, 1, 1), self._rollup())
+            self.assertEqual(self._rollup(), expected)
+
+    def test_aeropuertos_stats(self):
+        response = self.client.get("/data/stats/aeropuertos?limit=2")
+        self.assertEqual(
+            response.get_json(),
+            [
+                {
+                    "id_aeropuerto": 1,
+                    "nombre_aeropuerto": "Benito Juarez",
+                    "total_movimientos": 3,
+                },
+                {
+                    "id_aeropuerto": 3,
+                    "nombre_aeropuerto": "La Paz",
+                    "total_movimientos": 3,
+                },
+            ],
+        )
+
+    def test_aerolineas_stats(self):
+        data = self.client.get("/data/stats/aerolineas").get_json()
+        self.assertEqual(data[0]["nombre_aerolinea"], "Aeromar")
+        self.assertEqual(data[0]["total_vuelos"], 3)
+        self.assertEqual(data[0]["dias"], 2)
+
+        data = self.client.get("/data/stats/aerolineas/por-dia").get_json()
+        self.assertEqual(
+            [(item["dia"], item["nombre_aerolinea"]) for item in data],
+            [
+                ("2021-05-02", "Volaris"),
+                ("2021-05-02", "Aeromar"),
+                ("2021-05-04", "Interjet"),
+            ],
+        )
+
+    def test_dias_stats(self):
+        response = self.client.get("/data/stats/dias?more_than=3")
+        self.assertEqual(
+            response.get_json(), [{"dia": "2021-05-02", "total_vuelos": 6}]
+        )
+        response = self.client.get("/data/stats/dias?dia_from=2021-05-03")
+        self.assertEqual(
+            response.get_json(), [{"dia": "2021-05-04", "total_vuelos": 3}]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import re
+import unittest
+
+from tests.testing_app import create_test_app
+from app.instrumentation import Histogram
+from app.models.flight_model import db
+from tests.stub_upstream import StubUpstream
+
+
+def server_timing(response):
+    """Return the Server-Timing header as {metric: (duration, description)}."""
+    timings = {}
+    for entry in response.headers["Server-Timing"].split(", "):
+        name, *params = entry.split(";")
+        params = dict(param.split("=", 1) for param in params)
+        timings[name] = (float(params["dur"]), params.get("desc", "").strip('"'))
+    return timings
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+        self.metrics = self.app.extensions["instrumentation"]
+        # The first request also checks the schema and fills the dimension cache
+        self.client.get("/data/movimientos", buffered=True)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_server_timing_counts_queries(self):
+        response = self.client.get("/data/stats/aerolineas", buffered=True)
+        timings = server_timing(response)
+        self.assertEqual(set(timings), {"db", "upstream", "app"})
+        self.assertEqual(timings["db"][1], "1 queries")
+        self.assertEqual(timings["upstream"][1], "0 calls")
+        self.assertNotIn("X-Query-Count", response.headers)
+
+    def test_latency_is_recorded_per_route_after_streaming(self):
+        response = self.client.get("/data/vuelos", buffered=False)
+        labels = ("GET", "/data/vuelos", "200")
+        b"".join(response.response)
+        self.assertEqual(self.metrics.request_duration.count(*labels), 0)
+        response.close()
+        self.assertEqual(self.metrics.request_duration.count(*labels), 1)
+        self.assertEqual(self.metrics.request_queries.count("/data/vuelos"), 1)
+
+    def test_requests_over_the_query_threshold_are_flagged(self):
+        self.app.config["INSTRUMENTATION_QUERY_THRESHOLD"] = 0
+        with self.assertLogs("app.instrumentation", "WARNING"):
+            response = self.client.get("/data/stats/aerolineas", buffered=True)
+        self.assertEqual(response.headers["X-Query-Count"], "1")
+        self.assertEqual(
+            self.metrics.excessive_queries.value("/data/stats/aerolineas"), 1
+        )
+
+    def test_metrics_endpoint_exposes_prometheus_text(self):
+        self.client.get("/data/stats/aerolineas", buffered=True)
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain; version=0.0.4"))
+        text = response.get_data(as_text=True)
+        self.assertIn("# TYPE http_request_duration_seconds histogram", text)
+        self.assertRegex(
+            text,
+            r'http_request_duration_seconds_count\{method="GET",'
+            r'route="/data/stats/aerolineas",status="200"\} 1',
+        )
+        self.assertRegex(
+            text,
+            r'http_request_db_queries_bucket\{route="/data/stats/aerolineas",le="1"\} 1',
+        )
+
+    def test_upstream_calls_are_timed(self):
+        with StubUpstream() as upstream:
+            app = create_test_app({"STACKEXCHANGE_API_URL": upstream.url})
+            response = app.test_client().get("/stackexchange/", buffered=True)
+            self.assertEqual(response.status_code, 200)
+        timings = server_timing(response)
+        self.assertEqual(timings["upstream"][1], "1 calls")
+        host = re.sub(r"^https?://", "", upstream.url).split("/")[0]
+        self.assertEqual(
+            app.extensions["instrumentation"].upstream_duration.count(host, "200"), 1
+        )
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram("latency", "Latency.", ("route",), buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, "/a")
+        self.assertEqual(
+            histogram.expose()[2:],
+            [
+                'latency_bucket{route="/a",le="0.1"} 1',
+                'latency_bucket{route="/a",le="1"} 2',
+                'latency_bucket{route="/a",le="+Inf"} 3',
+                'latency_sum{route="/a"} 5.550000',
+                'latency_count{route="/a"} 3',
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.pool import StaticPool
+
+from app.migrations import MIGRATIONS, current_version, upgrade
+from app.models.flight_model import db, Vuelos
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", poolclass=StaticPool)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def test_upgrade_fresh_database(self):
+        applied = upgrade(self.engine)
+        self.assertEqual(applied, [version for version, _, _ in MIGRATIONS])
+        self.assertEqual(upgrade(self.engine), [])
+        with self.engine.connect() as connection:
+            self.assertEqual(current_version(connection), MIGRATIONS[-1][0])
+
+    def test_upgrade_adds_indexes_to_existing_database(self):
+        # A database created by an older release: tables without the composite indexes
+        # and no schema_version table
+        with self.engine.begin() as connection:
+            db.metadata.create_all(connection)
+            for index in Vuelos.__table__.indexes:
+                index.drop(connection)
+
+        upgrade(self.engine)
+
+        indexes = {
+            index["name"] for index in inspect(self.engine).get_indexes("vuelos")
+        }
+        self.assertIn("ix_vuelos_dia_aeropuerto_movimiento", indexes)
+        self.assertIn("ix_vuelos_aerolinea_dia", indexes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from datetime import date
+
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.pool import StaticPool
+
+from tests.testing_app import create_test_app
+from app.migrations import upgrade
+from app.models.flight_model import db, Vuelos
+from app.models.partitions import add_months, month_start, vuelos_archivo
+from app.services.flight_archive import archive_flights
+
+
+class TestMonths(unittest.TestCase):
+    def test_month_arithmetic(self):
+        self.assertEqual(month_start(date(2021, 5, 17)), date(2021, 5, 1))
+        self.assertEqual(add_months(date(2021, 11, 1), 3), date(2022, 2, 1))
+        self.assertEqual(add_months(date(2021, 1, 1), -1), date(2020, 12, 1))
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.app = create_test_app()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def archive(self, today=date(2021, 6, 15)):
+        with self.app.app_context():
+            return archive_flights(db.engine, hot_months=1, today=today)
+
+    def test_old_months_move_to_the_archive(self):
+        everything = self.client.get("/data/vuelos").get_json()
+        result = self.archive()
+        self.assertEqual(result, {"created": [], "archived": [(date(2021, 5, 1), 9)]})
+
+        self.assertEqual(self.client.get("/data/vuelos").get_json(), [])
+        self.assertEqual(
+            self.client.get("/data/vuelos?include_archive=true").get_json(), everything
+        )
+        page = self.client.get(
+            "/data/vuelos?include_archive=1&dia_from=2021-05-04&limit=2"
+        )
+        self.assertEqual(
+            [flight["id_vuelo"] for flight in page.get_json()],
+            [
+                flight["id_vuelo"]
+                for flight in everything
+                if flight["dia"] == "2021-05-04"
+            ][:2],
+        )
+        self.assertIn("X-Next-Cursor", page.headers)
+        # The statistics still count the archived flights
+        dias = self.client.get("/data/stats/dias").get_json()
+        self.assertEqual(sum(dia["total_vuelos"] for dia in dias), 9)
+
+        self.assertEqual(self.archive()["archived"], [])
+
+    def test_rebuilt_statistics_keep_the_archived_months(self):
+        dias = self.client.get("/data/stats/dias").get_json()
+        self.archive()
+        result = self.app.test_cli_runner().invoke(args=["rebuild-stats"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self.client.get("/data/stats/dias").get_json(), dias)
+
+    def test_archived_ids_are_not_reused(self):
+        self.archive()
+        with self.app.app_context():
+            flight = Vuelos(
+                id_aerolinea=1, id_aeropuerto=1, id_movimiento=1, dia=date(2021, 6, 1)
+            )
+            db.session.add(flight)
+            db.session.commit()
+            self.assertEqual(flight.id_vuelo, 10)
+            self.assertEqual(
+                db.session.scalar(select(db.func.count()).select_from(vuelos_archivo)),
+                9,
+            )
+
+    def test_months_are_sqlite_tables_behind_a_view(self):
+        self.archive(today=date(2021, 7, 1))
+        with self.app.app_context():
+            tables = inspect(db.engine).get_table_names()
+            self.assertIn("vuelos_archivo_p202105", tables)
+            self.assertNotIn("vuelos_archivo_p202106", tables)
+            self.assertIn("vuelos_archivo", inspect(db.engine).get_view_names())
+
+    def test_archive_command(self):
+        result = self.app.test_cli_runner().invoke(
+            args=["archive-flights", "--hot-months", "1"]
+        )
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Archived 9 flights of 2021-05.", result.output)
+
+
+class TestPartitionMigration(unittest.TestCase):
+    def test_sqlite_vuelos_is_rebuilt_with_autoincrement(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "CREATE TABLE vuelos (id_vuelo INTEGER NOT NULL PRIMARY KEY, "
+                "id_aerolinea INTEGER NOT NULL, id_aeropuerto INTEGER NOT NULL, "
+                "id_movimiento INTEGER NOT NULL, dia DATE NOT NULL)"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO vuelos VALUES (7, 1, 1, 1, '2021-05-02')"
+            )
+
+        upgrade(engine)
+
+        with engine.connect() as connection:
+            sql = connection.scalar(
+                text("SELECT sql FROM sqlite_master WHERE name = 'vuelos'")
+            )
+            self.assertIn("AUTOINCREMENT", sql)
+            self.assertEqual(connection.scalar(text("SELECT id_vuelo FROM vuelos")), 7)
+            self.assertEqual(
+                connection.scalar(text("SELECT count(*) FROM vuelos_archivo")), 0
+            )
+        indexes = {index["name"] for index in inspect(engine).get_indexes("vuelos")}
+        self.assertIn("ix_vuelos_aerolinea_dia", indexes)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+from sqlalchemy import func, select
+
+from main import create_app
+from app.database import init_database
+from app.models.flight_model import db, Aerolineas, Vuelos
+from app.models.routing_session import use_primary
+from app.seed import populate_tables
+
+
+class TestReadReplicas(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.primary = os.path.join(self.directory, "primary.db")
+
+    def create_app(self, replicas):
+        """
+        Create an app on a seeded primary whose replicas are copies taken before one more
+        flight was written to the primary, standing in for replication lag.
+        """
+        app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{self.primary}",
+                "DATABASE_REPLICA_URIS": [f"sqlite:///{path}" for path in replicas],
+            }
+        )
+        with app.app_context():
+            init_database(db.engine)
+            populate_tables()
+            db.engine.dispose()
+            for path in replicas:
+                if os.path.isdir(os.path.dirname(path)):
+                    shutil.copy(self.primary, path)
+            db.session.add(
+                Vuelos(
+                    id_aerolinea=1, id_aeropuerto=1, id_movimiento=1, dia=date.today()
+                )
+            )
+            db.session.commit()
+            self.flights = db.session.scalar(select(func.count()).select_from(Vuelos))
+        return app
+
+    def replica(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_reads_go_to_the_replicas_round_robin(self):
+        app = self.create_app([self.replica("r1.db"), self.replica("r2.db")])
+        client = app.test_client()
+        for _ in range(4):
+            flights = client.get("/data/vuelos").get_json()
+            self.assertEqual(len(flights), self.flights - 1)
+        state = app.extensions["replicas"]["replicas"].state()
+        self.assertEqual(
+            {key: replica["sessions"] for key, replica in state.items()},
+            {"replica1": 2, "replica2": 2},
+        )
+
+    def test_read_primary_header_reads_your_writes(self):
+        app = self.create_app([self.replica("r1.db")])
+        client = app.test_client()
+        flights = client.get("/data/vuelos", headers={"X-Read-Primary": "true"})
+        self.assertEqual(len(flights.get_json()), self.flights)
+
+    def test_batches_read_from_the_replicas(self):
+        app = self.create_app([self.replica("r1.db")])
+        response = app.test_client().post(
+            "/batch",
+            json={"requests": [{"resource": "vuelos"}, {"resource": "stats/dias"}]},
+        )
+        flights, days = response.get_json()["responses"]
+        self.assertEqual(len(flights["body"]), self.flights - 1)
+        self.assertEqual(
+            sum(day["total_vuelos"] for day in days["body"]), self.flights - 1
+        )
+        state = app.extensions["replicas"]["replicas"].state()
+        self.assertEqual(state["replica1"]["sessions"], 1)
+
+    def test_writes_go_to_the_primary(self):
+        app = self.create_app([self.replica("r1.db")])
+        response = app.test_client().post(
+            "/data/vuelos/bulk",
+            data="id_aerolinea,id_aeropuerto,id_movimiento,dia\n1,1,1,2021-05-02\n",
+            content_type="text/csv",
+        )
+        self.assertEqual(response.status_code, 200)
+        with app.app_context():
+            count = select(func.count()).select_from(Vuelos)
+            self.assertEqual(db.session.scalar(count), self.flights + 1)
+            replica = db.engines["replica1"]
+            with replica.connect() as connection:
+                self.assertEqual(connection.scalar(count), self.flights - 1)
+
+    def test_unreachable_replicas_fail_over(self):
+        missing = os.path.join(self.directory, "missing", "r1.db")
+        app = self.create_app([missing, self.replica("r2.db")])
+        client = app.test_client()
+        for _ in range(2):
+            self.assertEqual(
+                len(client.get("/data/vuelos").get_json()), self.flights - 1
+            )
+        state = app.extensions["replicas"]["replicas"].state()
+        self.assertEqual(state["replica1"]["failures"], 1)
+        self.assertGreater(state["replica1"]["down_for"], 0)
+        self.assertEqual(state["replica2"]["sessions"], 2)
+
+        text = client.get("/metrics").get_data(as_text=True)
+        self.assertIn('db_replica_failures_total{replica="replica1"} 1', text)
+        self.assertIn('db_replica_sessions_total{replica="replica2"} 2', text)
+
+        app = self.create_app([missing])
+        self.assertEqual(
+            len(app.test_client().get("/data/vuelos").get_json()), self.flights
+        )
+
+    def test_dimension_cache_loads_from_the_primary(self):
+        app = self.create_app([self.replica("r1.db")])
+        with app.app_context():
+            db.session.get(Aerolineas, 1).nombre_aerolinea = "Renombrada"
+            db.session.commit()
+        client = app.test_client()
+        # The replica has not seen the rename: the cached names must not come from it
+        airlines = client.get("/data/aerolineas").get_json()
+        self.assertEqual(airlines[0], {"id": 1, "nombre": "Renombrada"})
+        flights = client.get("/data/vuelos").get_json()
+        self.assertEqual(flights[0]["nombre_aerolinea"], "Renombrada")
+        state = app.extensions["replicas"]["replicas"].state()
+        self.assertEqual(state["replica1"]["sessions"], 1)
+
+    def test_session_reads_its_own_writes(self):
+        app = self.create_app([self.replica("r1.db")])
+        count = select(func.count()).select_from(Vuelos)
+        with app.app_context():
+            session = db.session
+            session.info["replicas"] = app.extensions["replicas"]["replicas"]
+            self.assertEqual(session.scalar(count), self.flights - 1)
+            session.add(
+                Vuelos(
+                    id_aerolinea=1, id_aeropuerto=1, id_movimiento=1, dia=date.today()
+                )
+            )
+            session.flush()
+            self.assertEqual(session.scalar(count), self.flights + 1)
+            session.rollback()
+
+        with app.app_context():
+            db.session.info["replicas"] = app.extensions["replicas"]["replicas"]
+            use_primary(db.session)
+            self.assertEqual(db.session.scalar(count), self.flights)
+
+
+if __name__ == "__main__":
+    unittest.main()
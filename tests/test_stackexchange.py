@@ -1,41 +1,62 @@
+import os
 import unittest
-from main import app
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from tests.testing_app import create_test_app
+from tests.stub_upstream import StubUpstream
 
 
 class TestStackExchangeRoutes(unittest.TestCase):
     def setUp(self):
-        self.app = app.test_client()
+        self.upstream = StubUpstream().__enter__()
+        self.addCleanup(self.upstream.__exit__, None, None, None)
+        self.app = create_test_app(
+            {"STACKEXCHANGE_API_URL": self.upstream.url, "STACKEXCHANGE_CACHE_TTL": 0}
+        ).test_client()
+
+    def get_json(self, path):
+        response = self.app.get(path)
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        return response.get_json()
 
     def test_stackexchange_route(self):
-        response = self.app.get("/stackexchange/stackexchange")
-        self.assertEqual(response.status_code, 200)
+        data = self.get_json("/stackexchange/?intitle=json&site=superuser")
+        self.assertEqual(len(data["items"]), 10)
+        self.assertEqual(
+            [item["owner"]["reputation"] for item in data["items"]][:5],
+            [1523, 87, 40213, 1, 0],
+        )
+        path, params = self.upstream.requests[-1]
+        self.assertTrue(path.endswith("/search"))
+        self.assertEqual((params["intitle"], params["site"]), ("json", "superuser"))
 
     def test_answered_unanswered_route(self):
-        response = self.app.get("/stackexchange/answered-unanswered")
-        self.assertEqual(response.status_code, 200)
-        data = response.get_json()
-        self.assertTrue("answered" in data)
-        self.assertTrue("unanswered" in data)
+        data = self.get_json("/stackexchange/answered-unanswered")
+        self.assertEqual(data, {"answered": 7, "unanswered": 3})
 
     def test_highest_reputation_route(self):
-        response = self.app.get("/stackexchange/highest-reputation")
-        self.assertEqual(response.status_code, 200)
-        data = response.get_json()
-        self.assertTrue("owner" in data)
-        self.assertTrue("reputation" in data["owner"])
+        data = self.get_json("/stackexchange/highest-reputation")
+        self.assertEqual(data["question_id"], 70009896)
+        self.assertEqual(data["owner"]["reputation"], 77890)
 
     def test_fewest_views_route(self):
-        response = self.app.get("/stackexchange/fewest-views")
-        self.assertEqual(response.status_code, 200)
-        data = response.get_json()
-        self.assertTrue("view_count" in data)
+        data = self.get_json("/stackexchange/fewest-views")
+        self.assertEqual((data["question_id"], data["view_count"]), (70003711, 3))
 
     def test_oldest_recent_route(self):
-        response = self.app.get("/stackexchange/oldest-recent")
-        self.assertEqual(response.status_code, 200)
-        data = response.get_json()
-        self.assertTrue("oldest" in data)
-        self.assertTrue("most_recent" in data)
+        data = self.get_json("/stackexchange/oldest-recent")
+        self.assertEqual(data["oldest"]["question_id"], 70000000)
+        self.assertEqual(data["most_recent"]["question_id"], 70001237)
+
+    def test_k_is_only_checked_where_it_is_used(self):
+        self.get_json("/stackexchange/?k=0")
+        self.get_json("/stackexchange/answered-unanswered?k=abc")
+        response = self.app.get("/stackexchange/highest-reputation?k=0")
+        self.assertEqual(response.status_code, 400)
+
+    def test_missing_route(self):
+        self.assertEqual(self.app.get("/stackexchange/stackexchange").status_code, 404)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+import os
+import unittest
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from tests.testing_app import create_test_app
+from app.services.stackexchange_analytics import summarize, summary_for
+from app.services.stackexchange_client import CachedResponse
+from tests.stub_upstream import StubUpstream, load_payload
+
+
+class TestSummarize(unittest.TestCase):
+    def setUp(self):
+        self.items = load_payload()["items"]
+
+    def test_matches_the_per_metric_scans(self):
+        items = self.items
+        summary = summarize(items)
+        self.assertEqual(summary["total"], len(items))
+        self.assertEqual(
+            summary["answered"], sum(1 for item in items if item["is_answered"])
+        )
+        self.assertEqual(summary["unanswered"], len(items) - summary["answered"])
+        self.assertIs(
+            summary["highest_reputation"][0],
+            max(items, key=lambda item: int(item["owner"].get("reputation", 0))),
+        )
+        self.assertIs(
+            summary["fewest_views"][0],
+            min(items, key=lambda item: int(item.get("view_count", 0))),
+        )
+        self.assertIs(
+            summary["oldest"], min(items, key=lambda item: int(item["creation_date"]))
+        )
+        self.assertIs(
+            summary["most_recent"],
+            max(items, key=lambda item: int(item["creation_date"])),
+        )
+        self.assertEqual(summary["tags"]["perl"], len(items))
+
+    def test_top_and_bottom_k(self):
+        summary = summarize(self.items, k=3)
+        self.assertEqual(
+            [item["owner"].get("reputation") for item in summary["highest_reputation"]],
+            [77890, 40213, 9231],
+        )
+        self.assertEqual(
+            [item["view_count"] for item in summary["fewest_views"]], [3, 6, 15]
+        )
+
+    def test_ties_keep_the_first_item(self):
+        items = [
+            {"question_id": 1, "view_count": 5, "creation_date": 1, "owner": {}},
+            {"question_id": 2, "view_count": 5, "creation_date": 1, "owner": {}},
+        ]
+        summary = summarize(items)
+        self.assertEqual(summary["fewest_views"][0]["question_id"], 1)
+        self.assertEqual(summary["highest_reputation"][0]["question_id"], 1)
+        self.assertEqual(summary["oldest"]["question_id"], 1)
+
+    def test_summary_is_memoized_per_response(self):
+        response = CachedResponse(load_payload())
+        self.assertIs(summary_for(response, 2), summary_for(response, 2))
+        self.assertIsNot(summary_for(response, 2), summary_for(response, 3))
+
+
+class TestSummaryRoute(unittest.TestCase):
+    def test_summary_and_parameters(self):
+        with StubUpstream() as upstream:
+            app = create_test_app(
+                {
+                    "STACKEXCHANGE_API_URL": upstream.url,
+                }
+            )
+            client = app.test_client()
+            data = client.get(
+                "/stackexchange/summary?intitle=regex&site=serverfault&k=2"
+            ).get_json()
+            self.assertEqual(data["total"], 10)
+            self.assertEqual(len(data["highest_reputation"]), 2)
+            self.assertEqual(
+                (data["intitle"], data["site"], data["k"]), ("regex", "serverfault", 2)
+            )
+            self.assertEqual(upstream.requests[0][1]["intitle"], "regex")
+            self.assertEqual(upstream.requests[0][1]["site"], "serverfault")
+
+            data = client.get(
+                "/stackexchange/fewest-views?intitle=regex&site=serverfault&k=2"
+            ).get_json()
+            self.assertEqual([item["view_count"] for item in data], [3, 6])
+            self.assertEqual(upstream.request_count, 1)
+
+            self.assertEqual(client.get("/stackexchange/summary?k=0").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
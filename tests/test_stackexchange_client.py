@@ -0,0 +1,181 @@
+import os
+import re
+import threading
+import time
+import unittest
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from tests.testing_app import create_test_app
+from app.services.rate_limiter import RateLimiter
+from app.services.stackexchange_client import (
+    StackExchangeClient,
+    StackExchangeError,
+    UpstreamUnavailable,
+)
+from tests.stub_upstream import StubUpstream
+
+
+class TestStackExchangeClient(unittest.TestCase):
+    def test_responses_are_cached_per_query(self):
+        with StubUpstream() as upstream:
+            client = StackExchangeClient(base_url=upstream.url, cache_ttl=60)
+            first = client.search(intitle="perl", site="stackoverflow")
+            second = client.search(site="stackoverflow", intitle="perl")
+            self.assertIs(first, second)
+            self.assertEqual(upstream.request_count, 1)
+
+            client.search(intitle="python", site="stackoverflow")
+            self.assertEqual(upstream.request_count, 2)
+
+    def test_expired_entries_are_refetched_over_the_same_connection(self):
+        with StubUpstream() as upstream:
+            client = StackExchangeClient(base_url=upstream.url, cache_ttl=0)
+            for _ in range(3):
+                client.search(intitle="perl")
+            self.assertEqual(upstream.request_count, 3)
+            self.assertEqual(len(upstream.client_ports), 1)
+
+    def test_concurrent_identical_requests_are_coalesced(self):
+        with StubUpstream(delay=0.2) as upstream:
+            client = StackExchangeClient(base_url=upstream.url)
+            results = []
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(client.search(intitle="perl"))
+                )
+                for _ in range(10)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(upstream.request_count, 1)
+            self.assertEqual(len(results), 10)
+            self.assertTrue(all(result is results[0] for result in results))
+
+    def test_api_errors_are_raised_and_not_cached(self):
+        with StubUpstream() as upstream:
+            upstream.overrides = {"error_id": 400, "error_message": "bad parameter"}
+            client = StackExchangeClient(base_url=upstream.url)
+            with self.assertRaises(StackExchangeError):
+                client.search(intitle="perl")
+
+            upstream.overrides = {}
+            self.assertIn("items", client.search(intitle="perl").data)
+            self.assertEqual(upstream.request_count, 2)
+
+    def test_backoff_serves_stale_data_without_calling_upstream(self):
+        with StubUpstream() as upstream:
+            upstream.overrides = {"backoff": 30}
+            client = StackExchangeClient(base_url=upstream.url, cache_ttl=0)
+            first = client.search(intitle="perl")
+            started = time.monotonic()
+            second = client.search(intitle="perl")
+            self.assertLess(time.monotonic() - started, 1)
+            self.assertIs(first, second)
+            self.assertEqual(upstream.request_count, 1)
+            self.assertEqual(client.limiter.state()["counters"]["stale_served"], 1)
+
+            with self.assertRaises(UpstreamUnavailable) as raised:
+                client.search(intitle="python")
+            self.assertEqual(raised.exception.status_code, 503)
+            self.assertGreaterEqual(raised.exception.retry_after, 29)
+            self.assertEqual(upstream.request_count, 1)
+
+    def test_upstream_concurrency_is_capped_without_blocking(self):
+        with StubUpstream(delay=0.3) as upstream:
+            client = StackExchangeClient(
+                base_url=upstream.url, limiter=RateLimiter(max_concurrent=1)
+            )
+            worker = threading.Thread(target=lambda: client.search(intitle="perl"))
+            worker.start()
+            while client.limiter.state()["inflight"] == 0:
+                time.sleep(0.01)
+            with self.assertRaises(UpstreamUnavailable) as raised:
+                client.search(intitle="python")
+            self.assertEqual(raised.exception.status_code, 429)
+            worker.join()
+            self.assertEqual(client.limiter.state()["quota_remaining"], 9876)
+
+    def test_exhausted_quota_is_checked_again(self):
+        with StubUpstream() as upstream:
+            client = StackExchangeClient(base_url=upstream.url, cache_ttl=0)
+            upstream.overrides["quota_remaining"] = 0
+            client.search(intitle="perl")
+            with self.assertRaises(UpstreamUnavailable):
+                client.search(intitle="python")
+            self.assertEqual(upstream.request_count, 1)
+
+            # Once the retry interval is over, one call reads the quota again
+            client.limiter.quota_blocked_until = time.monotonic()
+            upstream.overrides["quota_remaining"] = 500
+            client.search(intitle="python")
+            self.assertEqual(client.limiter.state()["quota_remaining"], 500)
+            client.search(intitle="rust")
+            self.assertEqual(upstream.request_count, 3)
+
+    def test_one_call_probes_an_exhausted_quota(self):
+        limiter = RateLimiter()
+        limiter.record({"quota_remaining": 0})
+        self.assertGreater(limiter.blocked_for(), 59)
+        limiter.quota_blocked_until = time.monotonic()
+        self.assertEqual(limiter.blocked_for(), 0)
+        self.assertGreater(limiter.blocked_for(), 59)
+
+
+class TestStackExchangeRoutesWithStub(unittest.TestCase):
+    def test_routes_share_one_upstream_call(self):
+        with StubUpstream() as upstream:
+            app = create_test_app(
+                {
+                    "STACKEXCHANGE_API_URL": upstream.url,
+                }
+            )
+            client = app.test_client()
+            for route in (
+                "/stackexchange/",
+                "/stackexchange/answered-unanswered",
+                "/stackexchange/highest-reputation",
+                "/stackexchange/fewest-views",
+                "/stackexchange/oldest-recent",
+            ):
+                self.assertEqual(client.get(route).status_code, 200, route)
+            self.assertEqual(upstream.request_count, 1)
+
+            data = client.get("/stackexchange/").get_json()
+            self.assertEqual(
+                [item["owner"]["reputation"] for item in data["items"]][3:5],
+                [1, 0],
+            )
+            # The cached payload itself is left untouched
+            payload = app.extensions["stackexchange_client"].search(
+                order="desc", sort="activity", intitle="perl", site="stackoverflow"
+            )
+            self.assertNotIn("reputation", payload.data["items"][4]["owner"])
+
+    def test_backoff_is_reported_without_sleeping(self):
+        with StubUpstream() as upstream:
+            upstream.overrides = {"backoff": 10}
+            app = create_test_app(
+                {
+                    "STACKEXCHANGE_API_URL": upstream.url,
+                    "STACKEXCHANGE_CACHE_TTL": 0,
+                }
+            )
+            client = app.test_client()
+            started = time.monotonic()
+            self.assertEqual(client.get("/stackexchange/").status_code, 200)
+            self.assertEqual(client.get("/stackexchange/fewest-views").status_code, 200)
+            self.assertLess(time.monotonic() - started, 2)
+
+            text = client.get("/metrics").get_data(as_text=True)
+            backoff = re.search(r"^upstream_backoff_seconds (\S+)$", text, re.M)
+            self.assertGreater(float(backoff.group(1)), 9)
+            self.assertIn('upstream_limiter_events_total{event="stale_served"} 1', text)
+            self.assertEqual(upstream.request_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import copy
+import time
+import unittest
+
+from tests.testing_app import create_test_app
+from app.services.rate_limiter import RateLimiter
+from app.services.stackexchange_fanout import concurrency_limit, merge_items
+from tests.stub_upstream import StubUpstream, load_payload
+
+
+class PerTitleUpstream(StubUpstream):
+    """Answer each intitle with its own question ids, and fail the ``broken`` title."""
+
+    def respond(self, path, params):
+        if params.get("intitle") == "broken":
+            return {"error_id": 400, "error_message": "bad parameter"}
+        payload = copy.deepcopy(self.payload)
+        offset = 1000 * len(params["intitle"])
+        for item in payload["items"]:
+            item["question_id"] += offset
+        return payload
+
+
+class TestFanOutRoute(unittest.TestCase):
+    def create_app(self, upstream):
+        return create_test_app(
+            {
+                "STACKEXCHANGE_API_URL": upstream.url,
+                "STACKEXCHANGE_MAX_CONCURRENT": 10,
+            }
+        )
+
+    def test_searches_run_concurrently(self):
+        titles = ",".join(f"title{i}" for i in range(10))
+        with StubUpstream(delay=0.3) as upstream:
+            client = self.create_app(upstream).test_client()
+            started = time.perf_counter()
+            response = client.get(f"/stackexchange/fan-out?intitle={titles}")
+            elapsed = time.perf_counter() - started
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(upstream.request_count, 10)
+        # Sequential searches would take 3 seconds
+        self.assertLess(elapsed, 1.5)
+
+    def test_duplicate_questions_are_merged_per_site(self):
+        with StubUpstream() as upstream:
+            client = self.create_app(upstream).test_client()
+            single = client.get("/stackexchange/summary?k=3").get_json()
+            data = client.get(
+                "/stackexchange/fan-out?intitle=perl,regex&k=3"
+            ).get_json()
+            self.assertEqual(data["total"], single["total"])
+            self.assertEqual(data["highest_reputation"], single["highest_reputation"])
+            self.assertEqual(
+                data["searches"],
+                [
+                    {
+                        "intitle": intitle,
+                        "site": "stackoverflow",
+                        "source": "live",
+                        "total": 10,
+                    }
+                    for intitle in ("perl", "regex")
+                ],
+            )
+
+            data = client.get(
+                "/stackexchange/fan-out?site=stackoverflow,serverfault"
+            ).get_json()
+            self.assertEqual(data["total"], 2 * single["total"])
+            self.assertEqual(
+                [search["site"] for search in data["searches"]],
+                ["stackoverflow", "serverfault"],
+            )
+
+    def test_failed_searches_are_reported(self):
+        with PerTitleUpstream() as upstream:
+            client = self.create_app(upstream).test_client()
+            data = client.get("/stackexchange/fan-out?intitle=perl,broken").get_json()
+            self.assertEqual(data["total"], 10)
+            self.assertEqual(
+                data["searches"][1],
+                {
+                    "intitle": "broken",
+                    "site": "stackoverflow",
+                    "source": "error",
+                    "error": "bad parameter",
+                },
+            )
+
+            response = client.get("/stackexchange/fan-out?intitle=broken")
+            self.assertEqual(response.status_code, 502)
+            self.assertEqual(response.get_json(), {"error": "bad parameter"})
+
+    def test_too_many_searches_are_rejected(self):
+        with StubUpstream() as upstream:
+            client = self.create_app(upstream).test_client()
+            titles = ",".join(f"title{i}" for i in range(7))
+            response = client.get(f"/stackexchange/fan-out?intitle={titles}&site=a,b,c")
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(upstream.request_count, 0)
+
+
+class TestFanOutHelpers(unittest.TestCase):
+    def test_concurrency_follows_the_limiter_and_quota(self):
+        limiter = RateLimiter(max_concurrent=4)
+        self.assertEqual(concurrency_limit(limiter, 10), 4)
+        self.assertEqual(concurrency_limit(limiter, 2), 2)
+        limiter.record({"quota_remaining": 3})
+        self.assertEqual(concurrency_limit(limiter, 10), 3)
+        limiter.record({"quota_remaining": 0})
+        self.assertEqual(concurrency_limit(limiter, 10), 1)
+
+    def test_merge_keeps_the_first_occurrence(self):
+        items = load_payload()["items"]
+        merged = merge_items(
+            [("perl", "so"), ("regex", "so"), ("perl", "sf")],
+            [items[:5], items[3:], items[:2]],
+        )
+        self.assertEqual(len(merged), 12)
+        self.assertIs(merged[3], items[3])
+
+
+if __name__ == "__main__":
+    unittest.main()
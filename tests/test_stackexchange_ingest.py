@@ -0,0 +1,155 @@
+import copy
+import os
+import threading
+import unittest
+
+from sqlalchemy import func, select
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from tests.testing_app import create_test_app
+from app.cli import background_jobs
+from app.models.flight_model import db
+from app.models.stackexchange_model import StackQuestion, StackSearchSnapshot
+from app.services.stackexchange_client import get_client
+from app.services.stackexchange_ingest import ingest_search, parse_searches
+from tests.stub_upstream import StubUpstream, load_payload
+
+
+class PagedUpstream(StubUpstream):
+    """Serves ``total`` generated questions in pages of the requested size."""
+
+    def __init__(self, total):
+        super().__init__()
+        template = load_payload()["items"]
+        self.questions = []
+        for index in range(total):
+            item = copy.deepcopy(template[index % len(template)])
+            item["question_id"] = 1000 + index
+            item["view_count"] = 100 + index
+            item["creation_date"] = 1600000000 + index * 60
+            item["owner"]["reputation"] = index
+            self.questions.append(item)
+
+    def respond(self, path, params):
+        page, size = int(params.get("page", 1)), int(params.get("pagesize", 30))
+        items = self.questions[(page - 1) * size : page * size]
+        return {
+            "items": items,
+            "has_more": page * size < len(self.questions),
+            "quota_max": 10000,
+            "quota_remaining": 9000,
+        }
+
+
+class TestStackExchangeIngest(unittest.TestCase):
+    def _app(self, upstream):
+        return create_test_app(
+            {
+                "STACKEXCHANGE_API_URL": upstream.url,
+            }
+        )
+
+    def test_ingest_pages_through_the_full_result_set(self):
+        with PagedUpstream(total=250) as upstream:
+            app = self._app(upstream)
+            with app.app_context():
+                self.assertEqual(
+                    ingest_search(get_client(), "perl", "stackoverflow"), 250
+                )
+                pages = [params["page"] for _, params in upstream.requests]
+                self.assertEqual(pages, ["1", "2", "3"])
+                self.assertEqual(upstream.requests[0][1]["pagesize"], "100")
+
+                # Re-ingesting updates rows and drops questions that left the results
+                upstream.questions = upstream.questions[:120]
+                upstream.questions[0]["view_count"] = 1
+                self.assertEqual(
+                    ingest_search(get_client(), "perl", "stackoverflow"), 120
+                )
+                self.assertEqual(
+                    db.session.scalar(select(func.count()).select_from(StackQuestion)),
+                    120,
+                )
+                self.assertEqual(
+                    db.session.get(
+                        StackQuestion, ("perl", "stackoverflow", 1000)
+                    ).view_count,
+                    1,
+                )
+                snapshot = db.session.get(
+                    StackSearchSnapshot, ("perl", "stackoverflow")
+                )
+                self.assertEqual((snapshot.total, snapshot.pages), (120, 2))
+
+    def test_partial_runs_record_no_snapshot(self):
+        with PagedUpstream(total=250) as upstream:
+            app = self._app(upstream)
+            with app.app_context(), self.assertLogs(
+                "app.services.stackexchange_ingest", "WARNING"
+            ):
+                count = ingest_search(
+                    get_client(), "perl", "stackoverflow", max_pages=2
+                )
+                self.assertEqual(count, 200)
+                self.assertIsNone(
+                    db.session.get(StackSearchSnapshot, ("perl", "stackoverflow"))
+                )
+            calls = upstream.request_count
+            app.test_client().get("/stackexchange/answered-unanswered")
+            self.assertEqual(upstream.request_count, calls + 1)
+
+    def test_routes_answer_from_the_snapshot(self):
+        with PagedUpstream(total=150) as upstream:
+            app = self._app(upstream)
+            with app.app_context():
+                ingest_search(get_client(), "perl", "stackoverflow")
+            calls = upstream.request_count
+
+            client = app.test_client()
+            data = client.get("/stackexchange/answered-unanswered").get_json()
+            self.assertEqual(data["answered"] + data["unanswered"], 150)
+            data = client.get("/stackexchange/highest-reputation").get_json()
+            self.assertEqual(data["question_id"], 1149)
+            data = client.get("/stackexchange/fewest-views").get_json()
+            self.assertEqual(data["question_id"], 1000)
+            data = client.get("/stackexchange/oldest-recent").get_json()
+            self.assertEqual(data["oldest"]["question_id"], 1000)
+            self.assertEqual(data["most_recent"]["question_id"], 1149)
+            self.assertEqual(upstream.request_count, calls)
+
+    def test_parse_searches(self):
+        self.assertEqual(
+            parse_searches("perl@stackoverflow, python@serverfault,rust"),
+            [
+                ("perl", "stackoverflow"),
+                ("python", "serverfault"),
+                ("rust", "stackoverflow"),
+            ],
+        )
+
+    def test_background_jobs_run_outside_the_app(self):
+        app = create_test_app(
+            {"STACKEXCHANGE_INGEST_INTERVAL": 60, "VUELOS_ARCHIVE_INTERVAL": 60},
+            seed=False,
+        )
+        # Gunicorn workers fork from the process that built the app: it starts no thread
+        names = {thread.name for thread in threading.enumerate()}
+        self.assertNotIn("stackexchange-ingestor", names)
+        self.assertNotIn("flight-archiver", names)
+        self.assertEqual(
+            [type(job).__name__ for job in background_jobs(app)],
+            ["StackExchangeIngestor", "FlightArchiver"],
+        )
+
+        result = (
+            create_test_app(seed=False)
+            .test_cli_runner()
+            .invoke(args=["background-jobs"])
+        )
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn("No background job is enabled", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+"""
+Application factory of the tests: an app on an in-memory SQLite database that is migrated
+and seeded explicitly, as ``flask db-init --seed`` does for deployments.
+"""
+
+import os
+
+os.environ.setdefault("DATABASE_URI", "sqlite://")
+
+from main import create_app
+from app.database import init_database
+from app.models.flight_model import db
+from app.seed import populate_tables
+
+
+def create_test_app(config=None, seed=True):
+    """
+    Create an application on a fresh in-memory database.
+
+    Args:
+        config (dict, optional): Configuration overrides passed to ``create_app``.
+        seed (bool): Load the sample flight data.
+    """
+    app = create_app(dict({"SQLALCHEMY_DATABASE_URI": "sqlite://"}, **(config or {})))
+    with app.app_context():
+        init_database(db.engine)
+        if seed:
+            populate_tables()
+    return app